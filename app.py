@@ -5,20 +5,25 @@ Ce module contient la configuration de l'application, les modèles de données,
 les routes et la logique métier pour la gestion de l'inventaire.
 """
 
+import io
 import os
 import json
 import uuid
 import sqlite3
 import logging
-import re
-from datetime import datetime
+import hashlib
+import mimetypes
+import random
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
 from PIL import Image
 from deep_translator import GoogleTranslator
 
-from flask import Flask, render_template, request, redirect, url_for, flash, abort, send_file, send_from_directory, jsonify, Response, stream_with_context
-from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, send_file, send_from_directory, jsonify, Response, stream_with_context, session, make_response
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+import click
 import requests # Ajout de la bibliothèque requests
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf import FlaskForm, CSRFProtect
@@ -26,10 +31,23 @@ from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Length
 from dotenv import load_dotenv
 
-from scripts import pdf_generator
+from scripts import pdf_generator, image_pipeline
+from scripts.data_cache import VersionedCache, bump_data_version
+from scripts.storage import creer_stockage
+from scripts.image_cache import CacheImages
+from scripts.image_pipeline import PREFIXE_UPLOADS
+from scripts.suppressions import balayer_suppressions
+from scripts.integrite import verifier_integrite
+from scripts.maintenance import (
+    executer_tache, executer_taches_dues, lire_journal, optimiser, point_de_controle_wal, vacuum_incremental
+)
+from scripts.journal_auth import JournalAuth, agreger_anciens_logs, resume_journal, lire_evenements
+from scripts.numerotation import reserver_numero, liberer_reservation
 from scripts.clean_images import (
-    nettoyer_fichiers,
-    formater_taille_fichier
+    nettoyer_fichiers as nettoyer_fichiers_orphelins,
+    analyser_orphelins,
+    formater_taille_fichier,
+    nom_reference
 )
 
 from scripts.login_security import (
@@ -37,6 +55,7 @@ from scripts.login_security import (
     increment_login_attempts,
     reset_login_attempts,
     init_security_db,
+    migrer_depuis_catalogue,
     cleanup_old_attempts,
     get_login_attempts_status
 )
@@ -46,8 +65,51 @@ load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))
+# Base de sécurité (tentatives de connexion, journal d'authentification), distincte du catalogue
+app.config['SECURITY_DATABASE'] = os.environ.get('SECURITY_DATABASE', 'database/security.db')
+# Durée de conservation du détail du journal d'authentification, avant regroupement en agrégats quotidiens (jours)
+app.config['AUTH_LOG_RETENTION_DAYS'] = int(os.environ.get('AUTH_LOG_RETENTION_DAYS', 90))
 app.config['UPLOAD_FOLDER'] = 'database/uploads'
+# Stockage des uploads : 'local' (UPLOAD_FOLDER) ou 's3' (bucket partagé entre plusieurs serveurs)
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'local')
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_PREFIX'] = os.environ.get('S3_PREFIX', '')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')
+app.config['S3_PUBLIC_URL'] = os.environ.get('S3_PUBLIC_URL')
+# Service des uploads locaux : 'flask' (l'application envoie les octets), 'x-accel' (nginx,
+# via X-Accel-Redirect vers UPLOAD_ACCEL_PREFIX) ou 'x-sendfile' (Apache mod_xsendfile, lighttpd)
+app.config['UPLOAD_SERVE_MODE'] = os.environ.get('UPLOAD_SERVE_MODE', 'flask')
+app.config['UPLOAD_ACCEL_PREFIX'] = os.environ.get('UPLOAD_ACCEL_PREFIX', '/uploads-internes/')
+# Suppression différée des fichiers : durée de la quarantaine et intervalle du balayeur (secondes)
+app.config['FILE_DELETE_GRACE'] = int(os.environ.get('FILE_DELETE_GRACE', 24 * 3600))
+app.config['FILE_SWEEPER_INTERVAL'] = int(os.environ.get('FILE_SWEEPER_INTERVAL', 300))
+# Intervalle de la vérification d'intégrité de la base (lignes orphelines, références mortes), en secondes
+app.config['INTEGRITY_CHECK_INTERVAL'] = int(os.environ.get('INTEGRITY_CHECK_INTERVAL', 24 * 3600))
+# Tâches de maintenance (voir scripts/maintenance.py) : lancées par le balayeur de l'application ('app')
+# ou seulement par la commande `flask --app app maintenance`, depuis un timer systemd ('cli')
+app.config['MAINTENANCE_SCHEDULER'] = os.environ.get('MAINTENANCE_SCHEDULER', 'app')
+# Intervalle de chaque tâche (secondes, 0 : désactivée), modifiable par MAINTENANCE_<TÂCHE> (ex: MAINTENANCE_VACUUM=86400)
+INTERVALLES_MAINTENANCE = {
+    'balayage_fichiers': 3600,
+    'cache_images': 3600,
+    'checkpoint_wal': 3600,
+    'tentatives_connexion': 24 * 3600,
+    'agregation_auth': 24 * 3600,
+    'integrite': app.config['INTEGRITY_CHECK_INTERVAL'],
+    'optimisation': 24 * 3600,
+    'orphelins': 7 * 24 * 3600,
+    'vacuum': 7 * 24 * 3600,
+}
+app.config['MAINTENANCE_INTERVALS'] = {
+    tache: int(os.environ.get(f'MAINTENANCE_{tache.upper()}', defaut)) for tache, defaut in INTERVALLES_MAINTENANCE.items()
+}
+# Redimensionnement à la demande (/img/<largeur>x<hauteur>/...) : tailles autorisées et cache disque
+app.config['IMAGE_SIZES'] = os.environ.get('IMAGE_SIZES', '160x160,480x480,800x800').split(',')
+app.config['IMAGE_CACHE_FOLDER'] = os.environ.get('IMAGE_CACHE_FOLDER', 'database/cache_images')
+app.config['IMAGE_CACHE_MAX_SIZE'] = int(os.environ.get('IMAGE_CACHE_MAX_SIZE', 256 * 1024 * 1024))  # 256 Mo par défaut
+app.config['IMAGE_CACHE_ACCEL_PREFIX'] = os.environ.get('IMAGE_CACHE_ACCEL_PREFIX', '/cache-images-internes/')
 app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB par défaut
+app.config['MAX_IMAGE_PIXELS'] = int(os.environ.get('MAX_IMAGE_PIXELS', image_pipeline.MAX_PIXELS))  # 50 mégapixels par défaut
 
 # Initialiser la protection CSRF
 csrf = CSRFProtect(app)
@@ -68,16 +130,42 @@ app.logger.setLevel(logging.INFO)
 # Extension de fichiers autorisées
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# Cache mémoire du worker, invalidé via la table data_version (voir scripts/data_cache.py)
+data_cache = VersionedCache()
+
+# Bases déjà mises à niveau par ce processus (chemins)
+_bases_a_jour = set()
+
+# Nombre maximal d'aperçus renvoyés par l'API groupée /api/objet_previews
+MAX_APERCUS_PAR_LOT = 50
+
+# Nombre maximal d'objets modifiés par une action groupée (/admin/objets/lot)
+MAX_OBJETS_PAR_LOT = 1000
+
+# Durée de vie (secondes) d'un utilisateur chargé par Flask-Login dans le cache du worker
+DUREE_CACHE_UTILISATEUR = 300
+
+# Empreintes des gabarits utilisées dans les ETag (calculées une fois par processus)
+_empreintes_gabarits = {}
+
 class User:
-    """Modèle utilisateur pour l'authentification Flask-Login."""
+    """
+    Modèle utilisateur pour l'authentification Flask-Login.
+
+    Les instances sont partagées entre les requêtes par le cache du worker
+    (voir load_user) : elles ne doivent pas être modifiées.
+    """
+
+    __slots__ = ('id', 'username', 'password_hash')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
 
     def __init__(self, id, username, password_hash):
         self.id = id
         self.username = username
         self.password_hash = password_hash
-        self.is_authenticated = True
-        self.is_active = True
-        self.is_anonymous = False
 
     def get_id(self):
         """Retourne l'identifiant unique de l'utilisateur sous forme de chaîne."""
@@ -87,9 +175,15 @@ class User:
     def get(user_id, db_connection):
         """Récupère un utilisateur par son ID"""
         conn = db_connection()
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
+        try:
+            return User.charger(conn, user_id)
+        finally:
+            conn.close()
 
+    @staticmethod
+    def charger(conn, user_id):
+        """Récupère un utilisateur par son ID sur une connexion ouverte"""
+        user = conn.execute('SELECT id, username, password_hash FROM users WHERE id = ?', (user_id,)).fetchone()
         if user:
             return User(user['id'], user['username'], user['password_hash'])
         return None
@@ -123,8 +217,22 @@ login_manager.login_view = 'login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Charge un utilisateur à partir de son ID pour Flask-Login."""
-    return User.get(int(user_id), get_db_connection)
+    """
+    Charge un utilisateur à partir de son ID pour Flask-Login.
+
+    L'utilisateur est gardé dans le cache du worker : les requêtes d'un
+    administrateur connecté (flux SSE, aperçus) ne relisent pas la table
+    `users`. Toute écriture sur cette table (ex: mot de passe changé par
+    create_admin_user) incrémente la portée 'users' et invalide le cache.
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return data_cache.get_or_load(
+        get_db_connection, 'users', f'user:{user_id}',
+        lambda conn: User.charger(conn, user_id), ttl=DUREE_CACHE_UTILISATEUR
+    )
 
 # Fonction pour charger le fichier des attributs spécifiques
 # Charger les définitions au démarrage de l'application
@@ -178,30 +286,119 @@ def get_db_connection():
     db_path = app.config.get('DATABASE', 'database/database.db')
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
+    # Applique les ON DELETE CASCADE de images et liens (désactivé par défaut dans SQLite)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+def get_security_db_connection():
+    """
+    Établit et retourne une connexion à la base de sécurité (tentatives de connexion, journal d'authentification).
+
+    Fichier distinct du catalogue, en mode WAL : le trafic d'authentification ne
+    prend jamais le verrou d'écriture de la base de l'inventaire.
+    """
+    db_path = app.config.get('SECURITY_DATABASE', 'database/security.db')
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    # Suffisant en mode WAL : une coupure ne peut perdre que les dernières écritures, sans corruption
+    conn.execute('PRAGMA synchronous = NORMAL')
     return conn
 
+# Journal d'authentification écrit par lots en arrière-plan (voir scripts/journal_auth.py)
+journal_auth = JournalAuth(get_security_db_connection, logger=app.logger)
+
+def preparer_base_securite():
+    """Crée la base de sécurité et y migre les tables de l'ancienne base unique (une fois par processus)."""
+    db_path = app.config.get('SECURITY_DATABASE', 'database/security.db')
+    if db_path in _bases_a_jour:
+        return
+    init_security_db(get_security_db_connection)
+    migrer_depuis_catalogue(
+        get_security_db_connection, app.config.get('DATABASE', 'database/database.db'), logger=app.logger
+    )
+    _bases_a_jour.add(db_path)
+
 def init_db():
     """Initialise la base de données avec le schéma SQL complet."""
     conn = get_db_connection()
     with open('static/schema.sql') as f:
         conn.executescript(f.read())
+    upgrade_db(conn)
     conn.commit()
     conn.close()
+    init_security_db(get_security_db_connection)
     app.logger.info(f"Base de données initialisée avec le nouveau schéma (Path: {app.config.get('DATABASE', 'database/database.db')})")
 
+# Colonnes ajoutées aux tables existantes : (table, colonne, définition)
+COLONNES_AJOUTEES = [
+    # Partie numérique des numéros INV_IC2_xxxx, indexée pour l'attribution des numéros
+    ('objets', 'numero_seq', "INTEGER GENERATED ALWAYS AS (CASE WHEN numero_inventaire GLOB 'INV_IC2_[0-9][0-9][0-9][0-9]' THEN CAST(substr(numero_inventaire, 9) AS INTEGER) END) VIRTUAL"),
+    # Dimensions, couleur dominante et aperçu flou (LQIP) des images, pour un affichage sans saut de mise en page
+    ('objets', 'image_largeur', 'INTEGER'),
+    ('objets', 'image_hauteur', 'INTEGER'),
+    ('objets', 'image_couleur', 'TEXT'),
+    ('objets', 'image_lqip', 'TEXT'),
+    ('images', 'largeur', 'INTEGER'),
+    ('images', 'hauteur', 'INTEGER'),
+    ('images', 'couleur', 'TEXT'),
+    ('images', 'lqip', 'TEXT'),
+]
+
+def upgrade_db(conn):
+    """Applique les évolutions idempotentes du schéma (colonnes, puis static/schema_evolutions.sql)."""
+    for table, colonne, definition in COLONNES_AJOUTEES:
+        # table_xinfo (et non table_info) liste aussi les colonnes générées
+        colonnes = [row[1] for row in conn.execute(f'PRAGMA table_xinfo({table})')]
+        if colonne not in colonnes:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {colonne} {definition}')
+
+    with open('static/schema_evolutions.sql') as f:
+        conn.executescript(f.read())
+    conn.commit()
+
+    # Première mise à niveau : suppression des lignes orphelines accumulées tant
+    # que les clés étrangères n'étaient pas appliquées (voir scripts/integrite.py)
+    if not conn.execute("SELECT 1 FROM journal_maintenance WHERE tache = 'integrite'").fetchone():
+        rapport = executer_tache(conn, 'integrite', lambda: verifier_integrite(conn, corriger=True))
+        orphelines = sum(rapport['lignes_orphelines'].values())
+        if orphelines:
+            app.logger.info(f"Intégrité : {orphelines} ligne(s) orpheline(s) supprimée(s)")
+
+@app.before_request
+def preparer_requete():
+    """Met la base à niveau une fois par processus et synchronise le cache du worker."""
+    if request.endpoint in ('static', 'serve_upload', 'image_redimensionnee'):
+        return
+
+    db_path = app.config.get('DATABASE', 'database/database.db')
+    conn = get_db_connection()
+    try:
+        if db_path not in _bases_a_jour:
+            upgrade_db(conn)
+            _bases_a_jour.add(db_path)
+        preparer_base_securite()
+        demarrer_balayeur()
+        data_cache.sync(conn, db_path)
+    except sqlite3.Error as e:
+        app.logger.error(f"Erreur lors de la synchronisation du cache: {e}")
+        data_cache.clear()
+    finally:
+        conn.close()
+
 def log_auth_attempt(user_id, action, req):
-    """Enregistre une tentative d'authentification dans la base de données."""
+    """
+    Enregistre une tentative d'authentification dans le journal de la base de sécurité.
+
+    L'événement est placé en file et écrit par lots en arrière-plan ; en mode
+    test, il est écrit immédiatement.
+    """
     try:
-        conn = get_db_connection()
-        ip_address = req.remote_addr
         user_agent = req.user_agent.string if req.user_agent else None
-        
-        conn.execute(
-            'INSERT INTO auth_logs (user_id, action, ip_address, user_agent) VALUES (?, ?, ?, ?)',
-            (user_id, action, ip_address, user_agent)
-        )
-        conn.commit()
-        conn.close()
+        journal_auth.enregistrer(user_id, action, req.remote_addr, user_agent)
+        if app.testing:
+            journal_auth.vider()
+        else:
+            journal_auth.demarrer()
     except Exception as e:
         app.logger.error(f"Erreur lors de l'enregistrement du log d'auth: {e}")
 
@@ -264,62 +461,278 @@ def secure_file_path(base_dir, user_input):
         return None
 
 def save_uploaded_file(file):
-    """Enregistre un fichier téléchargé et retourne le chemin relatif"""
+    """
+    Traite et enregistre une image téléchargée en une seule écriture.
+
+    Returns:
+        dict: {'chemin', 'sha256', 'largeur', 'hauteur', 'taille'} ou None si le fichier est refusé
+    """
     if file and allowed_file(file.filename):
-        # Générer un nom unique pour éviter les conflits
-        filename = str(uuid.uuid4()) + '_' + secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Le fichier est nommé d'après son contenu (l'extension d'origine fixe le format)
+        extension = file.filename.rsplit('.', 1)[1].lower()
 
-        # Optimisation automatique de l'image
         try:
-            with Image.open(filepath) as img:
-                max_size = (1600, 1600)
-                
-                # On redimensionne si l'image est plus grande que la cible
-                # Ou on ré-enregistre simplement pour appliquer la compression JPEG
-                if img.width > max_size[0] or img.height > max_size[1]:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Conversion en RGB si nécessaire (pour éviter les erreurs avec les JPEG)
-                if img.mode in ('RGBA', 'P') and filepath.lower().endswith(('.jpg', '.jpeg')):
-                    img = img.convert('RGB')
+            infos = image_pipeline.enregistrer_image(
+                file.stream, get_stockage(), extension, max_pixels=app.config['MAX_IMAGE_PIXELS']
+            )
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Rien n'est écrit sur le disque si le traitement échoue
+            app.logger.error(f"Image refusée {file.filename}: {e}")
+            return None
 
-                # Sauvegarde avec optimisation et qualité réduite (85%)
-                img.save(filepath, optimize=True, quality=85)
-                app.logger.info(f"Image optimisée automatiquement : {filename}")
+        if infos['nouveau']:
+            app.logger.info(f"Image optimisée automatiquement : {file.filename} -> {infos['fichier']}")
+        else:
+            app.logger.info(f"Image déjà présente, fichier partagé : {file.filename} -> {infos['fichier']}")
+        infos['chemin'] = PREFIXE_UPLOADS + infos['fichier']
+        return infos
+    return None
+
+# Traitement des images d'une requête en parallèle (Pillow libère le GIL pendant le décodage
+# et l'encodage) ; le pool est partagé par les requêtes du processus, ce qui borne la charge
+_pool_images = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('IMAGE_WORKERS', min(4, os.cpu_count() or 1))),
+    thread_name_prefix='images'
+)
+
+def save_uploaded_files(files):
+    """
+    Traite et enregistre plusieurs images téléchargées en parallèle.
+
+    Returns:
+        list: Le résultat de save_uploaded_file pour chaque fichier, dans l'ordre
+    """
+    files = list(files)
+    if len(files) <= 1:
+        return [save_uploaded_file(file) for file in files]
+    return list(_pool_images.map(save_uploaded_file, files))
+
+def apercu_colonnes(image_infos):
+    """Retourne (largeur, hauteur, couleur, lqip) d'une image enregistrée, à stocker avec son chemin."""
+    if not image_infos:
+        return (None, None, None, None)
+    return (image_infos['largeur'], image_infos['hauteur'], image_infos['couleur'], image_infos['lqip'])
+
+# Paramètres qui déterminent le stockage (un changement de configuration crée un nouveau stockage)
+CONFIG_STOCKAGE = ('STORAGE_BACKEND', 'UPLOAD_FOLDER', 'S3_BUCKET', 'S3_PREFIX', 'S3_ENDPOINT_URL', 'S3_PUBLIC_URL', 'S3_CLIENT')
+_stockages = {}
+
+def get_stockage():
+    """Retourne le stockage des uploads décrit par la configuration (voir scripts/storage.py)."""
+    cle = tuple(app.config.get(nom) for nom in CONFIG_STOCKAGE[:-1]) + (id(app.config.get('S3_CLIENT')),)
+    if cle not in _stockages:
+        _stockages[cle] = creer_stockage(app.config)
+    return _stockages[cle]
+
+_caches_images = {}
+
+def get_cache_images():
+    """Retourne le cache disque des images redimensionnées (voir scripts/image_cache.py)."""
+    cle = (app.config['IMAGE_CACHE_FOLDER'], app.config['IMAGE_CACHE_MAX_SIZE'])
+    if cle not in _caches_images:
+        _caches_images[cle] = CacheImages(os.path.join(app.root_path, cle[0]), cle[1])
+    return _caches_images[cle]
+
+def lire_upload(chemin):
+    """Retourne le contenu d'une image uploadée (chemin tel qu'enregistré en base), ou None si elle est introuvable."""
+    try:
+        return io.BytesIO(get_stockage().get(nom_reference(chemin)))
+    except (FileNotFoundError, ValueError):
+        return None
+
+def lire_miniature(chemin, taille='800x800'):
+    """
+    Retourne le chemin d'une image uploadée réduite à la taille donnée (cache disque), pour le PDF.
 
+    Une fiche PDF n'affiche pas les images à plus de 800 px : inutile d'y
+    embarquer les originaux. Repli sur l'original si la taille n'est pas autorisée.
+    """
+    if taille not in app.config['IMAGE_SIZES']:
+        return lire_upload(chemin)
+    cle = nom_reference(chemin)
+    dimensions_max = tuple(int(dimension) for dimension in taille.split('x'))
+    try:
+        return get_cache_images().obtenir(
+            f'{taille}/{cle}', lambda: image_pipeline.encoder_miniature(get_stockage().get(cle), dimensions_max)
+        )
+    except (OSError, ValueError):
+        return None
+
+def balayer_fichiers(delai_grace=None):
+    """
+    Traite la file des suppressions de fichiers (quarantaine, restauration, purge).
+
+    Voir scripts/suppressions.py ; les dérivés redimensionnés des fichiers mis en
+    quarantaine sont retirés du cache.
+    """
+    def retirer_derives(cles):
+        get_cache_images().supprimer(f'{taille}/{cle}' for taille in app.config['IMAGE_SIZES'] for cle in cles)
+
+    return balayer_suppressions(
+        get_db_connection, get_stockage(),
+        app.config['FILE_DELETE_GRACE'] if delai_grace is None else delai_grace,
+        apres_quarantaine=retirer_derives
+    )
+
+# Libellés des tâches de maintenance affichés sur le tableau de bord
+LIBELLES_MAINTENANCE = {
+    'balayage_fichiers': 'Suppression différée des fichiers',
+    'cache_images': 'Purge du cache des miniatures',
+    'checkpoint_wal': 'Point de contrôle WAL',
+    'tentatives_connexion': 'Nettoyage des tentatives de connexion',
+    'agregation_auth': "Agrégation du journal d'authentification",
+    'integrite': "Vérification d'intégrité",
+    'optimisation': 'Statistiques SQLite (ANALYZE / optimize)',
+    'orphelins': 'Fichiers orphelins',
+    'vacuum': 'Vacuum incrémental',
+}
+
+def _sur_chaque_base(operation):
+    """Applique une opération de maintenance SQLite au catalogue et à la base de sécurité."""
+    resultats = {}
+    for nom, connecter in (('catalogue', get_db_connection), ('securite', get_security_db_connection)):
+        conn = connecter()
+        try:
+            resultats[nom] = operation(conn)
+        finally:
+            conn.close()
+    return resultats
+
+def _supprimer_orphelins():
+    """Confie au balayeur les fichiers d'uploads référencés nulle part (parcours complet du stockage)."""
+    rapport = analyser_orphelins(get_stockage(), get_db_connection, ALLOWED_EXTENSIONS, supprimer=True, logger=app.logger)
+    if rapport['fichiers_supprimes']:
+        balayer_fichiers()
+    return {
+        'orphelins': len(rapport['orphelins_detectes']),
+        'supprimes': len(rapport['fichiers_supprimes']),
+        'octets_liberes': rapport['espace_libere'],
+        'erreurs': rapport['erreurs']
+    }
+
+def taches_maintenance():
+    """Tâches de maintenance : (nom dans journal_maintenance, intervalle en secondes, fonction(conn))."""
+    fonctions = {
+        'balayage_fichiers': lambda conn: balayer_fichiers(),
+        'cache_images': lambda conn: get_cache_images().purger(),
+        'checkpoint_wal': lambda conn: _sur_chaque_base(point_de_controle_wal),
+        'tentatives_connexion': lambda conn: {
+            'supprimees': cleanup_old_attempts(get_security_db_connection, days=30, logger=app.logger)
+        },
+        'agregation_auth': lambda conn: {
+            'regroupees': agreger_anciens_logs(get_security_db_connection, app.config['AUTH_LOG_RETENTION_DAYS'], logger=app.logger)
+        },
+        'integrite': lambda conn: _verifier_et_restaurer(conn, corriger=True),
+        'optimisation': lambda conn: _sur_chaque_base(optimiser),
+        'orphelins': lambda conn: _supprimer_orphelins(),
+        'vacuum': lambda conn: _sur_chaque_base(vacuum_incremental),
+    }
+    intervalles = app.config['MAINTENANCE_INTERVALS']
+    return [(tache, intervalles[tache], fonction) for tache, fonction in fonctions.items()]
+
+def executer_maintenance(forcer=False, seulement=None):
+    """Exécute les tâches de maintenance dues (voir scripts/maintenance.py) et retourne leurs résultats."""
+    return executer_taches_dues(get_db_connection, taches_maintenance(), forcer, seulement, logger=app.logger)
+
+@app.cli.command('maintenance')
+@click.option('--forcer', is_flag=True, help='Exécute toutes les tâches actives, sans tenir compte des intervalles.')
+@click.option('--tache', 'taches', multiple=True, type=click.Choice(list(INTERVALLES_MAINTENANCE)),
+              help='Exécute seulement cette tâche (option répétable).')
+def commande_maintenance(forcer, taches):
+    """Exécute les tâches de maintenance dues (à lancer périodiquement, ex: timer systemd)."""
+    conn = get_db_connection()
+    try:
+        upgrade_db(conn)
+    finally:
+        conn.close()
+    preparer_base_securite()
+
+    resultats = executer_maintenance(forcer, taches)
+    for tache, resultat in resultats.items():
+        click.echo(f"{tache} : {json.dumps(resultat, ensure_ascii=False, default=str)}")
+    if not resultats:
+        click.echo('Aucune tâche due.')
+
+_reveil_balayeur = threading.Event()
+_balayeur = []
+
+def _boucle_balayeur():
+    """
+    Boucle du thread balayeur : réveillé après chaque suppression, et périodiquement
+    pour les purges et, si MAINTENANCE_SCHEDULER vaut 'app', les tâches de maintenance dues.
+    """
+    while True:
+        _reveil_balayeur.wait(app.config['FILE_SWEEPER_INTERVAL'])
+        _reveil_balayeur.clear()
+        try:
+            stats = balayer_fichiers()
+            if stats['quarantaine'] or stats['purges'] or stats['restaures']:
+                app.logger.info(f"Balayeur de fichiers : {stats['quarantaine']} mis en quarantaine, "
+                                f"{stats['restaures']} restauré(s), {stats['purges']} purgé(s) "
+                                f"({formater_taille_fichier(stats['octets_liberes'])})")
         except Exception as e:
-            app.logger.error(f"Erreur lors de l'optimisation de l'image {filename}: {e}")
-            # On ne bloque pas l'upload si l'optimisation échoue, l'image originale est déjà là
+            app.logger.error(f"Erreur du balayeur de fichiers: {e}", exc_info=True)
 
-        return 'database/uploads/' + filename
-    return None
+        if app.config['MAINTENANCE_SCHEDULER'] == 'app':
+            try:
+                executer_maintenance()
+            except Exception as e:
+                app.logger.error(f"Erreur des tâches de maintenance: {e}", exc_info=True)
 
-def generer_numero_inventaire(db_connection):
+def _verifier_et_restaurer(conn, corriger):
+    """Vérifie l'intégrité ; les fichiers référencés trouvés en quarantaine sont remis en place."""
+    rapport = verifier_integrite(conn, get_stockage().exists, corriger=corriger)
+    if corriger and rapport['references_en_quarantaine']:
+        balayer_fichiers()
+    return rapport
+
+def verifier_base(corriger=True):
     """
-    Génère le prochain numéro d'inventaire disponible au format INV_IC2_xxxx.
-    Cherche le premier nombre disponible en partant de 0.
+    Vérifie l'intégrité de la base (voir scripts/integrite.py) et enregistre le rapport
+    dans le journal de maintenance affiché sur le tableau de bord.
     """
-    conn = db_connection()
-    rows = conn.execute('SELECT numero_inventaire FROM objets').fetchall()
-    conn.close()
+    conn = get_db_connection()
+    try:
+        return executer_tache(
+            conn, 'integrite', lambda: _verifier_et_restaurer(conn, corriger)
+        )
+    finally:
+        conn.close()
 
-    existing_numbers = set()
-    pattern = re.compile(r'^INV_IC2_(\d{4})$')
+def signaler_suppressions():
+    """
+    Réveille le balayeur de fichiers du processus (démarré au premier appel).
 
-    for row in rows:
-        inv_num = row['numero_inventaire']
-        if inv_num:
-            match = pattern.match(inv_num)
-            if match:
-                existing_numbers.add(int(match.group(1)))
+    La requête n'attend pas : les suppressions sont déjà enregistrées en base.
+    En mode test ou si FILE_SWEEPER_INTERVAL vaut 0, aucun thread n'est démarré
+    (le balayage se fait via balayer_fichiers ou le script de maintenance).
+    """
+    if demarrer_balayeur():
+        _reveil_balayeur.set()
 
-    next_num = 0
-    while next_num in existing_numbers:
-        next_num += 1
+def demarrer_balayeur():
+    """
+    Démarre le balayeur du processus s'il ne tourne pas encore (appelé dès la
+    première requête, pour que les tâches périodiques tournent sans attendre une suppression).
 
-    return f'INV_IC2_{next_num:04d}'
+    Returns:
+        bool: True si le balayeur est actif
+    """
+    if app.testing or not app.config['FILE_SWEEPER_INTERVAL']:
+        return False
+    if not _balayeur:
+        thread = threading.Thread(target=_boucle_balayeur, name='balayeur-fichiers', daemon=True)
+        _balayeur.append(thread)
+        thread.start()
+    return True
+
+def generer_numero_inventaire(db_connection):
+    """
+    Réserve et retourne le prochain numéro d'inventaire disponible au format INV_IC2_xxxx.
+    Le numéro reste réservé pour la session de l'administrateur (voir scripts/numerotation.py).
+    """
+    jeton = session.setdefault('jeton_inventaire', uuid.uuid4().hex)
+    return reserver_numero(db_connection, jeton)
 
 def numero_inventaire_existe(numero, exclude_id=None):
     """
@@ -355,6 +768,96 @@ def numero_inventaire_existe(numero, exclude_id=None):
     # Si le compte est supérieur à 0, le numéro existe déjà
     return result[0] > 0
 
+def empreinte_gabarits(*noms):
+    """
+    Calcule l'empreinte des gabarits Jinja (ou fichiers sources) qui déterminent un rendu.
+
+    Les noms commençant par 'static/' ou 'scripts/' sont lus comme des fichiers,
+    les autres sont résolus par le chargeur de templates de Flask.
+    """
+    if noms in _empreintes_gabarits and not app.debug:
+        return _empreintes_gabarits[noms]
+
+    h = hashlib.sha1()
+    for nom in noms:
+        if nom.startswith(('static/', 'scripts/')):
+            with open(nom, 'rb') as f:
+                h.update(f.read())
+        else:
+            source = app.jinja_env.loader.get_source(app.jinja_env, nom)[0]
+            h.update(source.encode('utf-8'))
+
+    _empreintes_gabarits[noms] = h.hexdigest()[:16]
+    return _empreintes_gabarits[noms]
+
+def parse_date_base(valeur):
+    """Convertit une date stockée en base (heure locale) en datetime UTC, ou None."""
+    if not valeur:
+        return None
+    try:
+        return datetime.fromisoformat(str(valeur)).astimezone(timezone.utc)
+    except ValueError:
+        return None
+
+def validateurs_objet(id, variante, gabarits, par_utilisateur=False):
+    """
+    Calcule l'ETag et la date de dernière modification d'un objet en une lecture indexée.
+
+    L'ETag combine l'identifiant, la colonne `version`, le compteur data_version
+    de l'objet (images et liens), la variante (langue...), l'empreinte des gabarits
+    et, si demandé, l'utilisateur connecté.
+
+    Returns:
+        tuple: (etag, last_modified) ou None si l'objet n'existe pas
+    """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT o.version, o.date_modification, o.date_ajout, dv.version AS data_version
+        FROM objets o
+        LEFT JOIN data_version dv ON dv.scope = 'objet:' || o.id
+        WHERE o.id = ?
+    ''', (id,)).fetchone()
+    conn.close()
+
+    if row is None:
+        return None
+
+    utilisateur = ''
+    if par_utilisateur:
+        utilisateur = current_user.get_id() if current_user.is_authenticated else 'anonyme'
+
+    brut = f"{id}:{row['version']}:{row['data_version'] or 0}:{variante}:{utilisateur}:{empreinte_gabarits(*gabarits)}"
+    etag = hashlib.sha1(brut.encode('utf-8')).hexdigest()
+    last_modified = parse_date_base(row['date_modification']) or parse_date_base(row['date_ajout'])
+    return etag, last_modified
+
+def reponse_non_modifiee(etag, last_modified):
+    """Retourne une réponse 304 si la requête conditionnelle est satisfaite, sinon None."""
+    # Un message flash en attente doit être affiché : on ne répond pas 304
+    if '_flashes' in session:
+        return None
+
+    if request.if_none_match:
+        # If-None-Match est prioritaire sur If-Modified-Since (RFC 9110)
+        if not request.if_none_match.contains(etag):
+            return None
+    elif not (last_modified and request.if_modified_since and last_modified.replace(microsecond=0) <= request.if_modified_since):
+        return None
+
+    response = Response(status=304)
+    appliquer_validateurs(response, etag, last_modified)
+    return response
+
+def appliquer_validateurs(response, etag, last_modified):
+    """Ajoute ETag, Last-Modified et les en-têtes de revalidation à une réponse."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Le navigateur et le proxy gardent la réponse mais la revalident à chaque visite
+    response.headers['Cache-Control'] = 'private, no-cache' if current_user.is_authenticated else 'no-cache'
+    response.vary.add('Cookie')
+    return response
+
 # Routes d'authentification
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -370,7 +873,7 @@ def login():
         password = form.password.data
 
         # Vérifier si l'utilisateur n'est pas bloqué
-        allowed, message = check_login_attempts(username, request, get_db_connection, logger=app.logger)
+        allowed, message = check_login_attempts(username, request, get_security_db_connection, logger=app.logger)
         if not allowed:
             flash(message, 'error')
             return render_template('login.html', form=form)
@@ -380,7 +883,7 @@ def login():
         if user and user.verify_password(password):
             # Connexion réussie
             login_user(user)
-            reset_login_attempts(username, request, get_db_connection, logger=app.logger)  # Réinitialiser les tentatives
+            reset_login_attempts(username, request, get_security_db_connection, logger=app.logger)  # Réinitialiser les tentatives
 
             # Journaliser la connexion réussie
             log_auth_attempt(user.id, 'login', request)
@@ -400,7 +903,7 @@ def login():
             app.logger.warning(f'Tentative de connexion échouée pour {username}')
 
             # Incrémenter le compteur de tentatives
-            is_locked, message = increment_login_attempts(username, request, get_db_connection, logger=app.logger)
+            is_locked, message = increment_login_attempts(username, request, get_security_db_connection, logger=app.logger)
             flash(message, 'error')
 
     return render_template('login.html', form=form)
@@ -418,38 +921,61 @@ def logout():
     flash('Vous avez été déconnecté avec succès', 'success')
     return redirect(url_for('index'))
 
+def tirer_objets_au_hasard(conn, nombre=3):
+    """
+    Tire au hasard des identifiants d'objets distincts en temps constant.
+
+    On tire des identifiants dans l'intervalle [MIN(id), MAX(id)] (lecture directe
+    de l'index) et on retente en cas de trou dans la numérotation. Si la collection
+    est trop clairsemée, on complète avec les objets qui suivent un point tiré au
+    hasard, en repartant du début de l'index si nécessaire.
+    """
+    id_min, id_max = conn.execute('SELECT MIN(id), MAX(id) FROM objets').fetchone()
+    if id_min is None:
+        return []
+
+    ids = []
+    for _ in range(nombre * 10):
+        if len(ids) == nombre:
+            return ids
+        candidat = random.randint(id_min, id_max)
+        row = conn.execute('SELECT id FROM objets WHERE id = ?', (candidat,)).fetchone()
+        if row and row['id'] not in ids:
+            ids.append(row['id'])
+
+    depart = random.randint(id_min, id_max)
+    for condition in ('id >= ?', 'id < ?'):
+        manquants = nombre - len(ids)
+        if not manquants:
+            break
+        exclus = f" AND id NOT IN ({','.join(['?'] * len(ids))})" if ids else ''
+        rows = conn.execute(
+            f'SELECT id FROM objets WHERE {condition}{exclus} ORDER BY id LIMIT ?',
+            (depart, *ids, manquants)
+        ).fetchall()
+        ids.extend(row['id'] for row in rows)
+    return ids
+
+def rendre_carte_objet(id):
+    """Rend la carte HTML d'un objet, mise en cache jusqu'à la prochaine modification de l'objet."""
+    def charger(conn):
+        objet = conn.execute('SELECT * FROM objets WHERE id = ?', (id,)).fetchone()
+        return render_template('partials/objet_card.html', objet=objet) if objet else ''
+
+    return data_cache.get_or_load(get_db_connection, f'objet:{id}', 'carte', charger)
+
 # Routes de l'application
 @app.route('/random_object_fragment')
 def random_object_fragment():
     """Retourne le fragment HTML de trois objets au hasard."""
     conn = get_db_connection()
-    objets = conn.execute('SELECT * FROM objets ORDER BY RANDOM() LIMIT 3').fetchall()
+    ids = tirer_objets_au_hasard(conn, 3)
     conn.close()
 
-    if not objets:
+    if not ids:
         return '<p>Aucun objet dans la collection.</p>'
 
-    html_parts = []
-    for objet in objets:
-        image_style = ''
-        if objet['image_principale']:
-            image_url = url_for('static', filename=objet['image_principale'])
-            image_style = f'style="background-image: url(\'{image_url}\')"'
-        
-        html_parts.append(f'''
-        <div class="objet-card">
-            <a href="{url_for('detail_objet', id=objet['id'])}">
-                <div class="objet-image {'default-image' if not objet['image_principale'] else ''}" {image_style}></div>
-                <div class="objet-info">
-                    <h3>{objet['nom']}</h3>
-                    <p class="objet-categorie">{objet['categorie']}</p>
-                    <p class="objet-fabricant">{objet['fabricant']}{f" ({objet['date_fabrication']})" if objet['date_fabrication'] else ""}</p>
-                </div>
-            </a>
-        </div>
-        ''')
-    
-    return "".join(html_parts)
+    return "".join(rendre_carte_objet(id) for id in ids)
 
 @app.route('/')
 def index():
@@ -469,15 +995,180 @@ def martial_vivet():
     """Affiche la biographie de Martial Vivet."""
     return render_template('martial_vivet.html')
 
+def cle_upload_publique(filename):
+    """
+    Indique si un chemin demandé désigne un upload publiable.
+
+    Refuse les chemins sortant du dossier, ainsi que les fichiers et dossiers
+    cachés (quarantaine des suppressions, fichiers temporaires d'écriture).
+    """
+    return safe_join('', filename) is not None and not any(
+        partie.startswith('.') for partie in filename.split('/')
+    )
+
 # Route pour servir les fichiers depuis database/uploads
 @app.route('/static/database/uploads/<path:filename>')
 def serve_upload(filename):
-    """Sert les fichiers uploadés (images) depuis le dossier sécurisé."""
-    return send_from_directory('database/uploads', filename)
+    """
+    Sert les fichiers uploadés (images) depuis le dossier sécurisé.
+
+    La variante AVIF ou WebP de l'image est envoyée aux navigateurs qui
+    l'annoncent dans leur en-tête Accept ; les autres reçoivent l'original.
+    """
+    if not cle_upload_publique(filename):
+        abort(404)
+
+    stockage = get_stockage()
+    types_acceptes = {mimetype for mimetype, qualite in request.accept_mimetypes if qualite > 0}
+    variante = image_pipeline.choisir_variante(filename, types_acceptes, stockage.exists)
+    cle, mimetype = variante or (filename, None)
+
+    url_publique = stockage.url(cle)
+    if url_publique:
+        # Stockage distant public (CDN, bucket) : le navigateur y est redirigé
+        response = redirect(url_publique)
+    elif stockage.chemin_local(cle):
+        response = envoyer_fichier_local(
+            os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), cle, mimetype,
+            app.config['UPLOAD_ACCEL_PREFIX'], etag_upload(cle)
+        )
+    else:
+        # Stockage distant privé : l'application relaie le contenu
+        infos = stockage.stat(cle)
+        if infos is None:
+            abort(404)
+        response = send_file(
+            io.BytesIO(stockage.get(cle)), mimetype=mimetype or mimetypes.guess_type(cle)[0],
+            conditional=True, etag=etag_upload(cle) or hashlib.sha1(f"{cle}:{infos['taille']}".encode()).hexdigest(),
+            last_modified=infos['modifie_le']
+        )
+    response.vary.add('Accept')
+    return cache_immuable(response, cle)
+
+def etag_upload(cle):
+    """
+    ETag fort d'un fichier adressé par contenu : son empreinte (et le format de la variante).
+
+    Retourne None pour les anciens noms, dont le contenu peut encore être réécrit.
+    """
+    if not image_pipeline.est_adresse_par_contenu(cle):
+        return None
+    return os.path.basename(cle).replace('.', '-')
+
+def envoyer_fichier_local(dossier, cle, mimetype, prefixe_accel, etag=None):
+    """
+    Envoie un fichier du disque local selon UPLOAD_SERVE_MODE.
+
+    En mode 'x-accel' ou 'x-sendfile', l'application ne fait que les vérifications
+    et les en-têtes : le serveur web envoie lui-même les octets, sans occuper de
+    worker Gunicorn. En mode 'flask', send_file gère les requêtes conditionnelles
+    (304) et partielles (Range, 206).
+
+    Args:
+        dossier: Dossier contenant le fichier
+        cle: Chemin relatif du fichier dans ce dossier
+        mimetype: Type MIME (deviné d'après l'extension si None)
+        prefixe_accel: Location interne du serveur web correspondant au dossier
+        etag: ETag fort, ou None pour celui calculé par Flask (taille, date)
+    """
+    mode = app.config['UPLOAD_SERVE_MODE']
+
+    if mode == 'flask':
+        return send_from_directory(dossier, cle, mimetype=mimetype, conditional=True, etag=etag or True)
+
+    chemin = safe_join(dossier, cle)
+    if chemin is None or not os.path.isfile(chemin):
+        abort(404)
+    if mode == 'x-accel':
+        entete, valeur = 'X-Accel-Redirect', prefixe_accel.rstrip('/') + '/' + cle
+    elif mode == 'x-sendfile':
+        entete, valeur = 'X-Sendfile', os.path.abspath(chemin)
+    else:
+        raise ValueError(f"UPLOAD_SERVE_MODE inconnu : {mode}")
+
+    response = Response(mimetype=mimetype or mimetypes.guess_type(cle)[0] or 'application/octet-stream')
+    if etag:
+        response.set_etag(etag)
+        if etag in request.if_none_match:
+            # Inutile de solliciter le serveur web : le navigateur a déjà ce fichier
+            response.status_code = 304
+            return response
+    response.headers[entete] = valeur
+    return response
+
+def cache_immuable(response, cle):
+    """Marque une réponse immuable si le fichier est nommé d'après son contenu."""
+    if image_pipeline.est_adresse_par_contenu(cle) and response.status_code in (200, 206, 302, 304):
+        # Le nom dépend du contenu : il ne changera jamais, le navigateur n'a pas à revalider
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/img/<taille>/<path:filename>')
+def image_redimensionnee(taille, filename):
+    """
+    Sert une image uploadée réduite à l'une des tailles autorisées (IMAGE_SIZES).
+
+    Le dérivé est calculé à la première demande (au format AVIF/WebP si le
+    navigateur l'accepte), puis servi depuis le cache disque comme un fichier statique.
+    """
+    if taille not in app.config['IMAGE_SIZES'] or not cle_upload_publique(filename):
+        abort(404)
+    largeur, hauteur = (int(dimension) for dimension in taille.split('x'))
+
+    types_acceptes = {mimetype for mimetype, qualite in request.accept_mimetypes if qualite > 0}
+    # Le dérivé est produit à la demande : toute variante acceptée par le navigateur convient
+    variante = image_pipeline.choisir_variante(filename, types_acceptes, lambda chemin: True)
+    cle, mimetype = variante or (filename, None)
+
+    cache = get_cache_images()
+    try:
+        cache.obtenir(f'{taille}/{cle}', lambda: image_pipeline.encoder_miniature(
+            get_stockage().get(filename), (largeur, hauteur), variante and cle[len(filename):]
+        ))
+    except FileNotFoundError:
+        abort(404)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # Image que Pillow ne sait pas réduire : l'original est servi à la place
+        app.logger.error(f"Réduction impossible de {filename} en {taille}: {e}")
+        return redirect(url_for('serve_upload', filename=filename))
+
+    etag = etag_upload(cle)
+    response = envoyer_fichier_local(
+        cache.racine, f'{taille}/{cle}', mimetype, app.config['IMAGE_CACHE_ACCEL_PREFIX'],
+        etag and f'{taille}-{etag}'
+    )
+    response.vary.add('Accept')
+    return cache_immuable(response, cle)
+
+@app.template_filter('miniature')
+def url_miniature(chemin, taille):
+    """Filtre Jinja : URL d'une image uploadée réduite à une taille autorisée (ou de l'original)."""
+    if chemin and chemin.startswith(PREFIXE_UPLOADS) and taille in app.config['IMAGE_SIZES']:
+        return url_for('image_redimensionnee', taille=taille, filename=chemin[len(PREFIXE_UPLOADS):])
+    return url_for('static', filename=chemin)
+
+def rendre_apercu(objet):
+    """Rend le fragment HTML de prévisualisation au survol d'un objet."""
+    image_url = url_for('static', filename=objet['image_principale']) if objet['image_principale'] else None
+    
+    # Tronquer la description
+    description = objet['description'] or ""
+    if len(description) > 150:
+        description = description[:147] + "..."
+
+    return render_template('partials/objet_preview.html', objet=objet, image_url=image_url, description=description)
 
 @app.route('/api/objet_preview/<int:id>')
 def objet_preview(id):
     """Retourne un fragment HTML léger pour la prévisualisation au survol."""
+    validateurs = validateurs_objet(id, 'preview', ('partials/objet_preview.html',))
+    if validateurs is None:
+        return '', 404
+
+    non_modifiee = reponse_non_modifiee(*validateurs)
+    if non_modifiee:
+        return non_modifiee
+
     conn = get_db_connection()
     objet = conn.execute('SELECT * FROM objets WHERE id = ?', (id,)).fetchone()
     conn.close()
@@ -485,18 +1176,65 @@ def objet_preview(id):
     if not objet:
         return '', 404
 
-    image_url = url_for('static', filename=objet['image_principale']) if objet['image_principale'] else None
-    
-    # Tronquer la description
-    description = objet['description'] or ""
-    if len(description) > 150:
-        description = description[:147] + "..."
+    response = make_response(rendre_apercu(objet))
+    return appliquer_validateurs(response, *validateurs)
 
-    return render_template('partials/objet_preview.html', objet=objet, image_url=image_url, description=description)
+@app.route('/api/objet_previews')
+def objet_previews():
+    """
+    Retourne en JSON les aperçus au survol de plusieurs objets ({id: html}).
+
+    Les identifiants sont passés dans le paramètre `ids` (ex: ?ids=3,8,12).
+    Les objets inexistants sont simplement absents de la réponse.
+    """
+    try:
+        ids = sorted({int(x) for x in request.args.get('ids', '').split(',') if x.strip()})
+    except ValueError:
+        return jsonify({'error': 'Paramètre ids invalide'}), 400
+
+    if not ids:
+        return jsonify({})
+    if len(ids) > MAX_APERCUS_PAR_LOT:
+        return jsonify({'error': f'Au plus {MAX_APERCUS_PAR_LOT} aperçus par requête'}), 400
+
+    placeholders = ','.join(['?'] * len(ids))
+    conn = get_db_connection()
+
+    # ETag calculé à partir des versions seules, avant de charger et rendre les fiches
+    versions = conn.execute(f'''
+        SELECT o.id, o.version, dv.version AS data_version
+        FROM objets o
+        LEFT JOIN data_version dv ON dv.scope = 'objet:' || o.id
+        WHERE o.id IN ({placeholders})
+        ORDER BY o.id
+    ''', ids).fetchall()
+    brut = ';'.join(f"{row['id']}:{row['version']}:{row['data_version'] or 0}" for row in versions)
+    brut += ':' + empreinte_gabarits('partials/objet_preview.html')
+    etag = hashlib.sha1(brut.encode('utf-8')).hexdigest()
+
+    non_modifiee = reponse_non_modifiee(etag, None)
+    if non_modifiee:
+        conn.close()
+        return non_modifiee
+
+    objets = conn.execute(f'SELECT * FROM objets WHERE id IN ({placeholders})', ids).fetchall()
+    conn.close()
+
+    response = jsonify({str(objet['id']): rendre_apercu(objet) for objet in objets})
+    return appliquer_validateurs(response, etag, None)
 
 @app.route('/objet/<int:id>')
 def detail_objet(id):
     """Affiche la page de détail d'un objet spécifique."""
+    # Le rendu dépend de l'utilisateur (boutons d'administration) et des libellés de categories.json
+    validateurs = validateurs_objet(id, 'detail', ('detail.html', 'base.html', 'partials/images.html', 'static/categories.json'), par_utilisateur=True)
+    if validateurs is None:
+        abort(404)
+
+    non_modifiee = reponse_non_modifiee(*validateurs)
+    if non_modifiee:
+        return non_modifiee
+
     conn = get_db_connection()
 
     # Récupérer les informations de l'objet
@@ -547,7 +1285,8 @@ def detail_objet(id):
     ).fetchall()
 
     conn.close()
-    return render_template('detail.html', objet=objet_modifiable, images=images, liens=liens)
+    response = make_response(render_template('detail.html', objet=objet_modifiable, images=images, liens=liens))
+    return appliquer_validateurs(response, *validateurs)
 
 @app.route('/recherche')
 def recherche():
@@ -629,27 +1368,15 @@ def categories():
     json_categories_info = get_categories_info()
     json_categories = list(json_categories_info.keys())
 
-    # Récupérer aussi les catégories personnalisées de la base de données
-    conn = get_db_connection()
-    db_categories = []
-
-    if json_categories:
-        placeholders = ','.join(['?'] * len(json_categories))
-        db_categories = [row['categorie'] for row in conn.execute(
-            f'SELECT DISTINCT categorie FROM objets WHERE categorie NOT IN ({placeholders})',
-            json_categories
-        ).fetchall()]
-    else:
-        db_categories = [row['categorie'] for row in conn.execute(
-            'SELECT DISTINCT categorie FROM objets'
-        ).fetchall()]
-
-    # Récupérer le nombre d'objets par catégorie
-    counts = {row['categorie']: row['count'] for row in conn.execute(
-        'SELECT categorie, COUNT(*) as count FROM objets GROUP BY categorie'
-    ).fetchall()}
+    # Récupérer le nombre d'objets par catégorie (mis en cache jusqu'à la prochaine écriture)
+    counts = data_cache.get_or_load(get_db_connection, 'objets', 'categories_counts', lambda conn: {
+        row['categorie']: row['count'] for row in conn.execute(
+            'SELECT categorie, COUNT(*) as count FROM objets GROUP BY categorie'
+        ).fetchall()
+    })
 
-    conn.close()
+    # Récupérer aussi les catégories personnalisées de la base de données
+    db_categories = [cat for cat in counts if cat is not None and cat not in json_categories_info]
 
     # Combiner les deux sources
     all_categories = sorted(json_categories + db_categories)
@@ -673,19 +1400,23 @@ def categories():
 @app.route('/categorie/<categorie>')
 def objets_par_categorie(categorie):
     """Affiche les objets appartenant à une catégorie spécifique."""
-    conn = get_db_connection()
-    objets = conn.execute('SELECT * FROM objets WHERE categorie = ? ORDER BY date_fabrication ASC', (categorie,)).fetchall()
-
-    # Stats par année pour cette catégorie (Répartition temporelle)
-    stats_annees = conn.execute('''
-        SELECT SUBSTR(date_fabrication, 1, 4) as annee, COUNT(*) as count
-        FROM objets
-        WHERE categorie = ? AND date_fabrication IS NOT NULL AND date_fabrication != ''
-        GROUP BY annee
-        ORDER BY annee ASC
-    ''', (categorie,)).fetchall()
-
-    conn.close()
+    def charger_categorie(conn):
+        objets = conn.execute('SELECT * FROM objets WHERE categorie = ? ORDER BY date_fabrication ASC', (categorie,)).fetchall()
+
+        # Stats par année pour cette catégorie (Répartition temporelle)
+        stats_annees = conn.execute('''
+            SELECT SUBSTR(date_fabrication, 1, 4) as annee, COUNT(*) as count
+            FROM objets
+            WHERE categorie = ? AND date_fabrication IS NOT NULL AND date_fabrication != ''
+            GROUP BY annee
+            ORDER BY annee ASC
+        ''', (categorie,)).fetchall()
+
+        return objets, stats_annees
+
+    objets, stats_annees = data_cache.get_or_load(
+        get_db_connection, f'categorie:{categorie}', 'page', charger_categorie
+    )
 
     # Récupérer la description de la catégorie depuis le JSON
     description = None
@@ -698,31 +1429,35 @@ def objets_par_categorie(categorie):
 @app.route('/collection')
 def collection():
     """Affiche toute la collection sous forme de tableau triable"""
-    conn = get_db_connection()
-    objets = conn.execute('''
-        SELECT id, nom, categorie, fabricant, date_fabrication, numero_inventaire
-        FROM objets
-        ORDER BY nom ASC
-    ''').fetchall()
-
-    # Stats par année pour le graphique
-    stats_annees = conn.execute('''
-        SELECT SUBSTR(date_fabrication, 1, 4) as annee, COUNT(*) as count
-        FROM objets
-        WHERE date_fabrication IS NOT NULL AND date_fabrication != ''
-        GROUP BY annee
-        ORDER BY annee ASC
-    ''').fetchall()
-
-    # Stats par catégorie pour le graphique
-    stats_categories = conn.execute('''
-        SELECT categorie, COUNT(*) as count 
-        FROM objets 
-        GROUP BY categorie 
-        ORDER BY categorie ASC
-    ''').fetchall()
-
-    conn.close()
+    def charger_collection(conn):
+        objets = conn.execute('''
+            SELECT id, nom, categorie, fabricant, date_fabrication, numero_inventaire
+            FROM objets
+            ORDER BY nom ASC
+        ''').fetchall()
+
+        # Stats par année pour le graphique
+        stats_annees = conn.execute('''
+            SELECT SUBSTR(date_fabrication, 1, 4) as annee, COUNT(*) as count
+            FROM objets
+            WHERE date_fabrication IS NOT NULL AND date_fabrication != ''
+            GROUP BY annee
+            ORDER BY annee ASC
+        ''').fetchall()
+
+        # Stats par catégorie pour le graphique
+        stats_categories = conn.execute('''
+            SELECT categorie, COUNT(*) as count 
+            FROM objets 
+            GROUP BY categorie 
+            ORDER BY categorie ASC
+        ''').fetchall()
+
+        return objets, stats_annees, stats_categories
+
+    objets, stats_annees, stats_categories = data_cache.get_or_load(
+        get_db_connection, 'objets', 'collection', charger_collection
+    )
     return render_template('collection.html', objets=objets, stats_annees=stats_annees, stats_categories=stats_categories)
 
 
@@ -734,7 +1469,8 @@ def timeline():
     conn = get_db_connection()
     
     query = '''
-        SELECT id, nom, categorie, fabricant, date_fabrication, image_principale, description
+        SELECT id, nom, categorie, fabricant, date_fabrication, image_principale, description,
+               image_largeur, image_hauteur, image_couleur, image_lqip
         FROM objets 
         WHERE date_fabrication IS NOT NULL AND date_fabrication != ''
     '''
@@ -770,12 +1506,18 @@ def timeline():
 @app.route('/liens')
 def liens():
     """Affiche la page des liens utiles."""
-    try:
-        with open('static/liens.json', 'r', encoding='utf-8') as f:
-            liens_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        liens_data = []
-    return render_template('liens.html', categories_liens=liens_data)
+    return render_template('liens.html', categories_liens=charger_liens_utiles())
+
+def charger_liens_utiles():
+    """Charge static/liens.json, mis en cache sous la portée 'liens'."""
+    def lire_fichier(conn):
+        try:
+            with open('static/liens.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    return data_cache.get_or_load(get_db_connection, 'liens', 'liens.json', lire_fichier)
 
 @app.route('/admin/liens/edit', methods=['GET', 'POST'])
 @login_required
@@ -792,6 +1534,13 @@ def admin_edit_liens():
             # Sauvegarder avec une jolie mise en forme
             with open(json_path, 'w', encoding='utf-8') as f:
                 json.dump(parsed_json, f, indent=4, ensure_ascii=False)
+
+            # Invalider les caches des liens dans tous les workers
+            conn = get_db_connection()
+            bump_data_version(conn, 'liens')
+            conn.commit()
+            conn.close()
+            data_cache.invalidate('liens')
                 
             flash('La liste des liens a été mise à jour avec succès.', 'success')
             return redirect(url_for('liens'))
@@ -833,16 +1582,12 @@ def admin_edit_liens():
 
 def get_global_liens_urls():
     """Charge les URLs du fichier static/liens.json et les retourne sous forme de set."""
-    json_path = os.path.join('static', 'liens.json')
     global_urls = set()
     try:
-        if os.path.exists(json_path):
-            with open(json_path, 'r', encoding='utf-8') as f:
-                global_liens_data = json.load(f)
-                for category in global_liens_data:
-                    for lien in category.get('liens', []):
-                        if 'url' in lien and lien['url']:
-                            global_urls.add(lien['url'])
+        for category in charger_liens_utiles():
+            for lien in category.get('liens', []):
+                if 'url' in lien and lien['url']:
+                    global_urls.add(lien['url'])
     except Exception as e:
         app.logger.error(f"Erreur lors de la lecture de static/liens.json: {e}")
     return global_urls
@@ -978,7 +1723,8 @@ def admin():
     
     # 4. Derniers objets ajoutés (pour l'activité récente)
     derniers_objets = conn.execute('''
-        SELECT id, nom, categorie, numero_inventaire, date_ajout, image_principale 
+        SELECT id, nom, categorie, numero_inventaire, date_ajout, image_principale,
+               image_largeur, image_hauteur, image_couleur, image_lqip
         FROM objets 
         ORDER BY date_ajout DESC 
         LIMIT 5
@@ -992,7 +1738,13 @@ def admin():
         GROUP BY annee
         ORDER BY annee ASC
     ''').fetchall()
-    
+
+    # 6. Dernières exécutions des tâches de maintenance (dont la vérification d'intégrité)
+    try:
+        journal = lire_journal(conn)
+    except sqlite3.OperationalError:
+        journal = {}  # Base pas encore mise à niveau
+
     conn.close()
     
     return render_template('admin/dashboard.html',
@@ -1000,7 +1752,32 @@ def admin():
                            stats_categories=stats_categories,
                            stats_etats=stats_etats,
                            derniers_objets=derniers_objets,
-                           stats_annees=stats_annees)
+                           stats_annees=stats_annees,
+                           integrite=journal.get('integrite'),
+                           journal_maintenance=journal,
+                           libelles_maintenance=LIBELLES_MAINTENANCE,
+                           intervalles_maintenance=app.config['MAINTENANCE_INTERVALS'])
+
+@app.route('/admin/integrite', methods=['POST'])
+@login_required
+def admin_integrite():
+    """Lance la vérification d'intégrité de la base et corrige les anomalies trouvées."""
+    try:
+        rapport = verifier_base(corriger=True)
+    except sqlite3.Error as e:
+        app.logger.error(f"Erreur lors de la vérification d'intégrité: {e}")
+        flash("Erreur lors de la vérification d'intégrité.", 'error')
+        return redirect(url_for('admin'))
+
+    orphelines = sum(rapport['lignes_orphelines'].values())
+    app.logger.info(f"Vérification d'intégrité lancée par {current_user.username} : "
+                    f"{orphelines} ligne(s) orpheline(s), {len(rapport['references_sans_fichier'])} référence(s) morte(s)")
+    for erreur in rapport['erreurs']:
+        flash(erreur, 'warning')
+    signaler_suppressions()  # Fichiers libérés par les références retirées
+    flash(f"Vérification terminée : {orphelines} ligne(s) orpheline(s) et "
+          f"{len(rapport['references_sans_fichier'])} référence(s) vers des fichiers absents traitée(s).", 'success')
+    return redirect(url_for('admin'))
 
 @app.route('/admin/ajouter', methods=('GET', 'POST'))
 @login_required
@@ -1075,21 +1852,23 @@ def ajouter_objet():
                                                                         'attributs_specifiques': attributs_json
                                                                     })
         else:
-            conn = get_db_connection()
+            # Toutes les images sont traitées en parallèle, avant d'ouvrir la base
+            files = request.files.getlist('images_supplementaires')
+            image_infos, *images_infos = save_uploaded_files([request.files.get('image_principale')] + files)
 
             # Gestion de l'image principale
             image_principale_path = ''
-            if 'image_principale' in request.files:
-                file = request.files['image_principale']
-                image_path = save_uploaded_file(file)
-                if image_path:
-                    image_principale_path = image_path
+            apercu_principale = apercu_colonnes(None)
+            if image_infos:
+                image_principale_path = image_infos['chemin']
+                apercu_principale = apercu_colonnes(image_infos)
 
+            conn = get_db_connection()
             try:
                 # Insérer les informations de l'objet (sans l'URL dans la table principale)
                 cursor = conn.execute(
-                    'INSERT INTO objets (nom, description, description_en, categorie, fabricant, date_fabrication, numero_inventaire, image_principale, date_ajout, attributs_specifiques, origine) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                    (nom, description, description_en, categorie, fabricant, date_fabrication, numero_inventaire, image_principale_path, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), attributs_json, origine)
+                    'INSERT INTO objets (nom, description, description_en, categorie, fabricant, date_fabrication, numero_inventaire, image_principale, image_largeur, image_hauteur, image_couleur, image_lqip, date_ajout, attributs_specifiques, origine) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (nom, description, description_en, categorie, fabricant, date_fabrication, numero_inventaire, image_principale_path, *apercu_principale, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), attributs_json, origine)
                 )
 
                 objet_id = cursor.lastrowid
@@ -1103,18 +1882,16 @@ def ajouter_objet():
                             (objet_id, lien.strip(), i)
                         )
 
-                # Traitement des images supplémentaires
-                if 'images_supplementaires' in request.files:
-                    files = request.files.getlist('images_supplementaires')
-                    for i, file in enumerate(files):
-                        image_path = save_uploaded_file(file)
-                        if image_path:
-                            legende = request.form.get(f'legende_{i}', '')
-                            # Utiliser l'index comme ordre
-                            conn.execute(
-                                'INSERT INTO images (objet_id, chemin, legende, ordre) VALUES (?, ?, ?, ?)',
-                                (objet_id, image_path, legende, i)
-                            )
+                # Images supplémentaires (l'index sert d'ordre)
+                conn.executemany(
+                    'INSERT INTO images (objet_id, chemin, legende, ordre, largeur, hauteur, couleur, lqip) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(objet_id, infos['chemin'], request.form.get(f'legende_{i}', ''), i, *apercu_colonnes(infos))
+                     for i, infos in enumerate(images_infos) if infos]
+                )
+
+                # Le numéro proposé à cette session n'est plus réservé
+                if 'jeton_inventaire' in session:
+                    liberer_reservation(conn, session['jeton_inventaire'])
 
                 conn.commit()
                 conn.close()
@@ -1169,6 +1946,74 @@ def ajouter_objet():
         
     return render_template('admin/ajouter.html', objet=objet_initial)
 
+def maj_liens(conn, objet_id, liens_existants, urls):
+    """
+    Applique la liste de liens du formulaire en ne modifiant que les différences.
+
+    Un lien déjà présent (même URL) est conservé avec son titre ; seul son ordre
+    est mis à jour s'il a changé. Les autres sont supprimés ou insérés.
+
+    Args:
+        conn: Connexion SQLite ouverte (transaction en cours)
+        objet_id: Identifiant de l'objet
+        liens_existants: Lignes actuelles de la table liens pour cet objet
+        urls: URLs du formulaire, dans l'ordre d'affichage
+    """
+    disponibles = {}
+    for lien in liens_existants:
+        disponibles.setdefault(lien['url'], []).append(lien)
+
+    a_inserer, a_reordonner = [], []
+    for ordre, url in enumerate(u.strip() for u in urls if u.strip()):
+        if disponibles.get(url):
+            lien = disponibles[url].pop(0)
+            if lien['ordre'] != ordre:
+                a_reordonner.append((ordre, lien['id']))
+        else:
+            a_inserer.append((objet_id, url, ordre))
+
+    a_supprimer = [(lien['id'],) for restants in disponibles.values() for lien in restants]
+    if a_supprimer:
+        conn.executemany('DELETE FROM liens WHERE id = ?', a_supprimer)
+    if a_reordonner:
+        conn.executemany('UPDATE liens SET ordre = ? WHERE id = ?', a_reordonner)
+    if a_inserer:
+        conn.executemany('INSERT INTO liens (objet_id, url, ordre) VALUES (?, ?, ?)', a_inserer)
+
+def maj_images(conn, objet_id, images_existantes, ids_gardes, legendes, nouvelles):
+    """
+    Applique les images du formulaire en ne modifiant que les différences.
+
+    Args:
+        conn: Connexion SQLite ouverte (transaction en cours)
+        objet_id: Identifiant de l'objet
+        images_existantes: Lignes actuelles de la table images pour cet objet
+        ids_gardes: Identifiants des images conservées, dans l'ordre d'affichage
+        legendes: Légende de chaque image conservée ({id: légende})
+        nouvelles: Tuples (légende, infos de save_uploaded_file) des images ajoutées, à la suite
+    """
+    existantes = {image['id']: image for image in images_existantes}
+    # Seules les images de cet objet sont prises en compte
+    gardes = [image_id for image_id in dict.fromkeys(ids_gardes) if image_id in existantes]
+
+    a_supprimer = [(image_id,) for image_id in existantes if image_id not in set(gardes)]
+    a_modifier = []
+    for ordre, image_id in enumerate(gardes):
+        image, legende = existantes[image_id], legendes.get(image_id, '')
+        if (image['legende'] or '') != legende or image['ordre'] != ordre:
+            a_modifier.append((legende, ordre, image_id))
+
+    if a_supprimer:
+        conn.executemany('DELETE FROM images WHERE id = ?', a_supprimer)
+    if a_modifier:
+        conn.executemany('UPDATE images SET legende = ?, ordre = ? WHERE id = ?', a_modifier)
+    if nouvelles:
+        conn.executemany(
+            'INSERT INTO images (objet_id, chemin, legende, ordre, largeur, hauteur, couleur, lqip) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(objet_id, infos['chemin'], legende, len(gardes) + i, *apercu_colonnes(infos))
+             for i, (legende, infos) in enumerate(nouvelles)]
+        )
+
 @app.route('/admin/modifier/<int:id>', methods=('GET', 'POST'))
 @login_required
 def modifier_objet(id):
@@ -1264,18 +2109,21 @@ def modifier_objet(id):
         else:
             # Gestion de l'image principale
             image_principale_path = objet['image_principale']
-            if 'image_principale' in request.files:
-                file = request.files['image_principale']
-                image_path = save_uploaded_file(file)
-                if image_path:
-                    image_principale_path = image_path
+            apercu_principale = (objet['image_largeur'], objet['image_hauteur'], objet['image_couleur'], objet['image_lqip'])
+
+            # Toutes les images sont traitées en parallèle, avant toute écriture en base
+            files = request.files.getlist('nouvelles_images')
+            image_infos, *images_infos = save_uploaded_files([request.files.get('image_principale')] + files)
+            if image_infos:
+                image_principale_path = image_infos['chemin']
+                apercu_principale = apercu_colonnes(image_infos)
 
             # Mettre à jour les informations de l'objet (sans l'URL)
             current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             cursor = conn.execute(
-                'UPDATE objets SET nom = ?, description = ?, description_en = ?, categorie = ?, fabricant = ?, date_fabrication = ?, numero_inventaire = ?, image_principale = ?, attributs_specifiques = ?, etat = ?, origine = ?, date_modification = ?, version = version + 1 WHERE id = ? AND version = ?',
-                (nom, description, description_en, categorie, fabricant, date_fabrication, numero_inventaire, image_principale_path, attributs_json, etat, origine, current_datetime, id, version_soumise)
+                'UPDATE objets SET nom = ?, description = ?, description_en = ?, categorie = ?, fabricant = ?, date_fabrication = ?, numero_inventaire = ?, image_principale = ?, image_largeur = ?, image_hauteur = ?, image_couleur = ?, image_lqip = ?, attributs_specifiques = ?, etat = ?, origine = ?, date_modification = ?, version = version + 1 WHERE id = ? AND version = ?',
+                (nom, description, description_en, categorie, fabricant, date_fabrication, numero_inventaire, image_principale_path, *apercu_principale, attributs_json, etat, origine, current_datetime, id, version_soumise)
             )
             
             if cursor.rowcount == 0:
@@ -1284,75 +2132,22 @@ def modifier_objet(id):
                 flash('Conflit de modification critique : Cette fiche a été modifiée par un autre utilisateur au moment même où vous validiez. Vos modifications ont été annulées pour protéger les données. Veuillez recharger la page.', 'error')
                 return redirect(url_for('modifier_objet', id=id))
             
-            # Mise à jour des liens : on supprime tout et on recrée (plus simple)
-            conn.execute('DELETE FROM liens WHERE objet_id = ?', (id,))
-            
-            liens_form = request.form.getlist('liens')
-            for i, lien in enumerate(liens_form):
-                if lien.strip():
-                    conn.execute(
-                        'INSERT INTO liens (objet_id, url, ordre) VALUES (?, ?, ?)',
-                        (id, lien.strip(), i)
-                    )
-
-            # Traitement des images à conserver
-            images_to_keep = request.form.getlist('garder_image')
-
-            # Supprimer les images qui ne sont pas dans la liste à conserver
-            images_to_delete = []
-            if images_to_keep:
-                placeholders = ','.join(['?'] * len(images_to_keep))
-                images_to_delete = conn.execute(
-                    f'SELECT id, chemin FROM images WHERE objet_id = ? AND id NOT IN ({placeholders})',
-                    [id] + images_to_keep
-                ).fetchall()
-            else:
-                images_to_delete = conn.execute(
-                    'SELECT id, chemin FROM images WHERE objet_id = ?',
-                    (id,)
-                ).fetchall()
-
-            # Supprimer les fichiers physiques des images
-            for image in images_to_delete:
-                try:
-                    file_path = os.path.join('static', image['chemin'])
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except Exception as e:
-                    app.logger.error(f"Erreur lors de la suppression du fichier {image['chemin']}: {e}")
-
-            # Supprimer les entrées dans la base de données
-            if not images_to_keep:
-                conn.execute('DELETE FROM images WHERE objet_id = ?', (id,))
-            else:
-                placeholders = ','.join(['?'] * len(images_to_keep))
-                conn.execute(
-                    f'DELETE FROM images WHERE objet_id = ? AND id NOT IN ({placeholders})',
-                    [id] + images_to_keep
-                )
-
-            # Mettre à jour les légendes et l'ordre des images existantes
-            for index, image_id in enumerate(images_to_keep):
-                legende = request.form.get(f'legende_{image_id}', '')
-                conn.execute('UPDATE images SET legende = ?, ordre = ? WHERE id = ?', (legende, index, image_id))
-
-            # Traitement des nouvelles images
-            if 'nouvelles_images' in request.files:
-                files = request.files.getlist('nouvelles_images')
-                # Obtenir l'ordre maximum actuel
-                max_ordre = conn.execute('SELECT MAX(ordre) FROM images WHERE objet_id = ?', (id,)).fetchone()[0] or 0
-
-                for i, file in enumerate(files):
-                    image_path = save_uploaded_file(file)
-                    if image_path:
-                        legende = request.form.get(f'nouvelle_legende_{i}', '')
-                        conn.execute(
-                            'INSERT INTO images (objet_id, chemin, legende, ordre) VALUES (?, ?, ?, ?)',
-                            (id, image_path, legende, max_ordre + i + 1)
-                        )
+            # Liens et images : seules les différences avec la base sont écrites
+            maj_liens(conn, id, liens, request.form.getlist('liens'))
+
+            ids_gardes = [int(image_id) for image_id in request.form.getlist('garder_image') if image_id.isdigit()]
+            maj_images(
+                conn, id, images, ids_gardes,
+                {image_id: request.form.get(f'legende_{image_id}', '') for image_id in ids_gardes},
+                [(request.form.get(f'nouvelle_legende_{i}', ''), infos) for i, infos in enumerate(images_infos) if infos]
+            )
 
             conn.commit()
             conn.close()
+
+            # Les fichiers devenus sans référence ont été inscrits dans la file de suppression
+            signaler_suppressions()
+
             app.logger.info(f'Objet "{nom}" (ID: {id}) modifié par {current_user.username}')
             flash('Objet modifié avec succès !', 'success')
             return redirect(url_for('detail_objet', id=id))
@@ -1368,50 +2163,101 @@ def supprimer_objet(id):
     # Récupérer l'objet avant suppression pour la journalisation
     objet = conn.execute('SELECT nom FROM objets WHERE id = ?', (id,)).fetchone()
 
-    # Récupérer les chemins des images pour pouvoir les supprimer du système de fichiers
-    images = conn.execute('SELECT chemin FROM images WHERE objet_id = ?', (id,)).fetchall()
-    image_principale = conn.execute('SELECT image_principale FROM objets WHERE id = ?', (id,)).fetchone()
-
-    # Supprimer l'objet (la contrainte CASCADE supprimera aussi les images dans la base)
+    # Supprimer l'objet : ses images et liens suivent (ON DELETE CASCADE, qui déclenche
+    # aussi les triggers de `fichiers`) ; les fichiers devenus sans référence sont
+    # inscrits dans la file de suppression
     conn.execute('DELETE FROM objets WHERE id = ?', (id,))
     conn.commit()
     conn.close()
-
-    # Supprimer les fichiers d'images du système de fichiers
-    for image in images:
-        if image['chemin']:
-            try:
-                file_path = os.path.join('static', image['chemin'])
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                app.logger.error(f"Erreur lors de la suppression du fichier {image['chemin']}: {e}")
-
-    # Supprimer l'image principale
-    if image_principale and image_principale['image_principale']:
-        try:
-            file_path = os.path.join('static', image_principale['image_principale'])
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            app.logger.error(f"Erreur lors de la suppression de l'image principale: {e}")
+    signaler_suppressions()
 
     if objet:
         app.logger.info(f'Objet "{objet["nom"]}" (ID: {id}) supprimé par {current_user.username}')
     flash('Objet supprimé avec succès !', 'success')
     return redirect(url_for('admin'))
 
+@app.route('/admin/objets/lot', methods=['POST'])
+@login_required
+def action_groupee():
+    """
+    Applique une action à plusieurs objets en une seule requête et une seule transaction.
+
+    Corps JSON : {"ids": [3, 8, 12], "action": "categorie" | "etat" | "supprimer", "valeur": "..."}
+    Chaque objet modifié voit sa version incrémentée une fois ; les fichiers libérés
+    par une suppression passent par la file de suppression différée.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corps JSON invalide'}), 400
+    action = data.get('action')
+    valeur = data.get('valeur') or ''
+    if not isinstance(valeur, str):
+        return jsonify({'error': 'Paramètre valeur invalide'}), 400
+    valeur = valeur.strip()
+    if not isinstance(data.get('ids', []), list):
+        return jsonify({'error': 'Paramètre ids invalide'}), 400
+    try:
+        ids = sorted({int(x) for x in data.get('ids', [])})
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Paramètre ids invalide'}), 400
+
+    if action not in ('categorie', 'etat', 'supprimer'):
+        return jsonify({'error': 'Action inconnue'}), 400
+    if not ids:
+        return jsonify({'error': 'Aucun objet sélectionné'}), 400
+    if len(ids) > MAX_OBJETS_PAR_LOT:
+        return jsonify({'error': f'Au plus {MAX_OBJETS_PAR_LOT} objets par action groupée'}), 400
+    if action == 'categorie' and not valeur:
+        return jsonify({'error': 'La catégorie est obligatoire!'}), 400
+
+    placeholders = ','.join(['?'] * len(ids))
+    conn = get_db_connection()
+    try:
+        if action == 'supprimer':
+            # Images et liens suivent (ON DELETE CASCADE) ; les fichiers devenus sans
+            # référence sont inscrits dans la file de suppression par les triggers
+            cursor = conn.execute(f'DELETE FROM objets WHERE id IN ({placeholders})', ids)
+        else:
+            # Seuls les objets dont la valeur change sont réécrits (et leur version incrémentée)
+            current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor = conn.execute(
+                f'UPDATE objets SET {action} = ?, date_modification = ?, version = version + 1 '
+                f'WHERE id IN ({placeholders}) AND {action} IS NOT ?',
+                [valeur, current_datetime, *ids, valeur]
+            )
+        conn.commit()
+        modifies = cursor.rowcount
+    except sqlite3.Error as e:
+        conn.rollback()
+        app.logger.error(f"Erreur lors de l'action groupée '{action}': {e}")
+        return jsonify({'error': "Erreur lors de l'action groupée"}), 500
+    finally:
+        conn.close()
+
+    if action == 'supprimer':
+        signaler_suppressions()
+    app.logger.info(f"Action groupée '{action}' ({valeur}) sur {modifies} objet(s) par {current_user.username}")
+    return jsonify({'action': action, 'selectionnes': len(ids), 'modifies': modifies})
+
 @app.route('/admin/security', methods=['GET'])
 @login_required
 def admin_security():
     """Page d'administration pour visualiser l'état des tentatives de connexion"""
-    # Nettoyer les anciennes tentatives à chaque visite de la page
-    cleanup_old_attempts(get_db_connection, days=30, logger=app.logger)
-
+    # Le nettoyage des anciennes tentatives est une tâche de maintenance (voir taches_maintenance)
     # Récupérer l'état actuel
-    login_status = get_login_attempts_status(get_db_connection)
+    login_status = get_login_attempts_status(get_security_db_connection)
+
+    # Journal d'authentification : résumé quotidien (agrégats et détail) et détail paginé
+    journal_auth.vider()  # Inclure les événements encore en file
+    par_jour, echecs_par_ip = resume_journal(get_security_db_connection, jours=30)
+    activite = {}
+    for ligne in par_jour:
+        activite.setdefault(ligne['jour'], {})[ligne['action']] = ligne['nombre']
+    evenements, page_suivante = lire_evenements(get_security_db_connection, avant=request.args.get('avant', type=int))
 
-    return render_template('admin/security.html', login_status=login_status)
+    return render_template('admin/security.html', login_status=login_status, activite=activite,
+                           echecs_par_ip=echecs_par_ip, evenements=evenements, page_suivante=page_suivante,
+                           retention=app.config['AUTH_LOG_RETENTION_DAYS'])
 
 @app.route('/admin/export/csv')
 @login_required
@@ -1462,9 +2308,19 @@ def export_csv():
 @app.route('/objet/<int:id>/pdf')
 def generate_pdf(id):
     """Génère et sert le fichier PDF de la fiche de l'objet."""
-    conn = get_db_connection()
     lang = request.args.get('lang', 'fr')
 
+    # Le QR code du PDF contient l'URL de base : elle fait partie de la variante
+    validateurs = validateurs_objet(id, f'pdf:{lang}:{request.url_root}', ('scripts/pdf_generator.py',))
+    if validateurs is None:
+        abort(404)
+
+    non_modifiee = reponse_non_modifiee(*validateurs)
+    if non_modifiee:
+        return non_modifiee
+
+    conn = get_db_connection()
+
     # Récupérer les informations de l'objet
     objet = conn.execute('SELECT * FROM objets WHERE id = ?', (id,)).fetchone()
     if objet is None:
@@ -1486,15 +2342,16 @@ def generate_pdf(id):
 
     # Générer le PDF
     base_url = request.url_root
-    pdf_buffer = pdf_generator.generate_object_pdf(objet, images, liens, base_url, lang=lang)
+    pdf_buffer = pdf_generator.generate_object_pdf(objet, images, liens, base_url, lang=lang, lire_image=lire_miniature)
 
     # Renvoyer le PDF comme fichier téléchargeable
-    return send_file(
+    response = send_file(
         pdf_buffer,
         as_attachment=True,
         download_name=f"{objet['nom']}-fiche-{lang}.pdf",
         mimetype='application/pdf'
     )
+    return appliquer_validateurs(response, *validateurs)
 
 @app.route('/objet/<int:id>/cartel')
 @login_required
@@ -1548,65 +2405,21 @@ def generate_qr_label(id):
 def nettoyer_fichiers():
     """Affiche la page de simulation du nettoyage des fichiers"""
     try:
-        # Exécuter la détection des orphelins sans suppression (simulation)
-        # Code spécifique pour l'aperçu, ne supprime rien
         dossier_uploads = app.config['UPLOAD_FOLDER']
-        orphelins = []
-        erreurs = []
 
         # Vérifier que le dossier existe
-        if not os.path.exists(dossier_uploads):
+        if app.config['STORAGE_BACKEND'] == 'local' and not os.path.exists(dossier_uploads):
             flash(f"Le dossier {dossier_uploads} n'existe pas.", "error")
             return redirect(url_for('admin'))
 
-        # Récupérer tous les fichiers du dossier
-        fichiers_dossier = []
-        for fichier in os.listdir(dossier_uploads):
-            ext = fichier.split('.')[-1].lower() if '.' in fichier else ''
-            if ext in ALLOWED_EXTENSIONS:
-                fichiers_dossier.append(fichier)
-
-        # Récupérer les références de la base de données
-        fichiers_references = []
-        conn = get_db_connection()
-
-        # Images principales
-        images_principales = conn.execute(
-            "SELECT image_principale FROM objets WHERE image_principale IS NOT NULL AND image_principale != ''"
-        ).fetchall()
-
-        for img in images_principales:
-            nom_fichier = os.path.basename(img['image_principale'])
-            fichiers_references.append(nom_fichier)
-
-        # Images supplémentaires
-        images_supplementaires = conn.execute(
-            "SELECT chemin FROM images WHERE chemin IS NOT NULL AND chemin != ''"
-        ).fetchall()
-
-        for img in images_supplementaires:
-            nom_fichier = os.path.basename(img['chemin'])
-            fichiers_references.append(nom_fichier)
-
-        conn.close()
-
-        # Identifier les orphelins
-        for fichier in fichiers_dossier:
-            if fichier not in fichiers_references:
-                orphelins.append(fichier)
-
-        # Préparer les résultats pour l'affichage
-        resultats = {
-            "fichiers_dans_dossier": fichiers_dossier,
-            "images_referencees_db": fichiers_references,
-            "orphelins_detectes": orphelins,
-            "fichiers_supprimes": [],
-            "erreurs": erreurs
-        }
+        # Même moteur que le nettoyage réel, sans suppression
+        resultats = analyser_orphelins(get_stockage(), get_db_connection, ALLOWED_EXTENSIONS, supprimer=False)
 
         # Message d'information
+        orphelins = resultats['orphelins_detectes']
         if orphelins:
-            flash(f"Simulation: {len(orphelins)} fichier(s) orphelin(s) détecté(s).", 'info')
+            flash(f"Simulation: {len(orphelins)} fichier(s) orphelin(s) détecté(s), "
+                  f"{formater_taille_fichier(resultats['espace_libere'])} récupérables.", 'info')
         else:
             flash("Simulation: Aucun fichier orphelin détecté.", 'info')
 
@@ -1621,11 +2434,12 @@ def nettoyer_fichiers():
 @login_required
 def admin_post_nettoyage():
     """Exécute le nettoyage des fichiers et redirige vers la page d'administration"""
-    from scripts.clean_images import nettoyer_fichiers, formater_taille_fichier
-
     try:
-        # Exécuter le nettoyage réel avec la nouvelle fonction
-        resultat = nettoyer_fichiers(app, get_db_connection, ALLOWED_EXTENSIONS)
+        # Exécuter le nettoyage réel (même moteur que la simulation)
+        resultat = nettoyer_fichiers_orphelins(app, get_db_connection, ALLOWED_EXTENSIONS, get_stockage())
+        if resultat['fichiers_supprimes']:
+            # Mise en quarantaine immédiate, suppression définitive après FILE_DELETE_GRACE
+            balayer_fichiers()
 
         # Nombre de fichiers supprimés et espace libéré
         nb_fichiers = len(resultat['fichiers_supprimes'])
@@ -1640,7 +2454,8 @@ def admin_post_nettoyage():
 
         # Message à afficher
         if nb_fichiers > 0:
-            flash(f"Nettoyage terminé : {nb_fichiers} fichiers supprimés, {espace_texte} d'espace libéré.", 'success')
+            flash(f"Nettoyage terminé : {nb_fichiers} fichiers mis en quarantaine, {espace_texte} libérés "
+                  f"après le délai de grâce.", 'success')
         else:
             flash("Aucun fichier à supprimer n'a été trouvé.", 'info')
 
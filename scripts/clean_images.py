@@ -3,110 +3,216 @@ Module de nettoyage des images orphelines.
 
 Ce module permet d'identifier et de supprimer les fichiers images présents dans
 le dossier d'uploads mais qui ne sont plus référencés dans la base de données.
+
+Les références sont lues dans la table `fichiers` (tenue à jour par triggers) et
+comparées par ensembles ; la page d'administration et le nettoyage réel
+partagent le même moteur (`analyser_orphelins`).
+
+Les orphelins ne sont pas supprimés directement : ils sont confiés à la file
+des suppressions différées (voir scripts/suppressions.py), dont la
+quarantaine rend le fichier si une image identique est téléversée entre-temps.
 """
 
 import os
+import time
+import sqlite3
 
-def nettoyer_fichiers(app, get_db_connection, allowed_extensions):
-    """
-    Fonction de nettoyage simplifiée qui retourne des informations claires et cohérentes.
-    """
-    logger = app.logger
-    dossier_uploads = app.config['UPLOAD_FOLDER']
+from scripts.image_pipeline import PREFIXE_UPLOADS, fichier_source, chemins_variantes, nom_reference
+from scripts.storage import LocalStorage
+from scripts.suppressions import demander_suppression
 
-    # Résultat à retourner
-    resultat = {
-        'fichiers_supprimes': [],
-        'espace_libere': 0,
-        'erreurs': []
-    }
-
-    logger.info("=== DÉBUT DU NETTOYAGE ===")
+DELAI_GRACE = 3600  # Âge minimal (s) d'un fichier orphelin supprimable (upload en cours d'enregistrement)
 
-    # Vérifier que le dossier existe
-    if not os.path.exists(dossier_uploads):
-        msg = f"Le dossier {dossier_uploads} n'existe pas."
-        logger.error(msg)
-        resultat['erreurs'].append(msg)
-        return resultat
 
-    try:
-        # Étape 1: Récupérer tous les fichiers du dossier uploads
-        fichiers_dossier = []
-        for fichier in os.listdir(dossier_uploads):
-            ext = fichier.split('.')[-1].lower() if '.' in fichier else ''
-            if ext in allowed_extensions:
-                fichiers_dossier.append(fichier)
+def lister_fichiers_uploads(stockage, allowed_extensions):
+    """
+    Liste les images du stockage des uploads, sous-dossiers compris (stockage par contenu ab/cd/…).
 
-        logger.info(f"Trouvé {len(fichiers_dossier)} fichiers dans le dossier uploads")
+    Les variantes (ex: photo.jpg.webp) sont jugées d'après leur original.
 
-        # Étape 2: Récupérer les références de la base de données
-        fichiers_references = []
-        conn = get_db_connection()
+    Returns:
+        list: Clés des fichiers (chemins relatifs au dossier d'uploads)
+    """
+    fichiers = []
+    for cle in stockage.lister():
+        fichier = cle.rsplit('/', 1)[-1]
+        source = fichier_source(fichier)
+        ext = source.split('.')[-1].lower() if '.' in source else ''
+        # Les dossiers et fichiers cachés (quarantaine, fichiers temporaires) sont ignorés
+        if ext in allowed_extensions and not any(partie.startswith('.') for partie in cle.split('/')):
+            fichiers.append(cle)
+    return fichiers
 
-        # Images principales
-        images_principales = conn.execute(
-            "SELECT image_principale FROM objets WHERE image_principale IS NOT NULL AND image_principale != ''"
-        ).fetchall()
 
-        for img in images_principales:
-            nom_fichier = os.path.basename(img['image_principale'])
-            fichiers_references.append(nom_fichier)
+def est_orphelin(fichier, fichiers_references):
+    """Indique si un fichier (ou l'original d'une variante) n'est référencé par aucun objet."""
+    dossier, nom = os.path.split(fichier)
+    return os.path.join(dossier, fichier_source(nom)).replace(os.sep, '/') not in fichiers_references
 
-        # Images supplémentaires
-        images_supplementaires = conn.execute(
-            "SELECT chemin FROM images WHERE chemin IS NOT NULL AND chemin != ''"
-        ).fetchall()
 
-        for img in images_supplementaires:
-            nom_fichier = os.path.basename(img['chemin'])
-            fichiers_references.append(nom_fichier)
+def references_uploads(conn):
+    """
+    Retourne l'ensemble des clés d'uploads référencées en base.
 
-        conn.close()
+    La table `fichiers`, tenue à jour par triggers à chaque ajout et suppression
+    d'image, fournit directement la liste ; à défaut (base pas encore mise à
+    niveau), les références sont lues dans `objets` et `images`.
+    """
+    try:
+        rows = conn.execute('SELECT chemin FROM fichiers WHERE refs > 0').fetchall()
+    except sqlite3.OperationalError:
+        rows = conn.execute("""
+            SELECT image_principale FROM objets WHERE image_principale IS NOT NULL AND image_principale != ''
+            UNION
+            SELECT chemin FROM images WHERE chemin IS NOT NULL AND chemin != ''
+        """).fetchall()
+    return {nom_reference(row[0]) for row in rows}
 
-        logger.info(f"Trouvé {len(fichiers_references)} fichiers référencés en base de données")
 
-        # Étape 3: Identifier et supprimer les fichiers orphelins
-        for fichier in fichiers_dossier:
-            if fichier not in fichiers_references:
-                logger.info(f"Fichier orphelin trouvé: {fichier}")
+def candidats_sans_reference(conn):
+    """
+    Retourne les fichiers connus de la table `fichiers` dont plus aucun objet ne dépend.
 
-                # Supprimer le fichier
-                chemin_complet = os.path.join(dossier_uploads, fichier)
-                try:
-                    if os.path.exists(chemin_complet):
-                        # Obtenir la taille avant suppression
-                        taille = os.path.getsize(chemin_complet)
+    Permet de trouver les orphelins laissés par une suppression interrompue
+    sans parcourir tout le stockage.
+    """
+    try:
+        # Les fichiers déjà confiés au balayeur (scripts/suppressions.py) suivent leur quarantaine
+        rows = conn.execute("""
+            SELECT chemin FROM fichiers WHERE refs <= 0
+            AND chemin NOT IN (SELECT chemin FROM suppressions_en_attente)
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    cles = [nom_reference(row[0]) for row in rows]
+    return cles + [variante for cle in cles for variante in chemins_variantes(cle)]
+
+
+def analyser_orphelins(stockage, get_db_connection, allowed_extensions, supprimer=False, complet=True,
+                       delai_grace=DELAI_GRACE, logger=None):
+    """
+    Détecte (et supprime si demandé) les fichiers d'uploads qui ne sont référencés par aucun objet.
+
+    La simulation et le nettoyage réel suivent le même chemin : seule la
+    suppression finale dépend de `supprimer`. Les fichiers supprimés sont
+    inscrits dans `suppressions_en_attente` ; le balayeur (balayer_suppressions)
+    les met ensuite en quarantaine, puis les efface après le délai de grâce.
+
+    Args:
+        stockage: Stockage des uploads (voir scripts/storage.py)
+        get_db_connection: Fonction pour obtenir une connexion à la base de données
+        allowed_extensions: Extensions d'images prises en compte
+        supprimer: False pour une simulation, True pour confier les orphelins au balayeur
+        complet: True pour parcourir tout le stockage, False pour ne vérifier que
+            les fichiers que la table `fichiers` signale sans référence
+        delai_grace: Âge minimal (secondes) d'un fichier supprimable : une image
+            qui vient d'être enregistrée peut ne pas encore être référencée en base
+        logger: Journal où consigner le déroulement (optionnel)
+
+    Returns:
+        dict: Rapport (fichiers_dans_dossier, images_referencees_db, orphelins_detectes,
+            fichiers_supprimes, recents, espace_libere, erreurs, simulation, duree)
+    """
+    debut = time.perf_counter()
+    rapport = {
+        'fichiers_dans_dossier': [],
+        'images_referencees_db': [],
+        'orphelins_detectes': [],
+        'fichiers_supprimes': [],
+        'recents': [],
+        'espace_libere': 0,
+        'erreurs': [],
+        'simulation': not supprimer,
+        'duree': 0.0
+    }
 
-                        # Supprimer le fichier
-                        os.remove(chemin_complet)
+    conn = get_db_connection()
+    try:
+        references = references_uploads(conn)
+        if complet:
+            candidats = lister_fichiers_uploads(stockage, allowed_extensions)
+        else:
+            candidats = candidats_sans_reference(conn)
+    finally:
+        conn.close()
 
-                        # Enregistrer l'information
-                        resultat['fichiers_supprimes'].append(fichier)
-                        resultat['espace_libere'] += taille
+    rapport['fichiers_dans_dossier'] = candidats
+    rapport['images_referencees_db'] = sorted(references)
+    if logger:
+        logger.info(f"{len(candidats)} fichier(s) à examiner, {len(references)} fichier(s) référencé(s) en base")
+
+    maintenant = time.time()
+    for fichier in candidats:
+        if not est_orphelin(fichier, references):
+            continue
+        infos = stockage.stat(fichier)
+        if infos is None:
+            continue  # Variante jamais produite, ou fichier déjà supprimé
+        if infos['modifie_le'] is not None and maintenant - infos['modifie_le'] < delai_grace:
+            rapport['recents'].append(fichier)
+            continue
+
+        rapport['orphelins_detectes'].append(fichier)
+        rapport['espace_libere'] += infos['taille']
+
+    if supprimer and rapport['orphelins_detectes']:
+        # Les variantes suivent leur original : seuls les originaux sont inscrits
+        sources = sorted({
+            PREFIXE_UPLOADS + os.path.join(os.path.dirname(fichier), fichier_source(os.path.basename(fichier))).replace(os.sep, '/')
+            for fichier in rapport['orphelins_detectes']
+        })
+        conn = get_db_connection()
+        try:
+            demander_suppression(conn, sources)
+            conn.commit()
+            rapport['fichiers_supprimes'] = list(rapport['orphelins_detectes'])
+        except sqlite3.Error as e:
+            msg = f"Erreur lors de l'inscription des fichiers à supprimer: {e}"
+            rapport['erreurs'].append(msg)
+            rapport['espace_libere'] = 0
+            if logger:
+                logger.error(msg)
+        finally:
+            conn.close()
+        if logger:
+            for fichier in rapport['fichiers_supprimes']:
+                logger.info(f"  => Mis en suppression différée: {fichier}")
+
+    rapport['duree'] = time.perf_counter() - debut
+    if logger:
+        action = "supprimé(s)" if supprimer else "détecté(s)"
+        logger.info(f"{len(rapport['orphelins_detectes'])} orphelin(s) {action}, "
+                    f"{formater_taille_fichier(rapport['espace_libere'])} en {rapport['duree'] * 1000:.0f} ms")
+    return rapport
+
+
+def nettoyer_fichiers(app, get_db_connection, allowed_extensions, stockage=None):
+    """
+    Confie les images orphelines au balayeur et retourne le rapport de analyser_orphelins.
 
-                        logger.info(f"  => Supprimé: {fichier} ({formater_taille_fichier(taille)})")
-                    else:
-                        msg = f"Le fichier {chemin_complet} n'existe pas mais est listé comme orphelin"
-                        logger.warning(msg)
-                        resultat['erreurs'].append(msg)
-                except Exception as e:
-                    msg = f"Erreur lors de la suppression de {chemin_complet}: {str(e)}"
-                    logger.error(msg)
-                    resultat['erreurs'].append(msg)
+    Le stockage par défaut est le dossier local UPLOAD_FOLDER (voir scripts/storage.py).
+    """
+    logger = app.logger
+    dossier_uploads = app.config['UPLOAD_FOLDER']
+    stockage = stockage or LocalStorage(dossier_uploads)
 
-        # Résumé du nettoyage
-        nb_fichiers = len(resultat['fichiers_supprimes'])
-        espace_libere = formater_taille_fichier(resultat['espace_libere'])
-        logger.info(f"=== FIN DU NETTOYAGE: {nb_fichiers} fichiers supprimés, {espace_libere} libérés ===")
+    logger.info("=== DÉBUT DU NETTOYAGE ===")
 
-        return resultat
+    # Vérifier que le dossier existe
+    if isinstance(stockage, LocalStorage) and not os.path.exists(stockage.racine):
+        msg = f"Le dossier {dossier_uploads} n'existe pas."
+        logger.error(msg)
+        return {'fichiers_supprimes': [], 'espace_libere': 0, 'erreurs': [msg]}
 
+    try:
+        rapport = analyser_orphelins(stockage, get_db_connection, allowed_extensions, supprimer=True, logger=logger)
     except Exception as e:
         msg = f"Erreur générale lors du nettoyage: {str(e)}"
         logger.error(msg, exc_info=True)
-        resultat['erreurs'].append(msg)
-        return resultat
+        return {'fichiers_supprimes': [], 'espace_libere': 0, 'erreurs': [msg]}
+
+    logger.info("=== FIN DU NETTOYAGE ===")
+    return rapport
 
 
 def formater_taille_fichier(octets):
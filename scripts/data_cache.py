@@ -0,0 +1,174 @@
+"""
+Module de cohérence des caches entre processus.
+
+Sous Gunicorn, chaque worker possède sa propre mémoire : une écriture faite
+par un worker est invisible pour les caches des autres. Ce module s'appuie sur
+la table `data_version` (un compteur par portée : objet, catégorie, liens,
+configuration) incrémentée à chaque écriture, soit par les triggers SQL, soit
+explicitement via `bump_data_version`.
+
+Chaque worker compare en début de requête le compteur global ('*') avec la
+dernière valeur vue, et n'invalide que les entrées dont la portée a changé.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+# Portée globale, incrémentée à chaque écriture quelle que soit la portée
+SCOPE_GLOBAL = '*'
+
+# Requête d'incrément d'une portée (création à 1 si elle n'existe pas encore)
+_UPSERT_VERSION = """
+INSERT INTO data_version (scope, version) VALUES (?, 1)
+ON CONFLICT(scope) DO UPDATE SET version = version + 1
+"""
+
+# Limite de variables SQLite pour les clauses IN
+_TAILLE_LOT = 500
+
+
+def bump_data_version(conn, *scopes):
+    """
+    Incrémente les compteurs des portées données (et le compteur global).
+
+    L'appel doit être fait dans la même transaction que l'écriture concernée,
+    le commit reste à la charge de l'appelant.
+
+    Args:
+        conn: Connexion SQLite ouverte
+        *scopes: Portées modifiées (ex: 'liens', 'config', 'objet:12')
+    """
+    portees = [s for s in scopes if s != SCOPE_GLOBAL] + [SCOPE_GLOBAL]
+    conn.executemany(_UPSERT_VERSION, [(s,) for s in portees])
+
+
+def get_data_version(conn, scope):
+    """Retourne la version courante d'une portée (0 si jamais modifiée)."""
+    row = conn.execute('SELECT version FROM data_version WHERE scope = ?', (scope,)).fetchone()
+    return row[0] if row else 0
+
+
+class VersionedCache:
+    """
+    Cache mémoire par processus, invalidé par les compteurs de `data_version`.
+
+    Chaque entrée mémorise la portée dont elle dépend et la version de cette
+    portée au moment du calcul. `sync` doit être appelée au début de chaque
+    requête : elle ne coûte qu'une lecture indexée tant que rien n'a changé.
+    Une entrée peut en outre recevoir une durée de vie (`ttl`), au-delà de
+    laquelle elle est relue même si sa portée n'a pas changé.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> (portée, version, valeur, expiration ou None)
+        self._global_version = None
+        self._db_id = None
+
+    def clear(self):
+        """Vide entièrement le cache."""
+        with self._lock:
+            self._entries.clear()
+            self._global_version = None
+
+    def sync(self, conn, db_id=None):
+        """
+        Supprime les entrées périmées en comparant les versions en base.
+
+        Args:
+            conn: Connexion SQLite ouverte
+            db_id: Identifiant de la base (chemin), pour vider le cache si elle change
+        """
+        global_version = get_data_version(conn, SCOPE_GLOBAL)
+
+        with self._lock:
+            if db_id != self._db_id:
+                self._entries.clear()
+                self._global_version = None
+                self._db_id = db_id
+
+            if global_version == self._global_version:
+                return
+
+            portees = list({entree[0] for entree in self._entries.values()})
+            versions = {}
+            for i in range(0, len(portees), _TAILLE_LOT):
+                lot = portees[i:i + _TAILLE_LOT]
+                placeholders = ','.join(['?'] * len(lot))
+                for row in conn.execute(
+                    f'SELECT scope, version FROM data_version WHERE scope IN ({placeholders})', lot
+                ):
+                    versions[row[0]] = row[1]
+
+            perimees = [
+                cle for cle, (portee, version, _, _) in self._entries.items()
+                if versions.get(portee, 0) != version
+            ]
+            for cle in perimees:
+                del self._entries[cle]
+
+            self._global_version = global_version
+
+    def get_or_load(self, get_db_connection, scope, key, loader, ttl=None):
+        """
+        Retourne la valeur en cache, ou la calcule avec `loader(conn)` et la mémorise.
+
+        Une connexion n'est ouverte qu'en cas d'absence dans le cache. La version
+        de la portée est lue avant le calcul : si une écriture a lieu pendant
+        celui-ci, l'entrée sera simplement invalidée au prochain `sync`.
+
+        Args:
+            get_db_connection: Fonction pour obtenir une connexion à la base de données
+            scope: Portée dont dépend la valeur (ex: 'objets', 'liens')
+            key: Clé de la valeur dans cette portée
+            loader: Fonction recevant la connexion et retournant la valeur
+            ttl: Durée de vie de l'entrée en secondes (illimitée si None, 0 : pas de mise en cache)
+        """
+        cle = (scope, key)
+        trouve, valeur = self._lire(cle)
+        if trouve:
+            return valeur
+
+        conn = get_db_connection()
+        try:
+            version = get_data_version(conn, scope)
+            valeur = loader(conn)
+        finally:
+            conn.close()
+
+        if ttl is not None and ttl <= 0:
+            return valeur
+
+        with self._lock:
+            expiration = time.monotonic() + ttl if ttl is not None else None
+            self._entries[cle] = (scope, version, valeur, expiration)
+            self._entries.move_to_end(cle)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return valeur
+
+    def get(self, scope, key, default=None):
+        """Retourne la valeur en cache sans la calculer (`default` si absente ou expirée)."""
+        trouve, valeur = self._lire((scope, key))
+        return valeur if trouve else default
+
+    def _lire(self, cle):
+        """Retourne (True, valeur) si l'entrée est en cache et non expirée, (False, None) sinon."""
+        with self._lock:
+            entree = self._entries.get(cle)
+            if entree is None:
+                return False, None
+            if entree[3] is not None and entree[3] <= time.monotonic():
+                del self._entries[cle]
+                return False, None
+            self._entries.move_to_end(cle)
+            return True, entree[2]
+
+    def invalidate(self, scope):
+        """Supprime localement toutes les entrées d'une portée."""
+        with self._lock:
+            for cle in [c for c, e in self._entries.items() if e[0] == scope]:
+                del self._entries[cle]
@@ -0,0 +1,160 @@
+"""
+Script de migration des uploads vers le stockage adressé par contenu.
+
+Chaque image référencée en base sous son ancien nom (uuid_nom.jpg, à la racine
+du dossier des uploads) est rangée sous l'empreinte de son contenu
+(ab/cd/<sha256>.jpg) ; les fichiers identiques sont fusionnés en un seul.
+
+La migration se déroule en trois étapes, et peut être relancée sans risque
+après une interruption :
+1. copie de chaque fichier (et de ses variantes) vers son emplacement final ;
+2. mise à jour des références en base dans une seule transaction (les triggers
+   tiennent la table `fichiers` à jour) ;
+3. suppression des anciens fichiers.
+
+Lancez d'abord scripts/resize_existing_images.py : les fichiers migrés ne sont
+plus jamais réécrits. L'application doit avoir démarré une fois sur la base
+(création de la table `fichiers`).
+
+Usage : python scripts/dedup_uploads.py [--simulation] [--base CHEMIN]
+"""
+
+import os
+import sqlite3
+import logging
+import argparse
+
+try:
+    from scripts import image_pipeline
+except ImportError:  # Exécution directe : python scripts/dedup_uploads.py
+    import image_pipeline
+
+# Configuration
+UPLOAD_FOLDER = 'database/uploads'
+DATABASE_FILE = 'database/database.db'
+PREFIXE_CHEMIN = 'database/uploads/'  # Préfixe des chemins d'images enregistrés en base
+
+# Configuration des logs
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def copier_fichier(source, cible):
+    """Copie un fichier vers son emplacement final (lien physique si possible, sinon copie atomique)."""
+    os.makedirs(os.path.dirname(cible), exist_ok=True)
+    try:
+        os.link(source, cible)
+    except FileExistsError:
+        pass
+    except OSError:
+        with open(source, 'rb') as f:
+            image_pipeline.ecrire_atomiquement(cible, f.read())
+
+
+def references_anciennes(conn):
+    """Retourne les chemins référencés en base qui ne sont pas encore adressés par contenu."""
+    rows = conn.execute("""
+        SELECT image_principale AS chemin FROM objets WHERE image_principale LIKE ?
+        UNION
+        SELECT chemin FROM images WHERE chemin LIKE ?
+    """, (PREFIXE_CHEMIN + '%', PREFIXE_CHEMIN + '%')).fetchall()
+    # Les fichiers déjà migrés sont rangés dans des sous-dossiers (ab/cd/…)
+    return sorted(row[0] for row in rows if '/' not in row[0][len(PREFIXE_CHEMIN):])
+
+
+def migrer_uploads(db_path=DATABASE_FILE, dossier=UPLOAD_FOLDER, simulation=False):
+    """
+    Migre les anciens uploads vers le stockage adressé par contenu.
+
+    Returns:
+        dict: Statistiques (fichiers, doublons, manquants, octets_liberes)
+    """
+    stats = {'fichiers': 0, 'doublons': 0, 'manquants': 0, 'octets_liberes': 0}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('SELECT 1 FROM fichiers LIMIT 1')
+    except sqlite3.OperationalError:
+        conn.close()
+        raise RuntimeError("Table 'fichiers' absente : démarrez l'application une fois sur cette base.")
+
+    try:
+        # Étape 1 : copie des fichiers vers leur emplacement final
+        correspondances = {}
+        for chemin in references_anciennes(conn):
+            source = os.path.join(dossier, chemin[len(PREFIXE_CHEMIN):])
+            if not os.path.isfile(source):
+                logger.warning(f"Fichier référencé introuvable : {chemin}")
+                stats['manquants'] += 1
+                continue
+
+            extension = image_pipeline.normaliser_extension(source.rsplit('.', 1)[-1])
+            fichier = image_pipeline.chemin_contenu(image_pipeline.empreinte_fichier(source), extension)
+            cible = os.path.join(dossier, fichier)
+
+            if os.path.exists(cible) or PREFIXE_CHEMIN + fichier in correspondances.values():
+                stats['doublons'] += 1
+                stats['octets_liberes'] += os.path.getsize(source)
+                logger.info(f"Doublon : {chemin} -> {fichier}")
+            elif not simulation:
+                copier_fichier(source, cible)
+                for variante, cible_variante in zip(image_pipeline.chemins_variantes(source),
+                                                    image_pipeline.chemins_variantes(cible)):
+                    if os.path.isfile(variante):
+                        copier_fichier(variante, cible_variante)
+
+            stats['fichiers'] += 1
+            correspondances[chemin] = PREFIXE_CHEMIN + fichier
+
+        if simulation or not correspondances:
+            return stats
+
+        # Étape 2 : une seule transaction pour toutes les références
+        valeurs = [(nouveau, ancien) for ancien, nouveau in correspondances.items()]
+        with conn:
+            conn.executemany('UPDATE objets SET image_principale = ? WHERE image_principale = ?', valeurs)
+            conn.executemany('UPDATE images SET chemin = ? WHERE chemin = ?', valeurs)
+            conn.executemany(
+                'DELETE FROM fichiers WHERE chemin = ? AND refs <= 0',
+                [(ancien,) for ancien in correspondances]
+            )
+            # Les anciens fichiers sont supprimés à l'étape 3, pas par le balayeur
+            conn.executemany(
+                'DELETE FROM suppressions_en_attente WHERE chemin = ?',
+                [(ancien,) for ancien in correspondances]
+            )
+    finally:
+        conn.close()
+
+    # Étape 3 : suppression des anciens fichiers (et de leurs variantes)
+    for ancien in correspondances:
+        image_pipeline.supprimer_image(os.path.join(dossier, ancien[len(PREFIXE_CHEMIN):]))
+
+    return stats
+
+
+def main():
+    """Fonction principale exécutant la migration."""
+    parser = argparse.ArgumentParser(description="Migre les uploads vers le stockage adressé par contenu.")
+    parser.add_argument('--simulation', action='store_true',
+                        help="Affiche ce qui serait fait sans rien modifier")
+    parser.add_argument('--base', default=DATABASE_FILE,
+                        help="Base de données de l'application (défaut : %(default)s)")
+    args = parser.parse_args()
+
+    if not os.path.exists(UPLOAD_FOLDER):
+        logger.error(f"Le dossier {UPLOAD_FOLDER} n'existe pas.")
+        return
+
+    stats = migrer_uploads(args.base, UPLOAD_FOLDER, simulation=args.simulation)
+    prefixe = "Simulation : " if args.simulation else ""
+    logger.info(f"{prefixe}{stats['fichiers']} fichier(s) migré(s), dont {stats['doublons']} doublon(s) fusionné(s), "
+                f"{stats['manquants']} référence(s) sans fichier.")
+    logger.info(f"{prefixe}Espace libéré : {stats['octets_liberes'] / 1024 / 1024:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
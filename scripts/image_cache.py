@@ -0,0 +1,187 @@
+"""
+Module de cache disque des images redimensionnées à la demande.
+
+Les dérivés demandés via /img/<largeur>x<hauteur>/<chemin> sont calculés une
+seule fois puis conservés dans un dossier dédié, sous le nom de leur taille
+suivi de la clé de l'image (ex: 480x480/ab/cd/<sha256>.jpg.webp).
+
+- Taille bornée : au-delà de `taille_max` octets, les fichiers les moins
+  récemment servis sont supprimés (LRU, d'après la date de modification,
+  rafraîchie à chaque accès).
+- Calcul unique : des requêtes simultanées pour un même dérivé attendent le
+  premier calcul au lieu de le refaire, entre threads (verrou mémoire) comme
+  entre workers Gunicorn (verrou fichier `flock`).
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : seul le verrou entre threads est disponible
+    fcntl = None
+
+from scripts.image_pipeline import ecrire_atomiquement
+
+# Part du plafond conservée après une purge (évite de purger à chaque écriture)
+RATIO_APRES_PURGE = 0.9
+
+# Intervalle minimal entre deux mises à jour de la date d'accès d'un même fichier
+DELAI_RAFRAICHISSEMENT = 60
+
+
+class CacheImages:
+    """
+    Cache disque LRU de taille bornée.
+
+    Args:
+        racine: Dossier du cache
+        taille_max: Taille maximale du cache en octets
+    """
+
+    def __init__(self, racine, taille_max):
+        self.racine = racine
+        self.taille_max = taille_max
+        self._verrou = threading.Lock()
+        self._verrous_cles = {}   # clé -> [verrou, nombre d'utilisateurs]
+        self._taille_estimee = None
+
+    def chemin(self, cle):
+        """Retourne le chemin du fichier en cache d'une clé."""
+        return os.path.join(self.racine, cle)
+
+    def obtenir(self, cle, produire):
+        """
+        Retourne le chemin du dérivé en cache, en le calculant au premier appel.
+
+        Args:
+            cle: Clé du dérivé (ex: 480x480/ab/cd/<sha256>.jpg)
+            produire: Fonction sans argument retournant les octets du dérivé
+
+        Returns:
+            str: Chemin du fichier en cache
+        """
+        chemin = self.chemin(cle)
+        if self._toucher(chemin):
+            return chemin
+
+        with self._calcul_unique(cle, chemin):
+            # Un autre thread ou worker a pu le calculer pendant l'attente
+            if self._toucher(chemin):
+                return chemin
+
+            donnees = produire()
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            ecrire_atomiquement(chemin, donnees)
+
+        if self._ajouter(len(donnees)) > self.taille_max:
+            self.purger()
+        return chemin
+
+    def supprimer(self, cles):
+        """Supprime des dérivés du cache (ex: ceux d'une image supprimée)."""
+        for cle in cles:
+            try:
+                taille = os.path.getsize(self.chemin(cle))
+                os.remove(self.chemin(cle))
+            except FileNotFoundError:
+                continue
+            self._ajouter(-taille)
+
+    def _toucher(self, chemin):
+        """Indique si le fichier existe, et rafraîchit sa date d'accès (LRU) si besoin."""
+        try:
+            modifie_le = os.stat(chemin).st_mtime
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        if time.time() - modifie_le > DELAI_RAFRAICHISSEMENT:
+            try:
+                os.utime(chemin)
+            except FileNotFoundError:
+                return False  # Purgé entre-temps
+        return True
+
+    @contextmanager
+    def _calcul_unique(self, cle, chemin):
+        """Sérialise le calcul d'une même clé entre threads puis entre processus."""
+        with self._verrou:
+            entree = self._verrous_cles.setdefault(cle, [threading.Lock(), 0])
+            entree[1] += 1
+        try:
+            with entree[0]:
+                if fcntl is None:
+                    yield
+                    return
+                os.makedirs(os.path.dirname(chemin), exist_ok=True)
+                with open(chemin + '.lock', 'w') as verrou_fichier:
+                    fcntl.flock(verrou_fichier, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(verrou_fichier, fcntl.LOCK_UN)
+                        try:
+                            os.remove(chemin + '.lock')
+                        except FileNotFoundError:
+                            pass
+        finally:
+            with self._verrou:
+                entree[1] -= 1
+                if entree[1] == 0:
+                    del self._verrous_cles[cle]
+
+    def _ajouter(self, taille):
+        """Met à jour la taille estimée du cache et la retourne."""
+        with self._verrou:
+            if self._taille_estimee is None:
+                self._taille_estimee = sum(taille for _, taille, _ in self._fichiers())
+            else:
+                self._taille_estimee += taille
+            return self._taille_estimee
+
+    def _fichiers(self):
+        """Itère sur les fichiers du cache : (chemin, taille, date d'accès)."""
+        for racine, _, noms in os.walk(self.racine):
+            for nom in noms:
+                if nom.startswith('.') or nom.endswith('.lock'):
+                    continue
+                chemin = os.path.join(racine, nom)
+                try:
+                    infos = os.stat(chemin)
+                except FileNotFoundError:
+                    continue
+                yield chemin, infos.st_size, infos.st_mtime
+
+    def purger(self, taille_max=None):
+        """
+        Supprime les fichiers les moins récemment servis jusqu'à repasser sous le plafond.
+
+        Args:
+            taille_max: Plafond à appliquer (par défaut celui du cache) ; la purge
+                descend à RATIO_APRES_PURGE de ce plafond
+
+        Returns:
+            dict: Statistiques (fichiers, octets, supprimes, octets_liberes)
+        """
+        taille_max = self.taille_max if taille_max is None else taille_max
+        fichiers = sorted(self._fichiers(), key=lambda f: f[2])
+        total = sum(taille for _, taille, _ in fichiers)
+        stats = {'fichiers': len(fichiers), 'octets': total, 'supprimes': 0, 'octets_liberes': 0}
+
+        if total > taille_max:
+            cible = taille_max * RATIO_APRES_PURGE
+            for chemin, taille, _ in fichiers:
+                if total <= cible:
+                    break
+                try:
+                    os.remove(chemin)
+                except FileNotFoundError:
+                    pass
+                total -= taille
+                stats['supprimes'] += 1
+                stats['octets_liberes'] += taille
+
+        with self._verrou:
+            self._taille_estimee = total
+        return stats
@@ -0,0 +1,371 @@
+"""
+Module de traitement des images téléchargées.
+
+Les images sont décodées directement depuis le flux de l'upload, redimensionnées
+et compressées en mémoire, puis écrites une seule fois sur le disque via un
+fichier temporaire renommé atomiquement : un échec ne laisse jamais de fichier
+brut ou partiel dans le dossier des uploads.
+
+Chaque image est rangée sous l'empreinte SHA-256 de son contenu
+(ex: ab/cd/abcd….jpg) : une image identique téléversée plusieurs fois n'est
+stockée qu'une fois et partagée entre les objets (voir la table `fichiers`).
+
+Des variantes aux formats modernes (AVIF, WebP) sont enregistrées à côté de
+l'original, sous le même nom suivi de l'extension du format
+(ex: photo.jpg.webp), et servies aux navigateurs qui les acceptent.
+"""
+
+import io
+import os
+import re
+import base64
+import hashlib
+import tempfile
+from PIL import Image, features
+
+# Configuration
+PREFIXE_UPLOADS = 'database/uploads/'   # Préfixe des chemins d'images enregistrés en base
+MAX_SIZE = (1600, 1600)   # Taille maximale (largeur, hauteur)
+JPEG_QUALITY = 85         # Qualité JPEG (0-100)
+MAX_PIXELS = 50_000_000   # Nombre de pixels maximal accepté (protection contre les "bombes de décompression")
+REDUCING_GAP = 2.0        # Marge conservée avant le rééchantillonnage final (qualité du LANCZOS)
+LQIP_SIZE = (16, 16)      # Taille de l'aperçu flou affiché pendant le chargement
+LQIP_QUALITY = 40
+
+# Variantes modernes par ordre de préférence : (type MIME, extension, format Pillow, qualité)
+_VARIANTES = (
+    ('image/avif', '.avif', 'AVIF', 60),
+    ('image/webp', '.webp', 'WEBP', 80),
+)
+# Seuls les formats que cette installation de Pillow sait encoder sont produits
+VARIANTES = tuple(v for v in _VARIANTES if features.check(v[2].lower()))
+
+# Clé d'un fichier adressé par contenu : ab/cd/<sha256>.<ext>[.<variante>]
+_PATTERN_CONTENU = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.[a-z0-9]+(\.[a-z0-9]+)?$')
+
+# Une même image reçoit toujours le même nom, quelle que soit l'extension d'origine
+_EXTENSIONS_NORMALISEES = {'jpeg': 'jpg'}
+
+# Modes que l'encodeur JPEG sait écrire tels quels
+_MODES_JPEG = ('RGB', 'L', 'CMYK')
+
+# Modes que `reduce` et LANCZOS ne savent pas traiter, et leur mode de travail
+_MODES_A_CONVERTIR = {'1': 'L', 'I;16': 'I', 'I;16B': 'I', 'I;16L': 'I', 'I;16N': 'I'}
+
+
+def nom_reference(chemin):
+    """Convertit un chemin enregistré en base en chemin relatif au dossier d'uploads."""
+    if chemin.startswith(PREFIXE_UPLOADS):
+        return chemin[len(PREFIXE_UPLOADS):]
+    return os.path.basename(chemin)
+
+
+def format_depuis_extension(chemin):
+    """Retourne le format Pillow correspondant à l'extension du fichier (ex: '.jpg' -> 'JPEG')."""
+    ext = os.path.splitext(chemin)[1].lower()
+    return Image.registered_extensions().get(ext)
+
+
+def dimensions_cibles(taille, max_size):
+    """Calcule les dimensions d'une image réduite pour tenir dans max_size, proportions conservées."""
+    largeur, hauteur = taille
+    ratio = min(max_size[0] / largeur, max_size[1] / hauteur, 1)
+    return (max(1, round(largeur * ratio)), max(1, round(hauteur * ratio)))
+
+
+def reduire(img, max_size, reducing_gap=REDUCING_GAP):
+    """
+    Réduit une image pour qu'elle tienne dans max_size, au moindre coût.
+
+    Pour un JPEG non encore décodé, `draft` demande au décodeur de travailler
+    directement à l'échelle 1/2, 1/4 ou 1/8 : les pixels en pleine résolution ne
+    sont jamais produits. Pour les autres formats, `reduce` effectue une première
+    réduction entière rapide. Le rééchantillonnage LANCZOS final ne porte donc que
+    sur une image au plus `reducing_gap` fois plus grande que la cible.
+
+    Les images en palette, 1 bit ou 16 bits sont d'abord converties vers un
+    mode que ces opérations acceptent (RGB ou RGBA, L, I).
+
+    Returns:
+        Image: L'image réduite (ou l'image d'origine si elle est déjà assez petite)
+    """
+    cible = dimensions_cibles(img.size, max_size)
+    if cible == img.size:
+        return img
+
+    if img.format == 'JPEG':
+        img.draft(None, (int(cible[0] * reducing_gap), int(cible[1] * reducing_gap)))
+
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    elif img.mode in _MODES_A_CONVERTIR:
+        img = img.convert(_MODES_A_CONVERTIR[img.mode])
+
+    facteur = int(min(img.width / cible[0], img.height / cible[1]) / reducing_gap)
+    if facteur > 1:
+        img = img.reduce(facteur)
+
+    return img.resize(cible, Image.Resampling.LANCZOS)
+
+
+def reduire_en_cascade(img, tailles):
+    """
+    Produit les dérivés d'une image du plus grand au plus petit.
+
+    Chaque dérivé est calculé à partir du précédent et non de l'original :
+    seule la première réduction porte sur l'image en pleine résolution.
+
+    Yields:
+        tuple: (taille demandée, image réduite)
+    """
+    for taille in sorted(tailles, key=lambda t: t[0] * t[1], reverse=True):
+        img = reduire(img, taille)
+        yield taille, img
+
+
+def apercu_image(img):
+    """
+    Calcule la couleur dominante et l'aperçu basse qualité (LQIP) d'une image déjà réduite.
+
+    Returns:
+        tuple: (couleur '#rrggbb', data URI base64 de quelques centaines d'octets)
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    (_, miniature), (_, pixel) = reduire_en_cascade(img, [LQIP_SIZE, (1, 1)])
+    couleur = '#{:02x}{:02x}{:02x}'.format(*pixel.getpixel((0, 0)))
+
+    format_lqip = 'WEBP' if features.check('webp') else 'JPEG'
+    donnees = encoder_image(miniature, format_lqip, LQIP_QUALITY)
+    lqip = f'data:image/{format_lqip.lower()};base64,' + base64.b64encode(donnees).decode('ascii')
+    return couleur, lqip
+
+
+def encoder_image(img, format_sortie, quality=JPEG_QUALITY):
+    """Encode une image en mémoire avec optimisation et retourne les octets."""
+    if format_sortie == 'JPEG' and img.mode not in _MODES_JPEG:
+        img = img.convert('RGB')
+
+    tampon = io.BytesIO()
+    img.save(tampon, format=format_sortie, optimize=True, quality=quality)
+    return tampon.getvalue()
+
+
+def empreinte_fichier(chemin):
+    """Calcule l'empreinte SHA-256 d'un fichier."""
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def normaliser_extension(extension):
+    """Retourne l'extension sous laquelle stocker un format (ex: 'jpeg' -> 'jpg')."""
+    extension = extension.lower()
+    return _EXTENSIONS_NORMALISEES.get(extension, extension)
+
+
+def chemin_contenu(sha256, extension):
+    """Retourne le chemin relatif d'un fichier adressé par son contenu (ex: ab/cd/abcd….jpg)."""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+
+def est_adresse_par_contenu(cle):
+    """Indique si une clé désigne un fichier nommé d'après son contenu (donc immuable), variantes comprises."""
+    return _PATTERN_CONTENU.match(cle) is not None
+
+
+def fichier_source(nom):
+    """Retourne le nom du fichier original d'une variante (ex: photo.jpg.webp -> photo.jpg)."""
+    for _, extension, _, _ in _VARIANTES:
+        if nom.lower().endswith(extension):
+            return nom[:-len(extension)]
+    return nom
+
+
+def chemins_variantes(chemin):
+    """Retourne les chemins possibles des variantes d'une image."""
+    return [chemin + extension for _, extension, _, _ in _VARIANTES]
+
+
+def choisir_variante(chemin, types_acceptes, existe=os.path.isfile):
+    """
+    Choisit la meilleure variante existante pour un client.
+
+    Args:
+        chemin: Chemin (ou clé de stockage) de l'image originale
+        types_acceptes: Types MIME explicitement acceptés par le client (en-tête Accept)
+        existe: Fonction indiquant si un chemin existe (ex: Storage.exists)
+
+    Returns:
+        tuple: (chemin de la variante, type MIME), ou None pour servir l'original
+    """
+    for mimetype, extension, _, _ in VARIANTES:
+        if mimetype in types_acceptes and existe(chemin + extension):
+            return chemin + extension, mimetype
+    return None
+
+
+def encoder_variantes(img, taille_originale):
+    """
+    Encode les variantes modernes d'une image déjà réduite.
+
+    Une variante plus lourde que l'original n'est pas retenue : le navigateur
+    recevra alors l'original.
+
+    Returns:
+        list: Tuples (extension, type MIME, octets) des variantes retenues
+    """
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+    retenues = []
+    for mimetype, extension, format_variante, quality in VARIANTES:
+        donnees = encoder_image(img, format_variante, quality)
+        if len(donnees) < taille_originale:
+            retenues.append((extension, mimetype, donnees))
+    return retenues
+
+
+def encoder_miniature(donnees, taille, variante=None):
+    """
+    Réduit une image (octets de l'original) pour qu'elle tienne dans taille.
+
+    Args:
+        donnees: Contenu de l'image originale
+        taille: Taille maximale (largeur, hauteur)
+        variante: Extension d'une variante moderne (ex: '.webp'), ou None pour garder le format d'origine
+
+    Returns:
+        bytes: L'image réduite encodée
+    """
+    with Image.open(io.BytesIO(donnees)) as img:
+        format_sortie, quality = img.format, JPEG_QUALITY
+        reduite = reduire(img, taille)
+        if variante:
+            format_sortie, quality = next((f, q) for _, ext, f, q in VARIANTES if ext == variante)
+            if reduite.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                reduite = reduite.convert('RGBA' if 'transparency' in reduite.info else 'RGB')
+        return encoder_image(reduite, format_sortie, quality)
+
+
+def creer_variantes(img, chemin, taille_originale):
+    """
+    Enregistre sur le disque les variantes modernes d'une image déjà réduite.
+
+    Returns:
+        list: Les extensions des variantes enregistrées
+    """
+    retenues = encoder_variantes(img, taille_originale)
+    for extension, _, donnees in retenues:
+        ecrire_atomiquement(chemin + extension, donnees)
+
+    enregistrees = [extension for extension, _, _ in retenues]
+    for autre in chemins_variantes(chemin):
+        if autre[len(chemin):] not in enregistrees and os.path.exists(autre):
+            os.remove(autre)
+    return enregistrees
+
+
+def ecrire_atomiquement(chemin, donnees):
+    """Écrit les données dans un fichier temporaire du même dossier, puis le renomme."""
+    dossier = os.path.dirname(chemin) or '.'
+    fd, chemin_temp = tempfile.mkstemp(dir=dossier, prefix='.upload-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(donnees)
+        os.replace(chemin_temp, chemin)
+    except BaseException:
+        if os.path.exists(chemin_temp):
+            os.remove(chemin_temp)
+        raise
+
+
+def enregistrer_image(flux, stockage, extension, max_size=MAX_SIZE, quality=JPEG_QUALITY,
+                      max_pixels=MAX_PIXELS, variantes=True):
+    """
+    Décode, redimensionne et enregistre une image sous le nom de son contenu.
+
+    Si une image identique est déjà présente, elle n'est pas réécrite.
+
+    Args:
+        flux: Flux binaire de l'image (ex: FileStorage.stream)
+        stockage: Stockage des uploads (voir scripts/storage.py)
+        extension: Extension du fichier final, sans le point (détermine le format)
+        max_size: Dimensions maximales (largeur, hauteur)
+        quality: Qualité de compression JPEG
+        max_pixels: Nombre de pixels maximal accepté
+        variantes: Enregistrer aussi les variantes AVIF/WebP
+
+    Returns:
+        dict: {'fichier' (clé dans le stockage), 'nouveau', 'sha256', 'largeur',
+        'hauteur', 'taille', 'variantes', 'couleur', 'lqip'} de l'image enregistrée
+
+    Raises:
+        ValueError: Format de sortie inconnu ou image trop grande
+        OSError: Image illisible ou erreur d'écriture
+    """
+    extension = normaliser_extension(extension)
+    format_sortie = format_depuis_extension('image.' + extension)
+    if not format_sortie:
+        raise ValueError(f"Format d'image inconnu : {extension}")
+
+    # Image.open ne lit que l'en-tête : les dimensions sont vérifiées avant tout décodage
+    with Image.open(flux) as img:
+        if img.width * img.height > max_pixels:
+            raise ValueError(f"Image trop grande ({img.width}x{img.height} pixels)")
+
+        reduite = reduire(img, max_size)
+        donnees = encoder_image(reduite, format_sortie, quality)
+        largeur, hauteur = reduite.size
+
+        couleur, lqip = apercu_image(reduite)
+
+        sha256 = hashlib.sha256(donnees).hexdigest()
+        fichier = chemin_contenu(sha256, extension)
+
+        nouveau = not stockage.exists(fichier)
+        if nouveau:
+            retenues = encoder_variantes(reduite, len(donnees)) if variantes else []
+            # Les variantes d'abord : un original présent signifie une image complète
+            try:
+                for ext, mimetype, octets in retenues:
+                    stockage.put(fichier + ext, octets, mimetype)
+                stockage.put(fichier, donnees, Image.MIME.get(format_sortie))
+            except BaseException:
+                for cle in [fichier] + chemins_variantes(fichier):
+                    stockage.delete(cle)
+                raise
+            variantes = [ext for ext, _, _ in retenues]
+        else:
+            # Contenu déjà stocké : le fichier et ses variantes sont partagés
+            variantes = [ext for ext in (v[1] for v in VARIANTES) if stockage.exists(fichier + ext)]
+
+    return {
+        'fichier': fichier,
+        'nouveau': nouveau,
+        'sha256': sha256,
+        'largeur': largeur,
+        'hauteur': hauteur,
+        'taille': len(donnees),
+        'variantes': variantes,
+        'couleur': couleur,
+        'lqip': lqip
+    }
+
+
+def supprimer_image(chemin):
+    """
+    Supprime une image et ses variantes.
+
+    Returns:
+        int: Nombre d'octets libérés
+    """
+    libere = 0
+    for fichier in [chemin] + chemins_variantes(chemin):
+        if os.path.isfile(fichier):
+            libere += os.path.getsize(fichier)
+            os.remove(fichier)
+    return libere
@@ -0,0 +1,206 @@
+"""
+Module de vérification de l'intégrité de la base de données.
+
+Tant que les clés étrangères n'étaient pas appliquées (PRAGMA foreign_keys),
+supprimer un objet pouvait laisser derrière lui ses lignes `images` et
+`liens`. Ces lignes mortes alourdissent les recherches et le nettoyage.
+
+La vérification signale (et corrige si demandé) :
+- les lignes enfants dont l'objet parent n'existe plus (PRAGMA foreign_key_check) ;
+- les compteurs de la table `fichiers` qui ne correspondent plus aux références ;
+- les références vers des fichiers absents du stockage ; un fichier encore en
+  quarantaine (voir scripts/suppressions.py) n'est pas considéré comme perdu :
+  sa référence est conservée et le balayeur le remet en place.
+
+Usage : python -m scripts.integrite [--corriger] [--base CHEMIN]
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import argparse
+
+from scripts.image_pipeline import PREFIXE_UPLOADS
+from scripts.suppressions import PREFIXE_QUARANTAINE
+
+# Tables dont les lignes orphelines sont supprimées (les autres violations sont seulement signalées)
+TABLES_ENFANTS = ('images', 'liens')
+
+UPLOAD_FOLDER = 'database/uploads'
+DATABASE_FILE = 'database/database.db'
+
+# Au-delà de cette proportion de fichiers absents, le stockage est probablement
+# inaccessible (disque réseau non monté) : les références ne sont pas retirées
+SEUIL_FICHIERS_ABSENTS = 0.5
+
+# Configuration des logs
+logger = logging.getLogger(__name__)
+
+
+def lignes_orphelines(conn):
+    """
+    Liste les violations de clés étrangères.
+
+    Returns:
+        dict: {table: [rowid, ...]}
+    """
+    violations = {}
+    for table, rowid, _, _ in conn.execute('PRAGMA foreign_key_check'):
+        violations.setdefault(table, []).append(rowid)
+    return violations
+
+
+def compteurs_incorrects(conn):
+    """
+    Compare les compteurs de la table `fichiers` aux références réelles.
+
+    Returns:
+        list: Tuples (chemin, compteur enregistré, nombre réel de références)
+    """
+    return conn.execute("""
+        WITH reelles AS (
+            SELECT chemin, COUNT(*) AS n FROM (
+                SELECT image_principale AS chemin FROM objets WHERE image_principale IS NOT NULL AND image_principale != ''
+                UNION ALL
+                SELECT chemin FROM images WHERE chemin IS NOT NULL AND chemin != ''
+            ) GROUP BY chemin
+        )
+        SELECT f.chemin, f.refs, COALESCE(r.n, 0) FROM fichiers f LEFT JOIN reelles r ON r.chemin = f.chemin
+        WHERE f.refs != COALESCE(r.n, 0) AND NOT (f.refs <= 0 AND r.n IS NULL)
+        UNION ALL
+        SELECT r.chemin, 0, r.n FROM reelles r WHERE r.chemin NOT IN (SELECT chemin FROM fichiers)
+    """).fetchall()
+
+
+def references_sans_fichier(conn, existe):
+    """
+    Liste les chemins référencés dont le fichier est absent du stockage.
+
+    Args:
+        conn: Connexion SQLite ouverte
+        existe: Fonction indiquant si une clé existe dans le stockage (ex: Storage.exists)
+
+    Returns:
+        tuple: (chemins absents, chemins présents seulement en quarantaine,
+            nombre de chemins vérifiés)
+    """
+    chemins = [row[0] for row in conn.execute('SELECT chemin FROM fichiers WHERE refs > 0')]
+    absents, en_quarantaine = [], []
+    for chemin in chemins:
+        if not chemin.startswith(PREFIXE_UPLOADS):
+            continue
+        cle = chemin[len(PREFIXE_UPLOADS):]
+        if existe(cle):
+            continue
+        # Image identique téléversée pendant la quarantaine : le balayeur la restaure
+        (en_quarantaine if existe(PREFIXE_QUARANTAINE + cle) else absents).append(chemin)
+    return absents, en_quarantaine, len(chemins)
+
+
+def verifier_integrite(conn, existe=None, corriger=False):
+    """
+    Vérifie (et corrige si demandé) l'intégrité de la base.
+
+    Args:
+        conn: Connexion SQLite ouverte
+        existe: Fonction indiquant si une clé existe dans le stockage des uploads
+            (ex: Storage.exists ; sans elle, la présence des fichiers n'est pas vérifiée)
+        corriger: True pour supprimer les lignes orphelines, recalculer les
+            compteurs et retirer les références vers des fichiers absents
+
+    Returns:
+        dict: Rapport (lignes_orphelines, autres_violations, compteurs_incorrects,
+            references_sans_fichier, references_en_quarantaine, corrige, erreurs, duree)
+    """
+    debut = time.perf_counter()
+    rapport = {
+        'lignes_orphelines': {table: 0 for table in TABLES_ENFANTS},
+        'autres_violations': {},
+        'compteurs_incorrects': 0,
+        'references_sans_fichier': [],
+        'references_en_quarantaine': [],
+        'corrige': corriger,
+        'erreurs': []
+    }
+
+    for table, rowids in lignes_orphelines(conn).items():
+        if table not in TABLES_ENFANTS:
+            rapport['autres_violations'][table] = len(rowids)
+            continue
+        rapport['lignes_orphelines'][table] = len(rowids)
+        if corriger:
+            # Supprimées ligne par ligne : les triggers (fichiers, recherche) suivent
+            conn.executemany(f'DELETE FROM {table} WHERE rowid = ?', [(rowid,) for rowid in rowids])
+
+    try:
+        incorrects = compteurs_incorrects(conn)
+    except sqlite3.OperationalError:
+        incorrects = []  # Table `fichiers` absente : base pas encore mise à niveau
+    rapport['compteurs_incorrects'] = len(incorrects)
+    if corriger and incorrects:
+        conn.executemany(
+            'INSERT INTO fichiers (chemin, refs) VALUES (?, ?) ON CONFLICT(chemin) DO UPDATE SET refs = excluded.refs',
+            [(chemin, reel) for chemin, _, reel in incorrects]
+        )
+
+    if existe is not None:
+        absents, en_quarantaine, verifies = references_sans_fichier(conn, existe)
+        rapport['references_sans_fichier'] = absents
+        rapport['references_en_quarantaine'] = en_quarantaine
+        if corriger and absents:
+            if len(absents) > verifies * SEUIL_FICHIERS_ABSENTS:
+                rapport['erreurs'].append(
+                    f"{len(absents)} fichier(s) sur {verifies} introuvable(s) : stockage inaccessible ? "
+                    "Les références n'ont pas été retirées."
+                )
+            else:
+                valeurs = [(chemin,) for chemin in absents]
+                conn.executemany(
+                    "UPDATE objets SET image_principale = '', image_largeur = NULL, image_hauteur = NULL, "
+                    "image_couleur = NULL, image_lqip = NULL WHERE image_principale = ?", valeurs
+                )
+                conn.executemany('DELETE FROM images WHERE chemin = ?', valeurs)
+
+    if corriger:
+        conn.commit()
+
+    rapport['duree'] = time.perf_counter() - debut
+    return rapport
+
+
+def main():
+    """Fonction principale exécutant la vérification."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Vérifie l'intégrité de la base de l'inventaire.")
+    parser.add_argument('--corriger', action='store_true',
+                        help="Supprime les lignes orphelines, recalcule les compteurs de fichiers "
+                             "et retire les références vers des fichiers absents")
+    parser.add_argument('--base', default=DATABASE_FILE,
+                        help="Base de données de l'application (défaut : %(default)s)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.base)
+    conn.execute('PRAGMA foreign_keys = ON')
+    try:
+        rapport = verifier_integrite(
+            conn, lambda cle: os.path.isfile(os.path.join(UPLOAD_FOLDER, cle)), corriger=args.corriger
+        )
+    finally:
+        conn.close()
+
+    action = "supprimée(s)" if args.corriger else "détectée(s)"
+    for table, nombre in rapport['lignes_orphelines'].items():
+        logger.info(f"{table} : {nombre} ligne(s) orpheline(s) {action}")
+    for table, nombre in rapport['autres_violations'].items():
+        logger.warning(f"{table} : {nombre} violation(s) de clé étrangère")
+    logger.info(f"Compteurs de fichiers incorrects : {rapport['compteurs_incorrects']}")
+    logger.info(f"Références vers des fichiers absents : {len(rapport['references_sans_fichier'])}")
+    logger.info(f"Références vers des fichiers en quarantaine : {len(rapport['references_en_quarantaine'])}")
+    for erreur in rapport['erreurs']:
+        logger.error(erreur)
+    logger.info(f"Terminé en {rapport['duree'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Module du journal d'authentification (table `auth_logs` de la base de sécurité).
+
+Les événements (connexion, échec, déconnexion) ne sont plus écrits pendant la
+requête : ils sont placés dans une file en mémoire, puis écrits par lots, dans
+une seule transaction, par un thread d'arrière-plan. La file est vidée à
+l'arrêt du processus (atexit).
+
+Les lignes plus anciennes que la durée de rétention sont regroupées en
+agrégats quotidiens par action et par adresse IP (`auth_logs_quotidiens`),
+ce qui borne la taille de la table.
+"""
+
+import queue
+import atexit
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+TAILLE_LOT = 100            # Nombre d'événements déclenchant une écriture immédiate
+INTERVALLE_ECRITURE = 2.0   # Délai maximal avant l'écriture d'un événement (secondes)
+MAX_EN_ATTENTE = 10000      # Au-delà, les événements d'un lot en échec ne sont pas remis en file
+RETENTION_JOURS = 90        # Âge à partir duquel les lignes sont regroupées en agrégats
+LIGNES_PAR_PAGE = 50        # Lignes brutes affichées par page sur la page Sécurité
+
+
+def _maintenant():
+    """Date au format de CURRENT_TIMESTAMP de SQLite (UTC)."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class JournalAuth:
+    """
+    File d'écriture des événements d'authentification.
+
+    Args:
+        get_db_connection: Fonction pour obtenir une connexion à la base de sécurité
+        taille_lot: Nombre d'événements en attente réveillant l'écriture
+        intervalle: Délai maximal avant l'écriture d'un événement (secondes)
+        logger: Instance de logger (optionnel)
+    """
+
+    def __init__(self, get_db_connection, taille_lot=TAILLE_LOT, intervalle=INTERVALLE_ECRITURE, logger=None):
+        self.get_db_connection = get_db_connection
+        self.taille_lot = taille_lot
+        self.intervalle = intervalle
+        self.logger = logger
+        self._file = queue.Queue()
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._ecriture = threading.Lock()
+        self._thread = None
+        self._verrou_thread = threading.Lock()
+
+    def enregistrer(self, user_id, action, ip_address, user_agent):
+        """Place un événement dans la file (sans accès à la base)."""
+        self._file.put((user_id, action, ip_address, user_agent, _maintenant()))
+        if self._file.qsize() >= self.taille_lot:
+            self._reveil.set()
+
+    def demarrer(self):
+        """Démarre le thread d'écriture (une seule fois) et programme le vidage à l'arrêt."""
+        if self._thread is not None:
+            return
+        with self._verrou_thread:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._boucle, name='journal-auth', daemon=True)
+                self._thread.start()
+                atexit.register(self.arreter)
+
+    def arreter(self):
+        """Arrête le thread et écrit les derniers événements en attente."""
+        self._arret.set()
+        self._reveil.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.vider()
+
+    def vider(self):
+        """
+        Écrit tous les événements en attente, en une transaction.
+
+        Returns:
+            int: Nombre d'événements écrits
+        """
+        with self._ecriture:
+            lot = []
+            while True:
+                try:
+                    lot.append(self._file.get_nowait())
+                except queue.Empty:
+                    break
+            if not lot:
+                return 0
+
+            try:
+                conn = self.get_db_connection()
+                try:
+                    conn.executemany(
+                        'INSERT INTO auth_logs (user_id, action, ip_address, user_agent, timestamp) VALUES (?, ?, ?, ?, ?)',
+                        lot
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                if self.logger:
+                    self.logger.error(f"Erreur lors de l'écriture du journal d'authentification: {e}")
+                # Nouvel essai au prochain passage, sans laisser la file grossir indéfiniment
+                if self._file.qsize() + len(lot) <= MAX_EN_ATTENTE:
+                    for evenement in lot:
+                        self._file.put(evenement)
+                return 0
+            return len(lot)
+
+    def _boucle(self):
+        """Boucle du thread : écrit la file toutes les `intervalle` secondes, ou dès qu'un lot est plein."""
+        while not self._arret.is_set():
+            self._reveil.wait(self.intervalle)
+            self._reveil.clear()
+            try:
+                self.vider()
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Erreur du journal d'authentification: {e}", exc_info=True)
+
+
+def agreger_anciens_logs(get_db_connection, jours=RETENTION_JOURS, logger=None):
+    """
+    Regroupe les lignes de plus de `jours` jours en agrégats quotidiens (action, adresse IP).
+
+    Agrégation et suppression sont faites dans la même transaction : une ligne
+    n'est jamais comptée deux fois, ni perdue.
+
+    Args:
+        get_db_connection: Fonction pour obtenir une connexion à la base de sécurité
+        jours: Durée de conservation des lignes détaillées
+        logger: Instance de logger (optionnel)
+
+    Returns:
+        int: Nombre de lignes regroupées
+    """
+    limite = (datetime.now(timezone.utc) - timedelta(days=jours)).strftime('%Y-%m-%d 00:00:00')
+
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            INSERT INTO auth_logs_quotidiens (jour, action, ip_address, nombre)
+            SELECT date(timestamp), action, COALESCE(ip_address, ''), COUNT(*)
+            FROM auth_logs WHERE timestamp < ?
+            GROUP BY date(timestamp), action, COALESCE(ip_address, '')
+            ON CONFLICT(jour, action, ip_address) DO UPDATE SET nombre = nombre + excluded.nombre
+        ''', (limite,))
+        cursor = conn.execute('DELETE FROM auth_logs WHERE timestamp < ?', (limite,))
+        conn.commit()
+        regroupees = cursor.rowcount
+    finally:
+        conn.close()
+
+    if logger and regroupees:
+        logger.info(f"Journal d'authentification : {regroupees} ligne(s) regroupée(s) en agrégats quotidiens")
+    return regroupees
+
+
+def resume_journal(get_db_connection, jours=30):
+    """
+    Nombre d'événements par jour et par action sur la période, agrégats et lignes détaillées confondus.
+
+    Returns:
+        tuple: (liste de {'jour', 'action', 'nombre'}, liste des adresses IP
+            ayant le plus d'échecs : {'ip_address', 'nombre'})
+    """
+    debut = (datetime.now(timezone.utc) - timedelta(days=jours)).strftime('%Y-%m-%d')
+    conn = get_db_connection()
+    try:
+        evenements = '''
+            SELECT date(timestamp) AS jour, action, COALESCE(ip_address, '') AS ip_address, COUNT(*) AS nombre
+            FROM auth_logs WHERE timestamp >= ? GROUP BY 1, 2, 3
+            UNION ALL
+            SELECT jour, action, ip_address, nombre FROM auth_logs_quotidiens WHERE jour >= ?
+        '''
+        par_jour = conn.execute(f'''
+            SELECT jour, action, SUM(nombre) AS nombre FROM ({evenements})
+            GROUP BY jour, action ORDER BY jour DESC, action
+        ''', (debut, debut)).fetchall()
+        echecs_par_ip = conn.execute(f'''
+            SELECT ip_address, SUM(nombre) AS nombre FROM ({evenements})
+            WHERE action = 'failed_attempt'
+            GROUP BY ip_address ORDER BY nombre DESC LIMIT 10
+        ''', (debut, debut)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in par_jour], [dict(row) for row in echecs_par_ip]
+
+
+def lire_evenements(get_db_connection, avant=None, limite=LIGNES_PAR_PAGE):
+    """
+    Retourne une page d'événements détaillés, du plus récent au plus ancien.
+
+    La pagination se fait par identifiant (`avant`) : le coût d'une page ne
+    dépend pas de sa position dans le journal.
+
+    Returns:
+        tuple: (liste des événements, identifiant à passer en `avant` pour la page suivante ou None)
+    """
+    conn = get_db_connection()
+    try:
+        colonnes = 'SELECT id, user_id, action, ip_address, user_agent, timestamp FROM auth_logs'
+        if avant is None:
+            rows = conn.execute(f'{colonnes} ORDER BY id DESC LIMIT ?', (limite + 1,)).fetchall()
+        else:
+            rows = conn.execute(f'{colonnes} WHERE id < ? ORDER BY id DESC LIMIT ?', (avant, limite + 1)).fetchall()
+    finally:
+        conn.close()
+    suivante = rows[limite - 1]['id'] if len(rows) > limite else None
+    return [dict(row) for row in rows[:limite]], suivante
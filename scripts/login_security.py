@@ -3,27 +3,39 @@ Module de sécurité pour la gestion des tentatives de connexion (version BD).
 
 Ce module gère le suivi des tentatives de connexion, le blocage temporaire
 des utilisateurs après trop d'échecs, et le nettoyage des logs anciens.
+Les fonctions reçoivent la connexion à la base de sécurité (SECURITY_DATABASE),
+distincte de celle du catalogue.
 """
 
 from datetime import datetime, timedelta
 import logging
 import sqlite3
+import threading
 
 # Configuration de la limite de tentatives de connexion
 MAX_LOGIN_ATTEMPTS = 5  # Nombre maximum de tentatives
 LOCKOUT_TIME = 15  # Durée de blocage en minutes
+MAX_VERROUS_EN_CACHE = 10000  # Nombre maximal de blocages mémorisés par processus
+
+# Blocages en cours connus de ce processus : (username, ip_address) -> fin du blocage
+_verrous = {}
+_verrous_lock = threading.Lock()
 
 def init_security_db(get_db_connection):
     """
-    Initialise la table des tentatives de connexion dans la base de données
+    Initialise la base de sécurité (tentatives de connexion, journal d'authentification et ses agrégats).
+
+    Ces tables sont dans un fichier SQLite distinct du catalogue : une rafale de
+    tentatives de connexion ne dispute pas le verrou d'écriture aux modifications
+    de l'inventaire. La base est passée en mode WAL (réglage conservé dans le fichier).
 
     Args:
-        get_db_connection: Fonction pour obtenir une connexion à la base de données
+        get_db_connection: Fonction pour obtenir une connexion à la base de sécurité
     """
     conn = get_db_connection()
 
-    # Créer la table login_attempts si elle n'existe pas
-    conn.execute('''
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript('''
     CREATE TABLE IF NOT EXISTS login_attempts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT NOT NULL,
@@ -32,12 +44,75 @@ def init_security_db(get_db_connection):
         locked_until TIMESTAMP,
         last_attempt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         UNIQUE(username, ip_address)
-    )
+    );
+
+    -- user_id fait référence à users (base du catalogue) : pas de clé étrangère entre fichiers
+    CREATE TABLE IF NOT EXISTS auth_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        action TEXT NOT NULL,
+        ip_address TEXT,
+        user_agent TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_auth_logs_timestamp ON auth_logs (timestamp);
+
+    -- Agrégats quotidiens des lignes anciennes d'auth_logs (voir scripts/journal_auth.py)
+    CREATE TABLE IF NOT EXISTS auth_logs_quotidiens (
+        jour TEXT NOT NULL,
+        action TEXT NOT NULL,
+        ip_address TEXT NOT NULL,
+        nombre INTEGER NOT NULL,
+        PRIMARY KEY (jour, action, ip_address)
+    ) WITHOUT ROWID;
     ''')
 
     conn.commit()
     conn.close()
 
+def migrer_depuis_catalogue(get_db_connection, catalogue_path, logger=None):
+    """
+    Déplace les tables de sécurité de l'ancienne base unique vers la base de sécurité.
+
+    Les lignes sont copiées (en conservant leurs identifiants, INSERT OR IGNORE)
+    puis les tables du catalogue supprimées, dans une même transaction : une
+    migration interrompue est simplement reprise au démarrage suivant.
+
+    Args:
+        get_db_connection: Fonction pour obtenir une connexion à la base de sécurité
+        catalogue_path: Chemin de la base du catalogue
+        logger: Instance de logger (optionnel)
+
+    Returns:
+        dict: Nombre de lignes migrées par table
+    """
+    migrees = {}
+    conn = get_db_connection()
+    try:
+        conn.execute('ATTACH DATABASE ? AS catalogue', (catalogue_path,))
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM catalogue.sqlite_master WHERE type = 'table' AND name IN ('login_attempts', 'auth_logs')"
+        )}
+        for table, colonnes in (
+            ('login_attempts', 'id, username, ip_address, attempts, locked_until, last_attempt'),
+            ('auth_logs', 'id, user_id, action, ip_address, user_agent, timestamp'),
+        ):
+            if table not in tables:
+                continue
+            cursor = conn.execute(
+                f'INSERT OR IGNORE INTO main.{table} ({colonnes}) SELECT {colonnes} FROM catalogue.{table}'
+            )
+            migrees[table] = cursor.rowcount
+            conn.execute(f'DROP TABLE catalogue.{table}')
+        conn.commit()
+        conn.execute('DETACH DATABASE catalogue')
+    finally:
+        conn.close()
+
+    if logger and migrees:
+        logger.info(f"Tables de sécurité migrées vers leur propre base : {migrees}")
+    return migrees
+
 def get_login_attempt_key(username, request):
     """
     Crée une clé unique pour suivre les tentatives de connexion
@@ -52,10 +127,41 @@ def get_login_attempt_key(username, request):
     ip = request.remote_addr
     return (username, ip)
 
+def _verrou_en_cache(key, now):
+    """Retourne la fin du blocage connue de ce processus pour la clé, ou None."""
+    with _verrous_lock:
+        locked_until = _verrous.get(key)
+        if locked_until and locked_until <= now:
+            del _verrous[key]
+            return None
+        return locked_until
+
+def _mettre_en_cache(key, locked_until, now):
+    """Mémorise un blocage (en purgeant les blocages expirés si le cache est plein)."""
+    with _verrous_lock:
+        if len(_verrous) >= MAX_VERROUS_EN_CACHE:
+            for cle in [cle for cle, fin in _verrous.items() if fin <= now]:
+                del _verrous[cle]
+        if len(_verrous) < MAX_VERROUS_EN_CACHE:
+            _verrous[key] = locked_until
+
+def _message_blocage(username, locked_until, now, logger=None):
+    """Construit le message affiché à un utilisateur bloqué."""
+    remaining = (locked_until - now).total_seconds() // 60
+    message = f"Compte temporairement bloqué. Réessayez dans {int(remaining)} minutes."
+
+    if logger:
+        logger.warning(f"Tentative de connexion bloquée pour {username}: {message}")
+
+    return message
+
 def check_login_attempts(username, request, get_db_connection, logger=None):
     """
     Vérifie si l'utilisateur est autorisé à se connecter ou s'il est bloqué
 
+    Un couple (utilisateur, IP) déjà connu comme bloqué par ce processus est
+    refusé sans accès à la base.
+
     Args:
         username: Le nom d'utilisateur à vérifier
         request: L'objet request Flask
@@ -68,39 +174,37 @@ def check_login_attempts(username, request, get_db_connection, logger=None):
     key = get_login_attempt_key(username, request)
     now = datetime.now()
 
+    locked_until = _verrou_en_cache(key, now)
+    if locked_until:
+        return False, _message_blocage(username, locked_until, now, logger)
+
     conn = get_db_connection()
 
-    # Rechercher l'entrée pour cet utilisateur et cette IP
+    # Rechercher un blocage en cours pour cet utilisateur et cette IP (posé par n'importe quel worker)
     query = """
-    SELECT attempts, locked_until FROM login_attempts
-    WHERE username = ? AND ip_address = ?
+    SELECT locked_until FROM login_attempts
+    WHERE username = ? AND ip_address = ? AND locked_until > ?
     """
-    result = conn.execute(query, key).fetchone()
+    result = conn.execute(query, (*key, now.isoformat())).fetchone()
     conn.close()
 
-    # Si aucune entrée trouvée, l'utilisateur est autorisé
+    # Si aucun blocage en cours, l'utilisateur est autorisé (un blocage terminé est réinitialisé à la prochaine tentative)
     if not result:
         return True, None
 
-    # Vérifier si l'utilisateur est bloqué
-    if result['locked_until'] and datetime.fromisoformat(result['locked_until']) > now:
-        locked_until = datetime.fromisoformat(result['locked_until'])
-        remaining = (locked_until - now).total_seconds() // 60
-        message = f"Compte temporairement bloqué. Réessayez dans {int(remaining)} minutes."
-
-        if logger:
-            logger.warning(f"Tentative de connexion bloquée pour {username}: {message}")
-
-        return False, message
-
-    # Si la période de blocage est terminée, on laisse passer (le compteur sera réinitialisé plus tard)
-    return True, None
+    locked_until = datetime.fromisoformat(result['locked_until'])
+    _mettre_en_cache(key, locked_until, now)
+    return False, _message_blocage(username, locked_until, now, logger)
 
 def increment_login_attempts(username, request, get_db_connection, logger=None):
     """
     Incrémente le compteur de tentatives de connexion pour un utilisateur
     Bloque l'utilisateur si le nombre maximum de tentatives est atteint
 
+    Une seule requête atomique (UPSERT ... RETURNING) : création du compteur,
+    réinitialisation après un blocage terminé, incrément et blocage. Deux
+    workers ne peuvent donc pas perdre une tentative.
+
     Args:
         username: Le nom d'utilisateur à incrémenter
         request: L'objet request Flask
@@ -112,71 +216,43 @@ def increment_login_attempts(username, request, get_db_connection, logger=None):
     """
     key = get_login_attempt_key(username, request)
     now = datetime.now()
+    lock = (now + timedelta(minutes=LOCKOUT_TIME)).isoformat()
 
     conn = get_db_connection()
 
-    # Vérifier si une entrée existe déjà pour cet utilisateur et cette IP
-    query = """
-    SELECT id, attempts, locked_until FROM login_attempts
-    WHERE username = ? AND ip_address = ?
+    # Un blocage terminé repart de 1 ; le blocage est posé dès que le maximum est atteint
+    upsert_query = """
+    INSERT INTO login_attempts (username, ip_address, attempts, locked_until, last_attempt)
+    VALUES (:username, :ip, 1, CASE WHEN 1 >= :max THEN :lock END, :now)
+    ON CONFLICT(username, ip_address) DO UPDATE SET
+        attempts = CASE WHEN locked_until <= :now THEN 1 ELSE attempts + 1 END,
+        locked_until = CASE WHEN (CASE WHEN locked_until <= :now THEN 1 ELSE attempts + 1 END) >= :max
+                            THEN :lock END,
+        last_attempt = :now
+    RETURNING attempts, locked_until
     """
-    result = conn.execute(query, key).fetchone()
-
-    if result:
-        # Si une entrée existe et que le blocage est terminé, réinitialiser le compteur
-        if result['locked_until'] and datetime.fromisoformat(result['locked_until']) <= now:
-            update_query = """
-            UPDATE login_attempts
-            SET attempts = 1, locked_until = NULL, last_attempt = ?
-            WHERE id = ?
-            """
-            conn.execute(update_query, (now.isoformat(), result['id']))
-            attempts = 1
-        else:
-            # Sinon, incrémenter le compteur
-            update_query = """
-            UPDATE login_attempts
-            SET attempts = attempts + 1, last_attempt = ?
-            WHERE id = ?
-            """
-            conn.execute(update_query, (now.isoformat(), result['id']))
-            attempts = result['attempts'] + 1
-    else:
-        # Si aucune entrée n'existe, en créer une nouvelle
-        insert_query = """
-        INSERT INTO login_attempts (username, ip_address, attempts, last_attempt)
-        VALUES (?, ?, 1, ?)
-        """
-        conn.execute(insert_query, (username, key[1], now.isoformat()))
-        attempts = 1
+    result = conn.execute(upsert_query, {
+        'username': username, 'ip': key[1], 'max': MAX_LOGIN_ATTEMPTS, 'lock': lock, 'now': now.isoformat()
+    }).fetchone()
+    conn.commit()
+    conn.close()
 
+    attempts = result['attempts']
     if logger:
         logger.info(f"Tentative de connexion échouée pour {username} - Tentative #{attempts}")
 
-    # Vérifier si l'utilisateur doit être bloqué
-    if attempts >= MAX_LOGIN_ATTEMPTS:
-        # Bloquer l'utilisateur pour la durée configurée
-        locked_until = now + timedelta(minutes=LOCKOUT_TIME)
-
-        update_query = """
-        UPDATE login_attempts
-        SET locked_until = ?
-        WHERE username = ? AND ip_address = ?
-        """
-        conn.execute(update_query, (locked_until.isoformat(), username, key[1]))
+    # Vérifier si l'utilisateur est bloqué
+    if result['locked_until']:
+        locked_until = datetime.fromisoformat(result['locked_until'])
+        _mettre_en_cache(key, locked_until, now)
 
         message = f"Trop de tentatives de connexion échouées. Compte bloqué pour {LOCKOUT_TIME} minutes."
 
         if logger:
             logger.warning(f"Compte {username} bloqué jusqu'à {locked_until}")
 
-        conn.commit()
-        conn.close()
         return True, message
 
-    conn.commit()
-    conn.close()
-
     remaining = MAX_LOGIN_ATTEMPTS - attempts
     return False, f"Mot de passe incorrect. Il vous reste {remaining} tentative(s)."
 
@@ -192,6 +268,9 @@ def reset_login_attempts(username, request, get_db_connection, logger=None):
     """
     key = get_login_attempt_key(username, request)
 
+    with _verrous_lock:
+        _verrous.pop(key, None)
+
     conn = get_db_connection()
 
     # Supprimer l'entrée pour cet utilisateur et cette IP
@@ -0,0 +1,201 @@
+"""
+Module des tâches de maintenance et de leur planification.
+
+Chaque tâche (vérification d'intégrité, nettoyage, optimisation des bases,
+etc.) enregistre dans la table `journal_maintenance` la date, la durée et le
+résultat de sa dernière exécution ; le tableau de bord d'administration les
+affiche. `executer_taches_dues` lance les tâches dont l'intervalle est écoulé :
+elle est appelée par le balayeur de l'application ou par la commande
+`flask --app app maintenance` (timer systemd, voir DEPLOY.md).
+"""
+
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+
+# Configuration des logs
+logger = logging.getLogger(__name__)
+
+
+def enregistrer_execution(conn, tache, duree, resultat=None):
+    """
+    Enregistre la dernière exécution d'une tâche (le commit reste à la charge de l'appelant).
+
+    Args:
+        conn: Connexion SQLite ouverte
+        tache: Nom de la tâche (ex: 'integrite')
+        duree: Durée de l'exécution en secondes
+        resultat: Résultat sérialisable en JSON (rapport, statistiques)
+    """
+    conn.execute(
+        'INSERT OR REPLACE INTO journal_maintenance (tache, execute_le, duree, resultat) VALUES (?, ?, ?, ?)',
+        (tache, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), duree, json.dumps(resultat, ensure_ascii=False))
+    )
+
+
+def lire_journal(conn):
+    """
+    Retourne la dernière exécution de chaque tâche.
+
+    Returns:
+        dict: {tache: {'execute_le', 'duree', 'resultat'}}
+    """
+    journal = {}
+    for row in conn.execute('SELECT tache, execute_le, duree, resultat FROM journal_maintenance ORDER BY tache'):
+        journal[row[0]] = {
+            'execute_le': row[1],
+            'duree': row[2],
+            'resultat': json.loads(row[3]) if row[3] else None
+        }
+    return journal
+
+
+def tache_a_echeance(conn, tache, intervalle):
+    """
+    Indique si une tâche n'a jamais été exécutée ou l'a été il y a plus de `intervalle` secondes.
+    """
+    row = conn.execute('SELECT execute_le FROM journal_maintenance WHERE tache = ?', (tache,)).fetchone()
+    if row is None:
+        return True
+    derniere = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+    return (datetime.now() - derniere).total_seconds() >= intervalle
+
+
+def reserver_tache(conn, tache, intervalle):
+    """
+    Réserve une tâche à échéance pour ce processus.
+
+    La date d'exécution est avancée par une seule instruction, et seulement si
+    la tâche est toujours à échéance : lorsque plusieurs workers consultent le
+    journal en même temps, un seul obtient la tâche. Le résultat précédent est
+    conservé jusqu'à la fin de l'exécution.
+
+    Returns:
+        bool: True si la tâche a été réservée par cet appel
+    """
+    maintenant = datetime.now()
+    limite = (maintenant - timedelta(seconds=intervalle)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.execute('''
+        INSERT INTO journal_maintenance (tache, execute_le, duree) VALUES (?, ?, 0)
+        ON CONFLICT(tache) DO UPDATE SET execute_le = excluded.execute_le WHERE execute_le <= ?
+    ''', (tache, maintenant.strftime('%Y-%m-%d %H:%M:%S'), limite))
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def executer_tache(conn, tache, fonction):
+    """
+    Exécute une tâche, mesure sa durée et l'enregistre dans le journal.
+
+    Args:
+        conn: Connexion SQLite ouverte (utilisée pour le journal)
+        tache: Nom de la tâche
+        fonction: Fonction sans argument retournant le résultat de la tâche
+
+    Returns:
+        Le résultat de la fonction
+    """
+    debut = time.perf_counter()
+    try:
+        resultat = fonction()
+    except Exception as e:
+        # L'échec est journalisé : la tâche sera retentée à l'intervalle suivant
+        conn.rollback()
+        enregistrer_execution(conn, tache, time.perf_counter() - debut, {'erreur': str(e)})
+        conn.commit()
+        raise
+    enregistrer_execution(conn, tache, time.perf_counter() - debut, resultat)
+    conn.commit()
+    return resultat
+
+
+def executer_taches_dues(get_db_connection, taches, forcer=False, seulement=None, logger=logger):
+    """
+    Exécute les tâches dont l'intervalle est écoulé depuis leur dernière exécution.
+
+    Chaque tâche due est d'abord réservée (voir reserver_tache) : lancé par
+    plusieurs workers à la fois, l'ordonnanceur n'exécute une tâche qu'une fois.
+
+    Args:
+        get_db_connection: Fonction pour obtenir une connexion à la base (journal)
+        taches: Liste de tuples (nom, intervalle en secondes, fonction(conn)) ;
+            un intervalle nul désactive la tâche
+        forcer: True pour ignorer les intervalles
+        seulement: Noms des tâches à exécuter (toutes par défaut ; une tâche
+            nommée explicitement est exécutée même désactivée)
+        logger: Journal où consigner les erreurs
+
+    Returns:
+        dict: {nom: résultat} des tâches exécutées ({'erreur': message} en cas d'échec)
+    """
+    resultats = {}
+    for nom, intervalle, fonction in taches:
+        if seulement and nom not in seulement:
+            continue
+        if not intervalle and not seulement:
+            continue
+        conn = get_db_connection()
+        try:
+            if not forcer and not seulement and not reserver_tache(conn, nom, intervalle):
+                continue
+            try:
+                resultats[nom] = executer_tache(conn, nom, lambda: fonction(conn))
+            except Exception as e:
+                logger.error(f"Erreur de la tâche de maintenance '{nom}': {e}", exc_info=True)
+                resultats[nom] = {'erreur': str(e)}
+        finally:
+            conn.close()
+    return resultats
+
+
+def optimiser(conn):
+    """
+    Met à jour les statistiques de l'optimiseur de requêtes.
+
+    ANALYZE complet la première fois (aucune statistique), puis PRAGMA optimize,
+    qui n'analyse que les tables dont le volume a changé.
+    """
+    statistiques = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if statistiques:
+        conn.execute('PRAGMA optimize')
+    else:
+        conn.execute('ANALYZE')
+    conn.commit()
+    return {'analyse_complete': not statistiques}
+
+
+def point_de_controle_wal(conn):
+    """
+    Reporte le journal WAL dans la base et le tronque (sans effet hors mode WAL).
+
+    Returns:
+        dict: {'bloque', 'pages_journal', 'pages_reportees'}
+    """
+    bloque, pages_journal, pages_reportees = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    return {'bloque': bool(bloque), 'pages_journal': pages_journal, 'pages_reportees': pages_reportees}
+
+
+def vacuum_incremental(conn, pages=None):
+    """
+    Rend au système les pages libres de la base.
+
+    La première fois, la base est passée en auto_vacuum INCREMENTAL, ce qui
+    exige un VACUUM complet ; ensuite, seul PRAGMA incremental_vacuum est lancé.
+
+    Args:
+        conn: Connexion SQLite ouverte, sans transaction en cours
+        pages: Nombre maximal de pages à libérer (toutes par défaut)
+
+    Returns:
+        dict: {'conversion': VACUUM complet effectué, 'pages_liberees': pages rendues}
+    """
+    avant = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return {'conversion': True, 'pages_liberees': avant}
+    # Chaque pas de la requête libère une page : le curseur doit être lu jusqu'au bout
+    conn.execute(f'PRAGMA incremental_vacuum({int(pages) if pages else 0})').fetchall()
+    apres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return {'conversion': False, 'pages_liberees': avant - apres}
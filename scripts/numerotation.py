@@ -0,0 +1,145 @@
+"""
+Module d'attribution des numéros d'inventaire (format INV_IC2_xxxx).
+
+Les numéros utilisés sont indexés via la colonne générée `objets.numero_seq`.
+Les numéros libres inférieurs au plus haut numéro déjà distribué sont tenus dans
+la table `numeros_inventaire_libres` (alimentée par les triggers de suppression
+et de renumérotation), ce qui permet de trouver le prochain numéro par une simple
+lecture d'index au lieu de parcourir tout l'inventaire.
+
+Chaque numéro proposé dans le formulaire d'ajout est réservé pour une durée
+limitée, sous verrou d'écriture (BEGIN IMMEDIATE) : deux administrateurs ne se
+voient jamais proposer le même numéro, quel que soit le worker qui les sert.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+PREFIXE_INVENTAIRE = 'INV_IC2_'
+DUREE_RESERVATION = 30  # Durée de réservation d'un numéro en minutes
+
+_PATTERN_NUMERO = re.compile(r'^INV_IC2_(\d{4})$')
+
+
+def formater_numero(numero_seq):
+    """Formate un numéro séquentiel en numéro d'inventaire (ex: 12 -> INV_IC2_0012)."""
+    return f'{PREFIXE_INVENTAIRE}{numero_seq:04d}'
+
+
+def extraire_numero(numero_inventaire):
+    """Retourne le numéro séquentiel d'un numéro d'inventaire, ou None s'il n'est pas au format."""
+    match = _PATTERN_NUMERO.match(numero_inventaire or '')
+    return int(match.group(1)) if match else None
+
+
+def _liberer_reservations(conn, condition, params):
+    """Supprime des réservations et rend leurs numéros inutilisés à la liste des numéros libres."""
+    conn.execute(f"""
+        INSERT OR IGNORE INTO numeros_inventaire_libres (numero_seq)
+        SELECT r.numero_seq FROM reservations_inventaire r
+        WHERE {condition}
+          AND NOT EXISTS (SELECT 1 FROM objets o WHERE o.numero_seq = r.numero_seq)
+    """, params)
+    conn.execute(f'DELETE FROM reservations_inventaire AS r WHERE {condition}', params)
+
+
+def _plus_haut_numero(conn):
+    """Retourne le plus haut numéro distribué, en intégrant les numéros saisis à la main."""
+    row = conn.execute('SELECT plus_haut FROM inventaire_sequence WHERE id = 1').fetchone()
+    plus_haut = row['plus_haut'] if row else -1
+
+    max_objets = conn.execute('SELECT MAX(numero_seq) FROM objets').fetchone()[0]
+    if max_objets is not None and max_objets > plus_haut:
+        # Un numéro plus grand a été saisi manuellement : les trous intermédiaires
+        # deviennent des numéros libres (coût proportionnel au saut, payé une seule fois)
+        conn.execute("""
+            WITH RECURSIVE seq(n) AS (
+                SELECT ? UNION ALL SELECT n + 1 FROM seq WHERE n < ?
+            )
+            INSERT OR IGNORE INTO numeros_inventaire_libres (numero_seq)
+            SELECT n FROM seq
+            WHERE NOT EXISTS (SELECT 1 FROM objets WHERE numero_seq = seq.n)
+              AND NOT EXISTS (SELECT 1 FROM reservations_inventaire r WHERE r.numero_seq = seq.n)
+        """, (plus_haut + 1, max_objets))
+        plus_haut = max_objets
+        _enregistrer_plus_haut(conn, plus_haut)
+
+    return plus_haut
+
+
+def _enregistrer_plus_haut(conn, plus_haut):
+    conn.execute("""
+        INSERT INTO inventaire_sequence (id, plus_haut) VALUES (1, ?)
+        ON CONFLICT(id) DO UPDATE SET plus_haut = excluded.plus_haut
+    """, (plus_haut,))
+
+
+def _prochain_numero_libre(conn):
+    """Retire et retourne le plus petit numéro libre (à appeler dans une transaction)."""
+    plus_haut = _plus_haut_numero(conn)
+
+    libre = conn.execute('SELECT MIN(numero_seq) FROM numeros_inventaire_libres').fetchone()[0]
+    if libre is not None:
+        conn.execute('DELETE FROM numeros_inventaire_libres WHERE numero_seq = ?', (libre,))
+        return libre
+
+    _enregistrer_plus_haut(conn, plus_haut + 1)
+    return plus_haut + 1
+
+
+def reserver_numero(get_db_connection, jeton, duree=DUREE_RESERVATION):
+    """
+    Réserve atomiquement le prochain numéro d'inventaire libre.
+
+    Si le jeton possède déjà une réservation encore valide et inutilisée, elle est
+    simplement prolongée : recharger le formulaire ne consomme pas de numéro.
+
+    Args:
+        get_db_connection: Fonction pour obtenir une connexion à la base de données
+        jeton: Identifiant du demandeur (stocké dans sa session)
+        duree: Durée de la réservation en minutes
+
+    Returns:
+        str: Le numéro d'inventaire réservé (ex: INV_IC2_0042)
+    """
+    now = datetime.now()
+    expire_le = (now + timedelta(minutes=duree)).isoformat()
+
+    conn = get_db_connection()
+    try:
+        # Verrou d'écriture immédiat : les réservations concurrentes sont sérialisées
+        conn.execute('BEGIN IMMEDIATE')
+        _liberer_reservations(conn, 'r.expire_le < ?', (now.isoformat(),))
+
+        existante = conn.execute("""
+            SELECT r.numero_seq FROM reservations_inventaire r
+            WHERE r.jeton = ? AND NOT EXISTS (SELECT 1 FROM objets o WHERE o.numero_seq = r.numero_seq)
+        """, (jeton,)).fetchone()
+
+        if existante:
+            numero_seq = existante['numero_seq']
+            conn.execute('UPDATE reservations_inventaire SET expire_le = ? WHERE jeton = ?', (expire_le, jeton))
+        else:
+            conn.execute('DELETE FROM reservations_inventaire WHERE jeton = ?', (jeton,))
+            numero_seq = _prochain_numero_libre(conn)
+            conn.execute(
+                'INSERT INTO reservations_inventaire (numero_seq, jeton, expire_le) VALUES (?, ?, ?)',
+                (numero_seq, jeton, expire_le)
+            )
+
+        conn.commit()
+        return formater_numero(numero_seq)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def liberer_reservation(conn, jeton):
+    """
+    Libère la réservation d'un jeton, dans la transaction de l'appelant.
+
+    Si le numéro réservé n'a finalement pas été utilisé, il redevient libre.
+    """
+    _liberer_reservations(conn, 'r.jeton = ?', (jeton,))
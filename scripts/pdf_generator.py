@@ -18,7 +18,13 @@ import json
 from datetime import datetime
 import qrcode
 
-def generate_object_pdf(objet, images, liens, base_url, lang='fr'):
+def _source_image(chemin, lire_image):
+    """Retourne une source lisible par ReportLab pour une image, ou None si elle est introuvable."""
+    if lire_image:
+        return lire_image(chemin)
+    return chemin if os.path.exists(chemin) else None
+
+def generate_object_pdf(objet, images, liens, base_url, lang='fr', lire_image=None):
     """
     Génère un fichier PDF pour un objet du catalogue avec ses détails et images
 
@@ -28,6 +34,8 @@ def generate_object_pdf(objet, images, liens, base_url, lang='fr'):
         liens: Liste des liens (informations) associés à l'objet
         base_url: URL de base pour construire les chemins complets des images
         lang: Langue du PDF ('fr' ou 'en')
+        lire_image: Fonction retournant le contenu d'une image (chemin en base -> fichier
+            ou None) ; par défaut, le chemin est lu sur le disque local
 
     Returns:
         Objet BytesIO contenant le PDF généré
@@ -260,10 +268,10 @@ def generate_object_pdf(objet, images, liens, base_url, lang='fr'):
 
     # Si l'objet a une image principale, l'ajouter
     if objet['image_principale']:
-        # Chemin physique pour l'image
-        img_path = objet['image_principale'] # Le chemin est déjà complet
-        if os.path.exists(img_path):
-            img = Image(img_path, width=300, height=200, kind='proportional')
+        # Contenu de l'image (disque local ou stockage distant)
+        img_source = _source_image(objet['image_principale'], lire_image)
+        if img_source:
+            img = Image(img_source, width=300, height=200, kind='proportional')
             elements.append(img)
             elements.append(Spacer(1, 0.5*cm))
 
@@ -390,9 +398,9 @@ def generate_object_pdf(objet, images, liens, base_url, lang='fr'):
 
         # Ajouter jusqu'à 3 images supplémentaires
         for i, image in enumerate(images[:3]):
-            img_path = image['chemin']  # Le chemin est déjà complet
-            if os.path.exists(img_path):
-                img = Image(img_path, width=250, height=180, kind='proportional')
+            img_source = _source_image(image['chemin'], lire_image)
+            if img_source:
+                img = Image(img_source, width=250, height=180, kind='proportional')
                 elements.append(img)
                 if image['legende']:
                     elements.append(Paragraph(f"<i>{image['legende']}</i>", normal_style))
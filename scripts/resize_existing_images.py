@@ -3,16 +3,51 @@ Script de redimensionnement et d'optimisation des images existantes.
 
 Ce script parcourt le dossier des uploads et optimise les images qui n'ont pas
 été traitées lors de leur téléchargement initial.
+
+Les images sont traitées en parallèle sur tous les cœurs (un processus par
+cœur). Chaque résultat est ajouté immédiatement à un manifeste JSONL (empreinte,
+dimensions, réglages) : une nouvelle exécution ignore les fichiers déjà traités
+avec les mêmes réglages, et un traitement interrompu reprend là où il s'est
+arrêté.
+
+Une image qui n'a pas besoin d'être redimensionnée n'est réécrite que si le
+nouvel encodage est nettement plus léger : un JPEG déjà optimisé n'est pas
+recompressé à chaque passage (ce qui dégraderait sa qualité). Les variantes
+AVIF/WebP manquantes sont produites au passage, et les dimensions, couleurs
+dominantes et aperçus flous (LQIP) sont renseignés dans la base pour les images
+qui n'en ont pas encore.
+
+Seuls les fichiers à la racine du dossier (anciens uploads) sont traités : ceux
+du stockage par contenu (sous-dossiers ab/cd/) portent le nom de leur contenu et
+ne sont jamais réécrits. Lancez ce script avant scripts/dedup_uploads.py.
+
+Usage : python scripts/resize_existing_images.py [--workers N] [--force] [--base CHEMIN]
 """
 
 import os
+import json
+import time
+import sqlite3
+import hashlib
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
 
+try:
+    from scripts import image_pipeline
+except ImportError:  # Exécution directe : python scripts/resize_existing_images.py
+    import image_pipeline
+
 # Configuration
 UPLOAD_FOLDER = 'database/uploads'
-MAX_SIZE = (1600, 1600)  # Taille maximale (largeur, hauteur)
-JPEG_QUALITY = 85        # Qualité JPEG (0-100)
+MANIFEST_FILE = 'database/optimisation_images.jsonl'  # Hors des uploads : sinon vu comme orphelin
+DATABASE_FILE = 'database/database.db'
+PREFIXE_CHEMIN = 'database/uploads/'  # Préfixe des chemins d'images enregistrés en base
+MAX_SIZE = image_pipeline.MAX_SIZE          # Taille maximale (largeur, hauteur)
+JPEG_QUALITY = image_pipeline.JPEG_QUALITY  # Qualité JPEG (0-100)
+GAIN_MINIMAL = 0.10   # Gain minimal (10 %) pour réécrire une image qui n'est pas redimensionnée
+EXTENSIONS = ('.jpg', '.jpeg', '.png')
 
 # Configuration des logs
 logging.basicConfig(
@@ -21,68 +56,223 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def resize_and_optimize(filepath):
+
+def reglages_courants():
+    """Réglages d'optimisation enregistrés dans le manifeste (un changement force le retraitement)."""
+    return {
+        'max_size': list(MAX_SIZE),
+        'quality': JPEG_QUALITY,
+        'gain_minimal': GAIN_MINIMAL,
+        'variantes': [extension for _, extension, _, _ in image_pipeline.VARIANTES],
+        'lqip': list(image_pipeline.LQIP_SIZE)
+    }
+
+
+def charger_manifeste(manifest_path):
+    """
+    Charge le manifeste : la dernière entrée de chaque fichier fait foi.
+
+    Une dernière ligne tronquée (interruption pendant l'écriture) est ignorée.
+    """
+    entrees = {}
+    if not os.path.exists(manifest_path):
+        return entrees
+
+    with open(manifest_path, encoding='utf-8') as f:
+        for ligne in f:
+            try:
+                entree = json.loads(ligne)
+            except ValueError:
+                continue
+            entrees[entree['fichier']] = entree
+    return entrees
+
+
+def deja_traite(entree, filepath, taille, reglages):
+    """Indique si le fichier est inchangé depuis son passage dans le manifeste."""
+    if not entree or entree.get('reglages') != reglages or entree.get('taille_apres') != taille:
+        return False
+    return entree.get('sha256') == image_pipeline.empreinte_fichier(filepath)
+
+
+def resize_and_optimize(filepath, max_size=MAX_SIZE, quality=JPEG_QUALITY, gain_minimal=GAIN_MINIMAL):
     """
     Redimensionne et optimise une image donnée.
+
+    Exécutée dans un processus du pool : ne journalise rien et retourne un
+    dictionnaire décrivant le résultat (enregistré dans le manifeste).
     """
+    resultat = {'fichier': os.path.basename(filepath)}
     try:
+        taille_avant = os.path.getsize(filepath)
         with Image.open(filepath) as img:
-            # Vérifier si l'image a besoin d'être redimensionnée
-            if img.width > MAX_SIZE[0] or img.height > MAX_SIZE[1]:
-                logger.info(f"Redimensionnement de {os.path.basename(filepath)} ({img.width}x{img.height})")
-                img.thumbnail(MAX_SIZE, Image.Resampling.LANCZOS)
-            else:
-                # Même si la taille est bonne, on veut peut-être ré-enregistrer pour la compression
-                pass
+            dimensions_avant = img.size
+            # Décodage à échelle réduite (draft/reduce) puis rééchantillonnage final
+            reduite = image_pipeline.reduire(img, max_size)
+            redimensionnee = reduite.size != dimensions_avant
+
+            # On conserve le format original (déduit de l'extension)
+            donnees = image_pipeline.encoder_image(
+                reduite, image_pipeline.format_depuis_extension(filepath), quality
+            )
 
-            # Conversion en RGB si nécessaire (pour éviter les erreurs avec les JPEG)
-            if img.mode in ('RGBA', 'P') and filepath.lower().endswith(('.jpg', '.jpeg')):
-                img = img.convert('RGB')
+            if redimensionnee or len(donnees) <= taille_avant * (1 - gain_minimal):
+                image_pipeline.ecrire_atomiquement(filepath, donnees)
+                action = 'redimensionnee' if redimensionnee else 'recompressee'
+                sha256, taille_apres = hashlib.sha256(donnees).hexdigest(), len(donnees)
+            else:
+                # Gain insuffisant : le fichier d'origine est conservé tel quel
+                action = 'inchangee'
+                sha256, taille_apres = image_pipeline.empreinte_fichier(filepath), taille_avant
 
-            # Sauvegarde avec optimisation
-            # On conserve le format original sauf si on force autre chose
-            img.save(filepath, optimize=True, quality=JPEG_QUALITY)
-            logger.info(f"Optimisé : {os.path.basename(filepath)}")
-            return True
+            # Variantes AVIF/WebP servies aux navigateurs qui les acceptent
+            variantes = image_pipeline.creer_variantes(reduite, filepath, taille_apres)
+            couleur, lqip = image_pipeline.apercu_image(reduite)
 
+        resultat.update({
+            'action': action,
+            'sha256': sha256,
+            'largeur': reduite.width,
+            'hauteur': reduite.height,
+            'taille_avant': taille_avant,
+            'taille_apres': taille_apres,
+            'variantes': variantes,
+            'couleur': couleur,
+            'lqip': lqip
+        })
     except Exception as e:
-        logger.error(f"Erreur sur {filepath}: {e}")
-        return False
+        resultat['erreur'] = str(e)
+
+    return resultat
+
+
+def lister_images(dossier):
+    """Liste les images candidates du dossier (ignore les fichiers cachés et temporaires)."""
+    with os.scandir(dossier) as entrees:
+        return sorted(
+            entree.path for entree in entrees
+            if entree.is_file()
+            and not entree.name.startswith('.')
+            and entree.name.lower().endswith(EXTENSIONS)
+        )
+
+
+def renseigner_base(db_path, entrees):
+    """
+    Renseigne dimensions, couleur dominante et LQIP des images qui n'en ont pas encore en base.
+
+    Returns:
+        int: Nombre de lignes mises à jour
+    """
+    valeurs = [
+        (e['largeur'], e['hauteur'], e['couleur'], e['lqip'], PREFIXE_CHEMIN + e['fichier'])
+        for e in entrees if e.get('lqip')
+    ]
+    conn = sqlite3.connect(db_path)
+    try:
+        total = conn.executemany(
+            'UPDATE objets SET image_largeur = ?, image_hauteur = ?, image_couleur = ?, image_lqip = ? '
+            'WHERE image_principale = ? AND image_lqip IS NULL', valeurs
+        ).rowcount
+        total += conn.executemany(
+            'UPDATE images SET largeur = ?, hauteur = ?, couleur = ?, lqip = ? '
+            'WHERE chemin = ? AND lqip IS NULL', valeurs
+        ).rowcount
+        conn.commit()
+        return total
+    except sqlite3.OperationalError as e:
+        # Colonnes absentes : la base n'a pas encore été mise à niveau par l'application
+        logger.warning(f"Base non renseignée ({e}) : démarrez l'application une fois puis relancez le script.")
+        return 0
+    finally:
+        conn.close()
+
+
+def optimiser_dossier(dossier=UPLOAD_FOLDER, manifest_path=MANIFEST_FILE, workers=None, force=False,
+                      db_path=None):
+    """
+    Optimise en parallèle les images du dossier qui ne figurent pas déjà au manifeste.
+
+    Returns:
+        dict: Statistiques du traitement (traitees, ignorees, erreurs, octets_gagnes, lignes_renseignees, duree)
+    """
+    reglages = reglages_courants()
+    manifeste = {} if force else charger_manifeste(manifest_path)
+
+    a_traiter = []
+    ignorees = 0
+    for filepath in lister_images(dossier):
+        entree = manifeste.get(os.path.basename(filepath))
+        if deja_traite(entree, filepath, os.path.getsize(filepath), reglages):
+            ignorees += 1
+        else:
+            a_traiter.append(filepath)
+
+    logger.info(f"{len(a_traiter)} image(s) à traiter, {ignorees} déjà optimisée(s).")
+
+    stats = {'traitees': 0, 'ignorees': ignorees, 'erreurs': 0, 'octets_lus': 0, 'octets_gagnes': 0}
+    debut = time.perf_counter()
+
+    if a_traiter:
+        os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+        with open(manifest_path, 'a', encoding='utf-8') as manifeste_f, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(resize_and_optimize, filepath, MAX_SIZE, JPEG_QUALITY, GAIN_MINIMAL)
+                for filepath in a_traiter
+            ]
+            for future in as_completed(futures):
+                resultat = future.result()
+                if 'erreur' in resultat:
+                    stats['erreurs'] += 1
+                    logger.error(f"Erreur sur {resultat['fichier']}: {resultat['erreur']}")
+                    continue
+
+                # Écriture immédiate : une interruption ne fait perdre que les images en cours
+                resultat['reglages'] = reglages
+                manifeste_f.write(json.dumps(resultat) + '\n')
+                manifeste_f.flush()
+
+                stats['traitees'] += 1
+                stats['octets_lus'] += resultat['taille_avant']
+                stats['octets_gagnes'] += resultat['taille_avant'] - resultat['taille_apres']
+                if resultat['action'] != 'inchangee':
+                    logger.info(f"{resultat['action'].capitalize()} : {resultat['fichier']}")
+
+    stats['duree'] = time.perf_counter() - debut
+
+    stats['lignes_renseignees'] = 0
+    if db_path and os.path.exists(db_path):
+        stats['lignes_renseignees'] = renseigner_base(db_path, charger_manifeste(manifest_path).values())
+    return stats
+
 
 def main():
     """Fonction principale exécutant l'optimisation des images."""
+    parser = argparse.ArgumentParser(description="Optimise les images existantes du dossier des uploads.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Nombre de processus (par défaut : nombre de cœurs)")
+    parser.add_argument('--force', action='store_true',
+                        help="Ignore le manifeste et retraite toutes les images")
+    parser.add_argument('--base', default=DATABASE_FILE,
+                        help="Base de données où renseigner dimensions et aperçus (défaut : %(default)s)")
+    args = parser.parse_args()
+
     if not os.path.exists(UPLOAD_FOLDER):
         logger.error(f"Le dossier {UPLOAD_FOLDER} n'existe pas.")
         return
 
-    count = 0
-    total_space_saved = 0
-
     logger.info("Démarrage de l'optimisation des images...")
+    stats = optimiser_dossier(workers=args.workers, force=args.force, db_path=args.base)
+
+    duree = max(stats['duree'], 1e-6)
+    logger.info(f"Terminé. {stats['traitees']} images traitées, {stats['ignorees']} ignorées, "
+                f"{stats['erreurs']} erreur(s).")
+    logger.info(f"Débit : {stats['traitees'] / duree:.1f} images/s, "
+                f"{stats['octets_lus'] / 1024 / 1024 / duree:.2f} MB/s ({duree:.1f} s)")
+    logger.info(f"Espace total libéré : {stats['octets_gagnes'] / 1024 / 1024:.2f} MB")
+    logger.info(f"Aperçus renseignés en base : {stats['lignes_renseignees']}")
 
-    for filename in os.listdir(UPLOAD_FOLDER):
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Ignorer les fichiers cachés et non-images
-        if filename.startswith('.') or not os.path.isfile(filepath):
-            continue
-            
-        ext = filename.lower().split('.')[-1]
-        if ext not in ['jpg', 'jpeg', 'png']:
-            continue
-
-        original_size = os.path.getsize(filepath)
-        
-        if resize_and_optimize(filepath):
-            new_size = os.path.getsize(filepath)
-            saved = original_size - new_size
-            total_space_saved += saved
-            count += 1
-            if saved > 0:
-                logger.info(f"Gain: {saved / 1024:.2f} KB")
-
-    logger.info(f"Terminé. {count} images traitées.")
-    logger.info(f"Espace total libéré : {total_space_saved / 1024 / 1024:.2f} MB")
 
 if __name__ == "__main__":
     main()
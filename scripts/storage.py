@@ -0,0 +1,244 @@
+"""
+Module de stockage des fichiers uploadés.
+
+Toutes les lectures et écritures d'images passent par un stockage exposant la
+même interface (put / get / delete / exists / deplacer / url / stat / lister), ce qui permet
+à plusieurs serveurs d'application de partager les mêmes images :
+
+- `LocalStorage` : dossier du système de fichiers (comportement historique) ;
+- `S3Storage` : bucket compatible S3 (AWS, MinIO, Garage…), via un client boto3
+  ou tout objet offrant les mêmes méthodes.
+
+Les clés sont les chemins relatifs au dossier des uploads (ex: ab/cd/<sha256>.jpg).
+"""
+
+import os
+import mimetypes
+from abc import ABC, abstractmethod
+from datetime import timezone
+
+from scripts.image_pipeline import ecrire_atomiquement
+
+
+class Storage(ABC):
+    """
+    Interface commune des stockages d'uploads.
+
+    Un stockage qui n'implémente pas l'une des méthodes abstraites ne peut pas
+    être instancié : l'erreur apparaît à la création, pas au premier usage.
+    """
+
+    @abstractmethod
+    def put(self, cle, donnees, content_type=None):
+        """Enregistre des octets sous une clé (remplace un éventuel fichier existant)."""
+
+    @abstractmethod
+    def get(self, cle):
+        """Retourne le contenu d'une clé. Lève FileNotFoundError si elle n'existe pas."""
+
+    @abstractmethod
+    def delete(self, cle):
+        """Supprime une clé (sans erreur si elle n'existe pas)."""
+
+    def exists(self, cle):
+        """Indique si une clé existe."""
+        return self.stat(cle) is not None
+
+    def deplacer(self, source, destination):
+        """Déplace une clé (remplace la destination). Lève FileNotFoundError si la source n'existe pas."""
+        self.put(destination, self.get(source))
+        self.delete(source)
+
+    def url(self, cle):
+        """Retourne l'URL publique directe d'une clé, ou None si l'application doit la servir."""
+        return None
+
+    @abstractmethod
+    def stat(self, cle):
+        """Retourne {'taille', 'modifie_le'} d'une clé, ou None si elle n'existe pas."""
+
+    @abstractmethod
+    def lister(self, prefixe=''):
+        """Itère sur les clés commençant par le préfixe."""
+
+    def chemin_local(self, cle):
+        """Retourne le chemin du fichier sur le disque local, ou None pour un stockage distant."""
+        return None
+
+
+def _verifier_cle(cle):
+    """Refuse les clés qui sortiraient de la racine du stockage."""
+    morceaux = cle.replace('\\', '/').split('/')
+    if not cle or cle.startswith('/') or '..' in morceaux:
+        raise ValueError(f"Clé de stockage invalide : {cle!r}")
+    return cle
+
+
+class LocalStorage(Storage):
+    """Stockage dans un dossier local."""
+
+    def __init__(self, racine):
+        self.racine = racine
+
+    def chemin_local(self, cle):
+        return os.path.join(self.racine, _verifier_cle(cle))
+
+    def put(self, cle, donnees, content_type=None):
+        chemin = self.chemin_local(cle)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        ecrire_atomiquement(chemin, donnees)
+
+    def get(self, cle):
+        with open(self.chemin_local(cle), 'rb') as f:
+            return f.read()
+
+    def delete(self, cle):
+        try:
+            os.remove(self.chemin_local(cle))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, cle):
+        return os.path.isfile(self.chemin_local(cle))
+
+    def deplacer(self, source, destination):
+        # Simple renommage : atomique et sans copie sur un même système de fichiers
+        chemin = self.chemin_local(destination)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        os.replace(self.chemin_local(source), chemin)
+
+    def stat(self, cle):
+        try:
+            infos = os.stat(self.chemin_local(cle))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return {'taille': infos.st_size, 'modifie_le': infos.st_mtime}
+
+    def lister(self, prefixe=''):
+        # Parcours direct avec scandir : le type de chaque entrée est connu sans appel à stat
+        a_parcourir = ['']
+        while a_parcourir:
+            dossier = a_parcourir.pop()
+            try:
+                entrees = os.scandir(os.path.join(self.racine, dossier))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entrees:
+                for entree in entrees:
+                    cle = dossier + entree.name
+                    if entree.is_dir(follow_symlinks=False):
+                        # Seuls les sous-dossiers compatibles avec le préfixe sont parcourus
+                        if cle.startswith(prefixe[:len(cle)]):
+                            a_parcourir.append(cle + '/')
+                    elif cle.startswith(prefixe):
+                        yield cle
+
+
+def _code_erreur(exception):
+    """Code d'erreur S3 d'une exception levée par le client (ex: 'NoSuchKey', '404')."""
+    return getattr(exception, 'response', {}).get('Error', {}).get('Code')
+
+
+class S3Storage(Storage):
+    """
+    Stockage dans un bucket compatible S3.
+
+    Args:
+        client: Client S3 (boto3.client('s3') ou équivalent)
+        bucket: Nom du bucket
+        prefixe: Préfixe ajouté à toutes les clés (ex: 'uploads/')
+        url_publique: URL de base pour servir les fichiers directement (CDN, bucket public) ;
+            si absente, l'application relaie le contenu
+    """
+
+    CODES_INTROUVABLE = ('404', 'NoSuchKey', 'NotFound')
+
+    def __init__(self, client, bucket, prefixe='', url_publique=None):
+        self.client = client
+        self.bucket = bucket
+        self.prefixe = prefixe
+        self.url_publique = url_publique.rstrip('/') if url_publique else None
+
+    def _cle(self, cle):
+        return self.prefixe + _verifier_cle(cle)
+
+    def put(self, cle, donnees, content_type=None):
+        content_type = content_type or mimetypes.guess_type(cle)[0] or 'application/octet-stream'
+        self.client.put_object(Bucket=self.bucket, Key=self._cle(cle), Body=donnees, ContentType=content_type)
+
+    def get(self, cle):
+        try:
+            reponse = self.client.get_object(Bucket=self.bucket, Key=self._cle(cle))
+        except Exception as e:
+            if _code_erreur(e) in self.CODES_INTROUVABLE:
+                raise FileNotFoundError(cle) from e
+            raise
+        return reponse['Body'].read()
+
+    def delete(self, cle):
+        # DeleteObject ne signale pas les clés absentes
+        self.client.delete_object(Bucket=self.bucket, Key=self._cle(cle))
+
+    def deplacer(self, source, destination):
+        # Copie côté serveur : les octets ne transitent pas par l'application
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket, Key=self._cle(destination),
+                CopySource={'Bucket': self.bucket, 'Key': self._cle(source)}
+            )
+        except Exception as e:
+            if _code_erreur(e) in self.CODES_INTROUVABLE:
+                raise FileNotFoundError(source) from e
+            raise
+        self.delete(source)
+
+    def stat(self, cle):
+        try:
+            reponse = self.client.head_object(Bucket=self.bucket, Key=self._cle(cle))
+        except Exception as e:
+            if _code_erreur(e) in self.CODES_INTROUVABLE:
+                return None
+            raise
+        modifie_le = reponse.get('LastModified')
+        if modifie_le is not None:
+            modifie_le = modifie_le.replace(tzinfo=modifie_le.tzinfo or timezone.utc).timestamp()
+        return {'taille': reponse['ContentLength'], 'modifie_le': modifie_le}
+
+    def url(self, cle):
+        if not self.url_publique:
+            return None
+        return f'{self.url_publique}/{self._cle(cle)}'
+
+    def lister(self, prefixe=''):
+        parametres = {'Bucket': self.bucket, 'Prefix': self.prefixe + prefixe}
+        while True:
+            reponse = self.client.list_objects_v2(**parametres)
+            for objet in reponse.get('Contents', []):
+                yield objet['Key'][len(self.prefixe):]
+            if not reponse.get('IsTruncated'):
+                break
+            parametres['ContinuationToken'] = reponse['NextContinuationToken']
+
+
+def creer_stockage(config):
+    """
+    Crée le stockage décrit par la configuration de l'application.
+
+    Clés utilisées : STORAGE_BACKEND ('local' ou 's3'), UPLOAD_FOLDER, et pour S3 :
+    S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_PUBLIC_URL, S3_CLIENT (client déjà construit).
+    """
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+
+    if backend == 's3':
+        client = config.get('S3_CLIENT')
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("Le stockage S3 nécessite le paquet boto3 (pip install boto3).") from e
+            client = boto3.client('s3', endpoint_url=config.get('S3_ENDPOINT_URL') or None)
+        return S3Storage(client, config['S3_BUCKET'], config.get('S3_PREFIX', ''), config.get('S3_PUBLIC_URL'))
+
+    raise ValueError(f"Stockage inconnu : {backend}")
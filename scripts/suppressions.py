@@ -0,0 +1,218 @@
+"""
+Module de suppression différée des fichiers uploadés.
+
+Supprimer une fiche ne touche plus au stockage pendant la requête : les
+triggers de la table `fichiers` inscrivent chaque fichier devenu sans
+référence dans `suppressions_en_attente`, dans la même transaction que la
+suppression en base. Un arrêt brutal ne peut donc ni laisser d'orphelin, ni
+supprimer une image encore utilisée.
+
+Le balayeur traite ensuite la file par lots :
+1. mise en quarantaine : le fichier et ses variantes sont déplacés sous
+   `.quarantaine/` (simple renommage sur disque local) ;
+2. restauration : un fichier en quarantaine qui a retrouvé une référence
+   (image identique téléversée entre-temps) est remis en place ;
+3. purge : les fichiers en quarantaine depuis plus que le délai de grâce sont
+   supprimés définitivement.
+"""
+
+import time
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from scripts.image_pipeline import PREFIXE_UPLOADS, chemins_variantes, fichier_source, nom_reference
+
+PREFIXE_QUARANTAINE = '.quarantaine/'   # Sous-dossier du stockage réservé à la quarantaine
+DELAI_GRACE = 24 * 3600                 # Durée de la quarantaine (secondes)
+TAILLE_LOT = 200                        # Nombre de fichiers traités par transaction
+
+
+def _cles(chemin):
+    """Clés de stockage d'un fichier et de ses variantes."""
+    cle = nom_reference(chemin)
+    return [cle] + chemins_variantes(cle)
+
+
+def _date_sql(instant):
+    """Date au format de datetime('now') de SQLite (UTC)."""
+    return instant.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def demander_suppression(conn, chemins):
+    """
+    Inscrit des fichiers sans référence dans la file des suppressions différées.
+
+    Sert aux fichiers que les triggers n'ont pas signalés (orphelins trouvés
+    en parcourant le stockage). Un fichier référencé entre-temps est ignoré ;
+    la ligne `fichiers` créée à 0 référence garantit qu'une nouvelle référence
+    annulera la suppression (trigger fichiers_reference_retrouvee) et que la
+    quarantaine restera réversible. Le commit reste à la charge de l'appelant.
+
+    Args:
+        conn: Connexion SQLite ouverte
+        chemins: Chemins des fichiers sources, tels qu'enregistrés en base
+
+    Returns:
+        int: Nombre de fichiers inscrits
+    """
+    inscrits = 0
+    for chemin in chemins:
+        conn.execute('INSERT INTO fichiers (chemin, refs) VALUES (?, 0) ON CONFLICT(chemin) DO NOTHING', (chemin,))
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO suppressions_en_attente (chemin)
+            SELECT ? WHERE NOT EXISTS (SELECT 1 FROM fichiers WHERE chemin = ? AND refs > 0)
+        ''', (chemin, chemin))
+        inscrits += cursor.rowcount
+    return inscrits
+
+
+def mettre_en_quarantaine(conn, stockage, taille_lot=TAILLE_LOT):
+    """
+    Déplace en quarantaine un lot de fichiers en attente de suppression.
+
+    Le verrou d'écriture est conservé pendant les déplacements : aucune
+    référence ne peut réapparaître entre la vérification et le déplacement.
+
+    Returns:
+        tuple: (nombre de fichiers traités, clés déplacées : originaux et variantes)
+    """
+    deplacees = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute(
+            'SELECT chemin FROM suppressions_en_attente WHERE quarantaine_le IS NULL LIMIT ?', (taille_lot,)
+        ).fetchall()
+        for row in rows:
+            for cle in _cles(row[0]):
+                try:
+                    stockage.deplacer(cle, PREFIXE_QUARANTAINE + cle)
+                except FileNotFoundError:
+                    continue  # Variante jamais produite, ou déplacement fait avant une interruption
+                deplacees.append(cle)
+        conn.executemany(
+            "UPDATE suppressions_en_attente SET quarantaine_le = datetime('now') WHERE chemin = ?",
+            [(row[0],) for row in rows]
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(rows), deplacees
+
+
+def restaurer_references(conn, stockage):
+    """
+    Remet en place les fichiers en quarantaine qui ont retrouvé une référence.
+
+    Une image identique téléversée pendant la mise en quarantaine a pu trouver
+    l'ancien fichier encore présent et ne pas le réécrire : sans restauration,
+    sa fiche pointerait vers un fichier absent.
+
+    Returns:
+        int: Nombre de clés restaurées
+    """
+    en_quarantaine = {}
+    for cle in stockage.lister(PREFIXE_QUARANTAINE):
+        original = cle[len(PREFIXE_QUARANTAINE):]
+        en_quarantaine.setdefault(fichier_source(original), []).append(original)
+
+    restaurees = 0
+    for source, cles in en_quarantaine.items():
+        chemin = PREFIXE_UPLOADS + source
+        if conn.execute('SELECT 1 FROM suppressions_en_attente WHERE chemin = ?', (chemin,)).fetchone():
+            continue  # Toujours en attente : la purge s'en chargera
+        row = conn.execute('SELECT refs FROM fichiers WHERE chemin = ?', (chemin,)).fetchone()
+        for cle in cles:
+            if row and row[0] > 0 and not stockage.exists(cle):
+                stockage.deplacer(PREFIXE_QUARANTAINE + cle, cle)
+                restaurees += 1
+            else:
+                # Fichier réécrit par le nouvel upload, ou purge interrompue
+                stockage.delete(PREFIXE_QUARANTAINE + cle)
+    return restaurees
+
+
+def purger_quarantaine(conn, stockage, delai_grace=DELAI_GRACE, taille_lot=TAILLE_LOT):
+    """
+    Supprime définitivement un lot de fichiers en quarantaine depuis plus que le délai de grâce.
+
+    Les fichiers sont supprimés avant les lignes : après une interruption, la
+    ligne restante fait simplement recommencer la purge (sans effet).
+
+    Returns:
+        dict: {'lignes': fichiers traités, 'purges': clés supprimées, 'octets_liberes': octets}
+    """
+    limite = _date_sql(datetime.now(timezone.utc) - timedelta(seconds=delai_grace))
+    rows = conn.execute(
+        'SELECT chemin FROM suppressions_en_attente WHERE quarantaine_le <= ? LIMIT ?', (limite, taille_lot)
+    ).fetchall()
+
+    stats = {'lignes': len(rows), 'purges': 0, 'octets_liberes': 0}
+    for row in rows:
+        for cle in _cles(row[0]):
+            infos = stockage.stat(PREFIXE_QUARANTAINE + cle)
+            if infos is None:
+                continue
+            stockage.delete(PREFIXE_QUARANTAINE + cle)
+            stats['purges'] += 1
+            stats['octets_liberes'] += infos['taille']
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('DELETE FROM suppressions_en_attente WHERE chemin = ?', [(row[0],) for row in rows])
+        conn.executemany('DELETE FROM fichiers WHERE chemin = ? AND refs <= 0', [(row[0],) for row in rows])
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return stats
+
+
+def balayer_suppressions(get_db_connection, stockage, delai_grace=DELAI_GRACE, taille_lot=TAILLE_LOT,
+                         apres_quarantaine=None):
+    """
+    Traite toute la file des suppressions en attente, lot par lot.
+
+    Args:
+        get_db_connection: Fonction pour obtenir une connexion à la base de données
+        stockage: Stockage des uploads (voir scripts/storage.py)
+        delai_grace: Durée de la quarantaine avant suppression définitive (secondes)
+        taille_lot: Nombre de fichiers traités par transaction
+        apres_quarantaine: Fonction appelée avec les clés mises en quarantaine
+            (ex: suppression des dérivés redimensionnés en cache)
+
+    Returns:
+        dict: Statistiques (quarantaine, restaures, purges, octets_liberes, duree)
+    """
+    debut = time.perf_counter()
+    stats = {'quarantaine': 0, 'restaures': 0, 'purges': 0, 'octets_liberes': 0}
+
+    conn = get_db_connection()
+    conn.isolation_level = None  # Transactions gérées explicitement (BEGIN IMMEDIATE)
+    try:
+        try:
+            conn.execute('SELECT 1 FROM suppressions_en_attente LIMIT 1')
+        except sqlite3.OperationalError:
+            return dict(stats, duree=time.perf_counter() - debut)  # Base pas encore mise à niveau
+
+        while True:
+            lignes, deplacees = mettre_en_quarantaine(conn, stockage, taille_lot)
+            stats['quarantaine'] += len(deplacees)
+            if deplacees and apres_quarantaine:
+                apres_quarantaine(deplacees)
+            if lignes < taille_lot:
+                break
+
+        stats['restaures'] = restaurer_references(conn, stockage)
+
+        while True:
+            lot = purger_quarantaine(conn, stockage, delai_grace, taille_lot)
+            stats['purges'] += lot['purges']
+            stats['octets_liberes'] += lot['octets_liberes']
+            if lot['lignes'] < taille_lot:
+                break
+    finally:
+        conn.close()
+
+    stats['duree'] = time.perf_counter() - debut
+    return stats
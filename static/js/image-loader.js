@@ -0,0 +1,59 @@
+// image-loader.js - Chargement progressif des images (aperçu flou puis image réelle)
+
+// Marge avant le viewport à partir de laquelle l'image réelle est demandée
+const IMAGE_LOADER_MARGIN = '300px 0px';
+
+document.addEventListener('DOMContentLoaded', function() {
+    initProgressiveImages();
+    initPlaceholderCleanup();
+});
+
+// Remplace l'aperçu des cartes (.image-progressive[data-src]) par l'image réelle.
+// À rappeler avec l'élément concerné après l'insertion de cartes (ex: objets au hasard)
+function initProgressiveImages(root = document) {
+    const elements = root.querySelectorAll('.image-progressive[data-src]');
+    if (!elements.length) return;
+
+    const load = element => {
+        const src = element.getAttribute('data-src');
+        element.removeAttribute('data-src');
+        const image = new Image();
+        image.onload = () => {
+            element.style.backgroundImage = `url('${src}')`;
+            element.style.backgroundColor = '';
+            element.classList.add('image-chargee');
+        };
+        image.src = src;
+    };
+
+    if (!('IntersectionObserver' in window)) {
+        elements.forEach(load);
+        return;
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            observer.unobserve(entry.target);
+            load(entry.target);
+        });
+    }, { rootMargin: IMAGE_LOADER_MARGIN });
+
+    elements.forEach(element => observer.observe(element));
+}
+
+window.initProgressiveImages = initProgressiveImages;
+window.initPlaceholderCleanup = initPlaceholderCleanup;
+
+// Retire l'aperçu placé en fond des <img> une fois l'image chargée
+// (sinon il resterait visible derrière les images transparentes)
+function initPlaceholderCleanup(root = document) {
+    root.querySelectorAll('img.image-apercu').forEach(img => {
+        const clear = () => { img.style.background = ''; };
+        if (img.complete && img.naturalWidth) {
+            clear();
+        } else {
+            img.addEventListener('load', clear, { once: true });
+        }
+    });
+}
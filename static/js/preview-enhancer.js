@@ -1,9 +1,104 @@
 // preview-enhancer.js - Gère la prévisualisation "Quick Look" au survol
 
+// Nombre maximal d'aperçus gardés en mémoire (les moins récemment utilisés sont évincés)
+const PREVIEW_CACHE_SIZE = 200;
+// Nombre maximal d'identifiants par requête groupée (voir MAX_APERCUS_PAR_LOT côté serveur)
+const PREVIEW_BATCH_SIZE = 50;
+// Délai de regroupement des lignes devenues visibles avant préchargement (ms)
+const PREVIEW_PREFETCH_DELAY = 150;
+
 document.addEventListener('DOMContentLoaded', function() {
     initQuickPreview();
 });
 
+// Cache LRU : un Map conserve l'ordre d'insertion, on ré-insère à chaque lecture
+const previewCache = new Map();
+// Requêtes en cours par identifiant (pour ne jamais demander deux fois le même aperçu)
+const pendingPreviews = new Map();
+
+function cacheGet(id) {
+    if (!previewCache.has(id)) return undefined;
+    const html = previewCache.get(id);
+    previewCache.delete(id);
+    previewCache.set(id, html);
+    return html;
+}
+
+function cacheSet(id, html) {
+    previewCache.delete(id);
+    previewCache.set(id, html);
+    while (previewCache.size > PREVIEW_CACHE_SIZE) {
+        previewCache.delete(previewCache.keys().next().value);
+    }
+}
+
+// Charge un lot d'aperçus en une seule requête. Le cache HTTP du navigateur
+// revalide la réponse via son ETag (réponse 304 si rien n'a changé).
+function fetchPreviewBatch(ids) {
+    const sortedIds = ids.slice().sort((a, b) => a - b);
+    const request = fetch(`/api/objet_previews?ids=${sortedIds.join(',')}`)
+        .then(response => {
+            if (!response.ok) throw new Error('Erreur de chargement');
+            return response.json();
+        })
+        .then(previews => {
+            Object.entries(previews).forEach(([id, html]) => cacheSet(id, html));
+            return previews;
+        })
+        .finally(() => {
+            sortedIds.forEach(id => pendingPreviews.delete(id));
+        });
+
+    sortedIds.forEach(id => {
+        const preview = request.then(previews => {
+            if (!(id in previews)) throw new Error('Aperçu introuvable');
+            return previews[id];
+        });
+        // Un préchargement en échec ne doit pas produire d'erreur non gérée
+        preview.catch(() => {});
+        pendingPreviews.set(id, preview);
+    });
+    return request;
+}
+
+function loadPreview(id) {
+    const cached = cacheGet(id);
+    if (cached !== undefined) return Promise.resolve(cached);
+    if (!pendingPreviews.has(id)) fetchPreviewBatch([id]).catch(() => {});
+    return pendingPreviews.get(id);
+}
+
+// Précharge les aperçus des lignes visibles, regroupés en lots
+function initPrefetch(triggers) {
+    if (!('IntersectionObserver' in window)) return;
+
+    let queue = new Set();
+    let timer = null;
+
+    const flush = () => {
+        timer = null;
+        const ids = Array.from(queue).filter(id => !previewCache.has(id) && !pendingPreviews.has(id));
+        queue = new Set();
+        for (let i = 0; i < ids.length; i += PREVIEW_BATCH_SIZE) {
+            fetchPreviewBatch(ids.slice(i, i + PREVIEW_BATCH_SIZE)).catch(err => console.error(err));
+        }
+    };
+
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            const id = entry.target.getAttribute('data-object-id');
+            observer.unobserve(entry.target);
+            if (id && !previewCache.has(id)) queue.add(id);
+        });
+        if (queue.size && !timer) timer = setTimeout(flush, PREVIEW_PREFETCH_DELAY);
+    }, { rootMargin: '200px 0px' });
+
+    triggers.forEach(trigger => {
+        if (trigger.hasAttribute('data-object-id')) observer.observe(trigger);
+    });
+}
+
 function initQuickPreview() {
     // Créer le conteneur de prévisualisation s'il n'existe pas
     let previewContainer = document.querySelector('.quick-preview-container');
@@ -17,6 +112,8 @@ function initQuickPreview() {
     let previewTimeout;
     let currentId = null;
 
+    initPrefetch(previewTriggers);
+
     previewTriggers.forEach(trigger => {
         trigger.addEventListener('mouseenter', function(e) {
             const objectId = this.getAttribute('data-object-id');
@@ -33,15 +130,19 @@ function initQuickPreview() {
             // Positionner temporairement pour éviter les sauts
             updatePreviewPosition(e, previewContainer);
 
+            // Affichage immédiat si l'aperçu a déjà été préchargé
+            const cached = cacheGet(objectId);
+            if (cached !== undefined) {
+                previewContainer.innerHTML = cached;
+                previewContainer.classList.add('active');
+                return;
+            }
+
             // Charger le contenu
             previewContainer.innerHTML = '<div class="preview-loading"><i class="fas fa-spinner fa-spin"></i> Chargement...</div>';
             previewContainer.classList.add('active');
 
-            fetch(`/api/objet_preview/${objectId}`)
-                .then(response => {
-                    if (!response.ok) throw new Error('Erreur de chargement');
-                    return response.text();
-                })
+            loadPreview(objectId)
                 .then(html => {
                     // Vérifier si on est toujours sur le même objet
                     if (currentId === objectId) {
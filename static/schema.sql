@@ -1,11 +1,21 @@
 -- schema.sql - Structure de la base de données optimisée
+-- Les tables annexes et triggers ajoutés depuis sont dans schema_evolutions.sql
+-- Les tables login_attempts et auth_logs sont dans la base de sécurité (voir scripts/login_security.py) ;
+-- elles sont encore supprimées ici pour les bases créées avant la séparation
 
 DROP TABLE IF EXISTS liens;
 DROP TABLE IF EXISTS images;
 DROP TABLE IF EXISTS objets;
 DROP TABLE IF EXISTS login_attempts;
-DROP TABLE IF EXISTS users;
 DROP TABLE IF EXISTS auth_logs;
+DROP TABLE IF EXISTS users;
+DROP TABLE IF EXISTS data_version;
+DROP TABLE IF EXISTS numeros_inventaire_libres;
+DROP TABLE IF EXISTS inventaire_sequence;
+DROP TABLE IF EXISTS reservations_inventaire;
+DROP TABLE IF EXISTS fichiers;
+DROP TABLE IF EXISTS suppressions_en_attente;
+DROP TABLE IF EXISTS journal_maintenance;
 
 CREATE TABLE objets (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,16 +53,6 @@ CREATE TABLE liens (
     FOREIGN KEY (objet_id) REFERENCES objets (id) ON DELETE CASCADE
 );
 
-CREATE TABLE login_attempts (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT NOT NULL,
-    ip_address TEXT NOT NULL,
-    attempts INTEGER DEFAULT 1,
-    locked_until TIMESTAMP,
-    last_attempt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(username, ip_address)
-);
-
 CREATE TABLE users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE NOT NULL,
@@ -60,12 +60,3 @@ CREATE TABLE users (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE TABLE auth_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    action TEXT NOT NULL,
-    ip_address TEXT,
-    user_agent TEXT,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users (id)
-);
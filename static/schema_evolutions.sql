@@ -0,0 +1,238 @@
+-- schema_evolutions.sql - Évolutions idempotentes du schéma
+--
+-- Ce fichier est exécuté après schema.sql lors de la création d'une base, et à
+-- chaque démarrage sur une base existante (voir upgrade_db dans app.py).
+-- Toutes les instructions doivent donc rester rejouables (IF NOT EXISTS).
+
+-- Compteurs de version par portée pour la cohérence des caches entre workers
+-- Portées : '*' (global), 'objets', 'objet:<id>', 'categorie:<nom>', 'liens', 'config', 'users'
+CREATE TABLE IF NOT EXISTS data_version (
+    scope TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS objets_data_version_insert AFTER INSERT ON objets
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES
+        ('objet:' || NEW.id, 1),
+        ('categorie:' || IFNULL(NEW.categorie, ''), 1),
+        ('objets', 1),
+        ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objets_data_version_update AFTER UPDATE ON objets
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES
+        ('objet:' || NEW.id, 1),
+        ('categorie:' || IFNULL(OLD.categorie, ''), 1),
+        ('categorie:' || IFNULL(NEW.categorie, ''), 1),
+        ('objets', 1),
+        ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objets_data_version_delete AFTER DELETE ON objets
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES
+        ('objet:' || OLD.id, 1),
+        ('categorie:' || IFNULL(OLD.categorie, ''), 1),
+        ('objets', 1),
+        ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_data_version_insert AFTER INSERT ON images
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('objet:' || NEW.objet_id, 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_data_version_update AFTER UPDATE ON images
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('objet:' || NEW.objet_id, 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_data_version_delete AFTER DELETE ON images
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('objet:' || OLD.objet_id, 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS liens_data_version_insert AFTER INSERT ON liens
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('objet:' || NEW.objet_id, 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS liens_data_version_update AFTER UPDATE ON liens
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('objet:' || NEW.objet_id, 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS liens_data_version_delete AFTER DELETE ON liens
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('objet:' || OLD.objet_id, 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+-- Comptes administrateurs (cache des utilisateurs chargés par Flask-Login)
+CREATE TRIGGER IF NOT EXISTS users_data_version_insert AFTER INSERT ON users
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('users', 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_data_version_update AFTER UPDATE ON users
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('users', 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_data_version_delete AFTER DELETE ON users
+BEGIN
+    INSERT INTO data_version (scope, version) VALUES ('users', 1), ('*', 1)
+    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+END;
+
+-- Attribution des numéros d'inventaire (voir scripts/numerotation.py)
+-- La colonne générée objets.numero_seq est ajoutée par upgrade_db (app.py)
+CREATE INDEX IF NOT EXISTS idx_objets_numero_seq ON objets (numero_seq);
+
+-- Numéros libres inférieurs au plus haut numéro distribué
+CREATE TABLE IF NOT EXISTS numeros_inventaire_libres (
+    numero_seq INTEGER PRIMARY KEY
+);
+
+-- Plus haut numéro distribué (une seule ligne)
+CREATE TABLE IF NOT EXISTS inventaire_sequence (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    plus_haut INTEGER NOT NULL
+);
+
+-- Numéros proposés dans un formulaire d'ajout en cours
+CREATE TABLE IF NOT EXISTS reservations_inventaire (
+    numero_seq INTEGER PRIMARY KEY,
+    jeton TEXT NOT NULL UNIQUE,
+    expire_le TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_reservations_inventaire_expire ON reservations_inventaire (expire_le);
+
+CREATE TRIGGER IF NOT EXISTS objets_numero_pris_insert AFTER INSERT ON objets
+WHEN NEW.numero_seq IS NOT NULL
+BEGIN
+    DELETE FROM numeros_inventaire_libres WHERE numero_seq = NEW.numero_seq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objets_numero_libere_update AFTER UPDATE OF numero_inventaire ON objets
+BEGIN
+    DELETE FROM numeros_inventaire_libres WHERE numero_seq = NEW.numero_seq;
+    INSERT OR IGNORE INTO numeros_inventaire_libres (numero_seq)
+    SELECT OLD.numero_seq
+    WHERE OLD.numero_seq IS NOT NEW.numero_seq
+      AND OLD.numero_seq <= (SELECT plus_haut FROM inventaire_sequence WHERE id = 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS objets_numero_libere_delete AFTER DELETE ON objets
+WHEN OLD.numero_seq <= (SELECT plus_haut FROM inventaire_sequence WHERE id = 1)
+BEGIN
+    INSERT OR IGNORE INTO numeros_inventaire_libres (numero_seq) VALUES (OLD.numero_seq);
+END;
+
+-- Stockage adressé par contenu : nombre de références de chaque fichier uploadé
+-- (objets.image_principale et images.chemin). Un fichier n'est supprimé du disque
+-- que lorsque sa dernière référence disparaît.
+CREATE TABLE IF NOT EXISTS fichiers (
+    chemin TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Initialisation depuis les références existantes, seulement tant que la table est vide :
+-- ensuite, les triggers ci-dessous la tiennent à jour (réparation : scripts/integrite.py)
+INSERT OR IGNORE INTO fichiers (chemin, refs)
+SELECT chemin, COUNT(*) FROM (
+    SELECT image_principale AS chemin FROM objets
+    WHERE NOT EXISTS (SELECT 1 FROM fichiers) AND image_principale IS NOT NULL AND image_principale != ''
+    UNION ALL
+    SELECT chemin FROM images
+    WHERE NOT EXISTS (SELECT 1 FROM fichiers) AND chemin IS NOT NULL AND chemin != ''
+)
+GROUP BY chemin;
+
+CREATE TRIGGER IF NOT EXISTS objets_fichiers_insert AFTER INSERT ON objets
+WHEN NEW.image_principale IS NOT NULL AND NEW.image_principale != ''
+BEGIN
+    INSERT INTO fichiers (chemin, refs) VALUES (NEW.image_principale, 1)
+    ON CONFLICT(chemin) DO UPDATE SET refs = refs + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objets_fichiers_update AFTER UPDATE OF image_principale ON objets
+WHEN OLD.image_principale IS NOT NEW.image_principale
+BEGIN
+    UPDATE fichiers SET refs = refs - 1 WHERE chemin = OLD.image_principale;
+    INSERT INTO fichiers (chemin, refs)
+    SELECT NEW.image_principale, 1 WHERE NEW.image_principale IS NOT NULL AND NEW.image_principale != ''
+    ON CONFLICT(chemin) DO UPDATE SET refs = refs + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objets_fichiers_delete AFTER DELETE ON objets
+BEGIN
+    UPDATE fichiers SET refs = refs - 1 WHERE chemin = OLD.image_principale;
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_fichiers_insert AFTER INSERT ON images
+WHEN NEW.chemin IS NOT NULL AND NEW.chemin != ''
+BEGIN
+    INSERT INTO fichiers (chemin, refs) VALUES (NEW.chemin, 1)
+    ON CONFLICT(chemin) DO UPDATE SET refs = refs + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_fichiers_update AFTER UPDATE OF chemin ON images
+WHEN OLD.chemin IS NOT NEW.chemin
+BEGIN
+    UPDATE fichiers SET refs = refs - 1 WHERE chemin = OLD.chemin;
+    INSERT INTO fichiers (chemin, refs)
+    SELECT NEW.chemin, 1 WHERE NEW.chemin IS NOT NULL AND NEW.chemin != ''
+    ON CONFLICT(chemin) DO UPDATE SET refs = refs + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS images_fichiers_delete AFTER DELETE ON images
+BEGIN
+    UPDATE fichiers SET refs = refs - 1 WHERE chemin = OLD.chemin;
+END;
+
+-- Suppressions différées : un fichier dont la dernière référence disparaît est
+-- inscrit ici dans la même transaction que la suppression en base. Le balayeur
+-- (scripts/suppressions.py) le déplace en quarantaine, puis le supprime après
+-- un délai de grâce ; une nouvelle référence annule la suppression.
+CREATE TABLE IF NOT EXISTS suppressions_en_attente (
+    chemin TEXT PRIMARY KEY,
+    demande_le TEXT NOT NULL DEFAULT (datetime('now')),
+    quarantaine_le TEXT   -- NULL tant que le fichier n'est pas en quarantaine
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_suppressions_quarantaine ON suppressions_en_attente(quarantaine_le);
+
+CREATE TRIGGER IF NOT EXISTS fichiers_sans_reference AFTER UPDATE OF refs ON fichiers
+WHEN NEW.refs <= 0 AND OLD.refs > 0
+BEGIN
+    INSERT OR IGNORE INTO suppressions_en_attente (chemin) VALUES (NEW.chemin);
+END;
+
+CREATE TRIGGER IF NOT EXISTS fichiers_reference_retrouvee AFTER UPDATE OF refs ON fichiers
+WHEN NEW.refs > 0
+BEGIN
+    DELETE FROM suppressions_en_attente WHERE chemin = NEW.chemin;
+END;
+
+-- Journal des tâches de maintenance (vérification d'intégrité, etc.) :
+-- dernière exécution, durée et résultat (JSON), affichés sur le tableau de bord
+CREATE TABLE IF NOT EXISTS journal_maintenance (
+    tache TEXT PRIMARY KEY,
+    execute_le TEXT NOT NULL,
+    duree REAL NOT NULL,
+    resultat TEXT
+) WITHOUT ROWID;
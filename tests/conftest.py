@@ -6,6 +6,7 @@ base de données temporaire) pour l'ensemble des tests.
 """
 
 import os
+import shutil
 import tempfile
 import pytest
 from app import app, init_db, User, get_db_connection
@@ -38,6 +39,12 @@ def client(app_fixture):
     db_fd, db_path = tempfile.mkstemp()
     
     app_fixture.config['DATABASE'] = db_path
+    # Base de sécurité (WAL : fichiers -wal et -shm à côté) dans un dossier temporaire
+    dossier_securite = tempfile.mkdtemp()
+    app_fixture.config['SECURITY_DATABASE'] = os.path.join(dossier_securite, 'security.db')
+    # Cache des images redimensionnées hors du dépôt
+    cache_images = tempfile.mkdtemp()
+    app_fixture.config['IMAGE_CACHE_FOLDER'] = cache_images
     
     # Création du contexte d'application
     with app_fixture.app_context():
@@ -59,6 +66,8 @@ def client(app_fixture):
     # Nettoyage : fermeture et suppression du fichier temporaire
     os.close(db_fd)
     os.unlink(db_path)
+    shutil.rmtree(cache_images, ignore_errors=True)
+    shutil.rmtree(dossier_securite, ignore_errors=True)
 
 @pytest.fixture
 def auth(client):
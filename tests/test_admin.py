@@ -5,8 +5,19 @@ Ce module contient les tests liés à l'authentification, l'accès aux pages
 d'administration et les opérations CRUD sur les objets (ajout, modification).
 """
 
+import time
+import sqlite3
+import threading
+from types import SimpleNamespace
 import pytest
-from app import get_db_connection
+from app import get_db_connection, get_security_db_connection
+from scripts import login_security
+from scripts.login_security import (
+    migrer_depuis_catalogue, check_login_attempts, increment_login_attempts, MAX_LOGIN_ATTEMPTS
+)
+from scripts.journal_auth import JournalAuth, agreger_anciens_logs
+from scripts.maintenance import executer_taches_dues
+from scripts.integrite import verifier_integrite
 
 def test_login(client, auth):
     """Test de la connexion administrateur."""
@@ -83,3 +94,273 @@ def test_ajouter_objet(client, auth, app_fixture):
         assert 'Grossissement' in objet['attributs_specifiques']
         assert '100x' in objet['attributs_specifiques']
 
+
+def test_integrite_cles_etrangeres(client, auth, app_fixture):
+    """Les clés étrangères sont appliquées et la vérification d'intégrité retire les lignes orphelines."""
+    auth.login()
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objet_id = conn.execute(
+            "INSERT INTO objets (nom, categorie, numero_inventaire) VALUES ('Objet lié', 'Divers', 'INV_TEST_FK')"
+        ).lastrowid
+        conn.execute("INSERT INTO liens (objet_id, url, titre) VALUES (?, 'https://example.org', 'Lien')", (objet_id,))
+        conn.commit()
+
+        # Lignes laissées par d'anciennes suppressions, quand les clés étrangères n'étaient pas appliquées
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute("INSERT INTO images (objet_id, chemin) VALUES (9999, 'database/uploads/absente.jpg')")
+        conn.execute("INSERT INTO liens (objet_id, url) VALUES (9999, 'https://example.com')")
+        conn.commit()
+        conn.close()
+
+    # La suppression d'un objet emporte ses liens (ON DELETE CASCADE)
+    client.post(f'/admin/supprimer/{objet_id}')
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM liens WHERE objet_id = ?', (objet_id,)).fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM liens').fetchone()[0] == 1
+        conn.close()
+
+    response = client.post('/admin/integrite', follow_redirects=True)
+    assert response.status_code == 200
+    assert b'2 ligne(s) orpheline(s)' in response.data
+    assert b'Derni\xc3\xa8re v\xc3\xa9rification le' in response.data
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM images').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM liens').fetchone()[0] == 0
+        assert conn.execute("SELECT refs FROM fichiers WHERE chemin = 'database/uploads/absente.jpg'").fetchone()[0] == 0
+        conn.close()
+
+def test_integrite_respecte_la_quarantaine(client, app_fixture):
+    """Une référence dont le fichier est en quarantaine est conservée ; un fichier perdu est retiré."""
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        for numero in ('INV_Q1', 'INV_Q2', 'INV_Q3'):
+            conn.execute(
+                "INSERT INTO objets (nom, categorie, numero_inventaire, image_principale) VALUES ('Objet', 'Divers', ?, ?)",
+                (numero, f'database/uploads/ab/cd/{numero}.jpg')
+            )
+        conn.commit()
+        presents = {'ab/cd/INV_Q1.jpg', '.quarantaine/ab/cd/INV_Q2.jpg'}
+        rapport = verifier_integrite(conn, presents.__contains__, corriger=True)
+        images = dict(conn.execute('SELECT numero_inventaire, image_principale FROM objets').fetchall())
+        conn.close()
+    assert rapport['references_en_quarantaine'] == ['database/uploads/ab/cd/INV_Q2.jpg']
+    assert rapport['references_sans_fichier'] == ['database/uploads/ab/cd/INV_Q3.jpg']
+    assert images == {'INV_Q1': 'database/uploads/ab/cd/INV_Q1.jpg', 'INV_Q2': 'database/uploads/ab/cd/INV_Q2.jpg', 'INV_Q3': ''}
+
+def test_modifier_liens_par_difference(client, auth, app_fixture):
+    """La modification n'écrit que les liens ajoutés, retirés ou déplacés."""
+    auth.login()
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objet_id = conn.execute(
+            "INSERT INTO objets (nom, categorie, numero_inventaire) VALUES ('Objet lié', 'Divers', 'INV_TEST_LIENS')"
+        ).lastrowid
+        conn.executemany(
+            'INSERT INTO liens (objet_id, url, titre, ordre) VALUES (?, ?, ?, ?)',
+            [(objet_id, f'https://example.org/{i}', f'Titre {i}', i) for i in range(3)]
+        )
+        conn.commit()
+        avant = {row['url']: row['id'] for row in conn.execute('SELECT id, url FROM liens WHERE objet_id = ?', (objet_id,))}
+        version = conn.execute('SELECT version FROM objets WHERE id = ?', (objet_id,)).fetchone()[0]
+        conn.close()
+
+    # Le lien 1 est retiré, le lien 2 remonte en tête, un lien est ajouté
+    client.post(f'/admin/modifier/{objet_id}', data={
+        'nom': 'Objet lié', 'description': '', 'categorie': 'Divers', 'fabricant': '', 'date_fabrication': '',
+        'numero_inventaire': 'INV_TEST_LIENS', 'version': version,
+        'liens': ['https://example.org/2', 'https://example.org/0', '', 'https://example.org/3']
+    })
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        apres = conn.execute('SELECT id, url, titre, ordre FROM liens WHERE objet_id = ? ORDER BY ordre', (objet_id,)).fetchall()
+        conn.close()
+    assert [row['url'] for row in apres] == ['https://example.org/2', 'https://example.org/0', 'https://example.org/3']
+    # Les liens conservés gardent leur ligne (et leur titre)
+    assert apres[0]['id'] == avant['https://example.org/2'] and apres[0]['titre'] == 'Titre 2'
+    assert apres[1]['id'] == avant['https://example.org/0']
+    assert apres[2]['id'] not in avant.values()
+
+def test_action_groupee(client, auth, app_fixture):
+    """Une action groupée modifie ou supprime plusieurs objets en une requête."""
+    auth.login()
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        ids = [conn.execute(
+            "INSERT INTO objets (nom, categorie, numero_inventaire) VALUES (?, 'Divers', ?)", (f'Objet {i}', f'INV_LOT_{i}')
+        ).lastrowid for i in range(3)]
+        conn.execute("INSERT INTO images (objet_id, chemin) VALUES (?, 'database/uploads/lot.jpg')", (ids[2],))
+        conn.commit()
+        conn.close()
+
+    response = client.post('/admin/objets/lot', json={'ids': ids[:2], 'action': 'categorie', 'valeur': 'Ordinateurs'})
+    assert response.get_json()['modifies'] == 2
+    # Objets déjà dans la catégorie : rien n'est réécrit
+    response = client.post('/admin/objets/lot', json={'ids': ids, 'action': 'categorie', 'valeur': 'Ordinateurs'})
+    assert response.get_json()['modifies'] == 1
+    assert client.post('/admin/objets/lot', json={'ids': ids, 'action': 'inconnue'}).status_code == 400
+    # Corps mal formés : erreur 400, jamais d'exception
+    for corps in ([ids], {'ids': ids, 'action': 'etat', 'valeur': 5}, {'ids': '123', 'action': 'supprimer'}):
+        response = client.post('/admin/objets/lot', json=corps)
+        assert response.status_code == 400 and 'error' in response.get_json()
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        rows = conn.execute('SELECT categorie, version FROM objets ORDER BY id').fetchall()
+        conn.close()
+    assert [row['categorie'] for row in rows] == ['Ordinateurs'] * 3
+    assert [row['version'] for row in rows] == [2, 2, 2]
+
+    response = client.post('/admin/objets/lot', json={'ids': ids[1:], 'action': 'supprimer'})
+    assert response.get_json()['modifies'] == 2
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM objets').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM images').fetchone()[0] == 0
+        assert conn.execute('SELECT chemin FROM suppressions_en_attente').fetchone()[0] == 'database/uploads/lot.jpg'
+        conn.close()
+    assert b'select-objet' in client.get('/collection').data
+
+def test_base_securite_separee(client, auth, app_fixture, tmp_path):
+    """Tentatives de connexion et journal d'authentification sont dans leur propre base (WAL)."""
+    auth.login(password='mauvais_password')
+    auth.login()
+
+    with app_fixture.app_context():
+        conn = get_security_db_connection()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        actions = [row['action'] for row in conn.execute('SELECT action FROM auth_logs ORDER BY id')]
+        conn.close()
+        conn = get_db_connection()
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+    assert actions == ['failed_attempt', 'login']
+    assert not tables & {'login_attempts', 'auth_logs'}
+
+    # Migration d'une ancienne base unique
+    ancienne = str(tmp_path / 'ancienne.db')
+    conn = sqlite3.connect(ancienne)
+    conn.executescript('''
+        CREATE TABLE login_attempts (id INTEGER PRIMARY KEY, username TEXT, ip_address TEXT, attempts INTEGER,
+                                     locked_until TIMESTAMP, last_attempt TIMESTAMP);
+        CREATE TABLE auth_logs (id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, ip_address TEXT,
+                                user_agent TEXT, timestamp TIMESTAMP);
+        INSERT INTO login_attempts VALUES (1, 'inconnu', '10.0.0.1', 3, NULL, '2024-01-01T10:00:00');
+        INSERT INTO auth_logs VALUES (100, 1, 'logout', '10.0.0.1', NULL, '2024-01-01 10:00:00');
+    ''')
+    conn.close()
+    with app_fixture.app_context():
+        assert migrer_depuis_catalogue(get_security_db_connection, ancienne) == {'login_attempts': 1, 'auth_logs': 1}
+        assert migrer_depuis_catalogue(get_security_db_connection, ancienne) == {}
+        conn = get_security_db_connection()
+        assert conn.execute("SELECT attempts FROM login_attempts WHERE username = 'inconnu'").fetchone()[0] == 3
+        assert conn.execute('SELECT action FROM auth_logs WHERE id = 100').fetchone()[0] == 'logout'
+        conn.close()
+
+def test_journal_auth_par_lots_et_agregats(client, auth, app_fixture):
+    """Les événements sont écrits par lots ; les anciens sont regroupés en totaux quotidiens."""
+    journal = JournalAuth(get_security_db_connection, intervalle=60)
+    with app_fixture.app_context():
+        for i in range(120):
+            journal.enregistrer(None, 'failed_attempt', '10.0.0.9', 'robot')
+        conn = get_security_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM auth_logs').fetchone()[0] == 0
+        conn.close()
+
+        # Un lot plein réveille l'écriture ; l'arrêt écrit le reste
+        journal.demarrer()
+        journal.arreter()
+        conn = get_security_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM auth_logs').fetchone()[0] == 120
+        conn.executemany(
+            "INSERT INTO auth_logs (action, ip_address, timestamp) VALUES (?, '10.0.0.1', ?)",
+            [('login', '2020-03-01 10:00:00'), ('login', '2020-03-01 18:00:00'), ('logout', '2020-03-02 09:00:00')]
+        )
+        conn.commit()
+
+        assert agreger_anciens_logs(get_security_db_connection, jours=90) == 3
+        assert agreger_anciens_logs(get_security_db_connection, jours=90) == 0
+        agregats = conn.execute('SELECT jour, action, nombre FROM auth_logs_quotidiens ORDER BY jour').fetchall()
+        assert [tuple(row) for row in agregats] == [('2020-03-01', 'login', 2), ('2020-03-02', 'logout', 1)]
+        assert conn.execute('SELECT COUNT(*) FROM auth_logs').fetchone()[0] == 120
+        conn.close()
+
+    auth.login()
+    page = client.get('/admin/security')
+    assert b'10.0.0.9' in page.data and b'Plus anciens' in page.data
+    # Pagination par identifiant : la page suivante reprend sous le dernier événement affiché
+    avant = page.data.split(b'avant=')[1].split(b'"')[0].decode()
+    assert b'Plus r\xc3\xa9cents' in client.get(f'/admin/security?avant={avant}').data
+
+def test_limitation_tentatives_upsert(client, app_fixture):
+    """Le compteur est incrémenté atomiquement ; un client bloqué est refusé sans accès à la base."""
+    requete = SimpleNamespace(remote_addr='10.0.0.42')
+    with app_fixture.app_context():
+        for tentative in range(1, MAX_LOGIN_ATTEMPTS):
+            bloque, message = increment_login_attempts('intrus', requete, get_security_db_connection)
+            assert not bloque and f'{MAX_LOGIN_ATTEMPTS - tentative} tentative(s)' in message
+        assert increment_login_attempts('intrus', requete, get_security_db_connection)[0]
+
+        def base_indisponible():
+            raise AssertionError('La base ne doit pas être interrogée')
+
+        autorise, message = check_login_attempts('intrus', requete, base_indisponible)
+        assert not autorise and 'bloqué' in message
+
+        # Blocage terminé : la tentative suivante repart de 1
+        conn = get_security_db_connection()
+        conn.execute("UPDATE login_attempts SET locked_until = '2000-01-01T00:00:00'")
+        conn.commit()
+        conn.close()
+        login_security._verrous.clear()
+        assert check_login_attempts('intrus', requete, get_security_db_connection) == (True, None)
+        increment_login_attempts('intrus', requete, get_security_db_connection)
+        conn = get_security_db_connection()
+        row = conn.execute("SELECT attempts, locked_until FROM login_attempts WHERE username = 'intrus'").fetchone()
+        conn.close()
+        assert (row['attempts'], row['locked_until']) == (1, None)
+
+def test_maintenance_planifiee(client, auth, app_fixture, tmp_path, monkeypatch):
+    """La commande de maintenance n'exécute que les tâches dues et journalise leur durée."""
+    monkeypatch.setitem(app_fixture.config, 'UPLOAD_FOLDER', str(tmp_path))
+    runner = app_fixture.test_cli_runner()
+
+    resultat = runner.invoke(args=['maintenance', '--forcer'])
+    assert resultat.exit_code == 0, resultat.output
+    assert 'vacuum :' in resultat.output and '"erreur"' not in resultat.output
+    assert runner.invoke(args=['maintenance']).output.strip() == 'Aucune tâche due.'
+    assert runner.invoke(args=['maintenance', '--tache', 'optimisation']).output.startswith('optimisation :')
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        taches = {row[0] for row in conn.execute('SELECT tache FROM journal_maintenance')}
+        # Première exécution : passage en auto_vacuum incrémental et statistiques complètes
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        conn.close()
+    assert {'vacuum', 'optimisation', 'checkpoint_wal', 'tentatives_connexion', 'agregation_auth', 'orphelins'} <= taches
+
+    auth.login()
+    assert b'Vacuum incr\xc3\xa9mental' in client.get('/admin').data
+
+    # Plusieurs workers à la fois : une tâche due n'est exécutée qu'une fois
+    executions = []
+    def lente(conn):
+        executions.append(threading.get_ident())
+        time.sleep(0.2)
+        return {}
+    with app_fixture.app_context():
+        workers = [
+            threading.Thread(target=executer_taches_dues, args=(get_db_connection, [('lente', 3600, lente)]))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    assert len(executions) == 1
@@ -15,3 +15,48 @@ def test_404(client):
     """Test qu'une page inexistante renvoie 404."""
     response = client.get('/page-inexistante')
     assert response.status_code == 404
+
+def test_random_object_fragment(client, app_fixture):
+    """Les objets au hasard sont distincts, même avec des trous dans les identifiants."""
+    from app import get_db_connection
+
+    assert b'Aucun objet' in client.get('/random_object_fragment').data
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        for i in range(6):
+            conn.execute(
+                'INSERT INTO objets (nom, categorie, numero_inventaire) VALUES (?, ?, ?)',
+                (f'Objet <b>{i}</b>', 'Informatique', f'INV_RAND_{i}')
+            )
+        # Créer des trous dans la numérotation
+        conn.execute("DELETE FROM objets WHERE numero_inventaire IN ('INV_RAND_1', 'INV_RAND_3')")
+        conn.commit()
+        conn.close()
+
+    for _ in range(5):
+        html = client.get('/random_object_fragment').get_data(as_text=True)
+        assert html.count('class="objet-card"') == 3
+        # Les noms sont échappés par le gabarit partagé
+        assert '<b>' not in html
+
+
+def test_objets_au_hasard_numerotation_clairsemee(client, app_fixture):
+    """Avec de grands trous dans les identifiants, trois objets distincts sont toujours tirés."""
+    from app import get_db_connection, tirer_objets_au_hasard
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        for objet_id in (1, 2, 3, 1000):
+            conn.execute(
+                'INSERT INTO objets (id, nom, categorie, numero_inventaire) VALUES (?, ?, ?, ?)',
+                (objet_id, f'Objet {objet_id}', 'Informatique', f'INV_SPARSE_{objet_id}')
+            )
+        conn.commit()
+        tirages = [tirer_objets_au_hasard(conn, 3) for _ in range(200)]
+        conn.close()
+
+    assert all(len(set(ids)) == 3 for ids in tirages)
+    assert {objet_id for ids in tirages for objet_id in ids} == {1, 2, 3, 1000}
+    html = client.get('/random_object_fragment').get_data(as_text=True)
+    assert html.count('class="objet-card"') == 3
@@ -0,0 +1,143 @@
+"""
+Tests de la cohérence des caches entre workers (table data_version).
+"""
+
+from app import get_db_connection
+from scripts.data_cache import VersionedCache, bump_data_version, get_data_version
+
+
+def test_triggers_incrementent_versions(client, app_fixture):
+    """Une écriture sur objets incrémente les portées objet, catégorie et globale."""
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        cursor = conn.execute(
+            'INSERT INTO objets (nom, categorie, numero_inventaire) VALUES (?, ?, ?)',
+            ('Objet Cache', 'Informatique', 'INV_CACHE_001')
+        )
+        conn.commit()
+        objet_id = cursor.lastrowid
+
+        assert get_data_version(conn, f'objet:{objet_id}') == 1
+        assert get_data_version(conn, 'categorie:Informatique') == 1
+        global_avant = get_data_version(conn, '*')
+
+        conn.execute('INSERT INTO liens (objet_id, url, ordre) VALUES (?, ?, 0)', (objet_id, 'https://exemple.com'))
+        conn.commit()
+        assert get_data_version(conn, f'objet:{objet_id}') == 2
+        assert get_data_version(conn, '*') == global_avant + 1
+        conn.close()
+
+
+def test_invalidation_entre_workers(client, app_fixture):
+    """Une écriture faite par un worker invalide le cache d'un autre worker."""
+    worker_a = VersionedCache()
+    worker_b = VersionedCache()
+
+    with app_fixture.app_context():
+        def compter(conn):
+            return conn.execute('SELECT COUNT(*) FROM objets').fetchone()[0]
+
+        for worker in (worker_a, worker_b):
+            conn = get_db_connection()
+            worker.sync(conn, 'test')
+            conn.close()
+            assert worker.get_or_load(get_db_connection, 'objets', 'total', compter) == 0
+
+        # Le worker A écrit (les triggers incrémentent data_version)
+        conn = get_db_connection()
+        conn.execute(
+            'INSERT INTO objets (nom, categorie, numero_inventaire) VALUES (?, ?, ?)',
+            ('Objet Worker', 'Informatique', 'INV_CACHE_002')
+        )
+        conn.commit()
+
+        # Le worker B ne voit la modification qu'après synchronisation
+        assert worker_b.get_or_load(get_db_connection, 'objets', 'total', compter) == 0
+        worker_b.sync(conn, 'test')
+        assert worker_b.get_or_load(get_db_connection, 'objets', 'total', compter) == 1
+
+        # Une portée non concernée reste en cache
+        worker_b.get_or_load(get_db_connection, 'liens', 'x', lambda c: 'valeur')
+        bump_data_version(conn, 'config')
+        conn.commit()
+        worker_b.sync(conn, 'test')
+        assert worker_b.get_or_load(get_db_connection, 'liens', 'x', lambda c: 'autre') == 'valeur'
+        conn.close()
+
+
+def test_page_categories_suit_les_ecritures(client, app_fixture):
+    """La page des catégories reflète une insertion faite hors de ce worker."""
+    assert b'TestCache' not in client.get('/categories').data
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        conn.execute(
+            'INSERT INTO objets (nom, categorie, numero_inventaire) VALUES (?, ?, ?)',
+            ('Objet Categorie', 'TestCache', 'INV_CACHE_003')
+        )
+        conn.commit()
+        conn.close()
+
+    assert b'TestCache' in client.get('/categories').data
+
+
+def test_utilisateur_en_cache(client, auth, app_fixture, monkeypatch):
+    """Les requêtes d'un administrateur connecté ne relisent pas la table users, sauf après modification."""
+    import app as module_app
+    from app import User, create_admin_user, data_cache
+
+    lectures = []
+    charger = User.charger
+    monkeypatch.setattr(User, 'charger', staticmethod(lambda conn, user_id: lectures.append(user_id) or charger(conn, user_id)))
+
+    auth.login()
+    for _ in range(3):
+        assert client.get('/admin').status_code == 200
+    # Une seule lecture pour les trois requêtes qui suivent la connexion
+    assert len(lectures) == 1
+    lectures.clear()
+
+    # Changement du mot de passe par create_admin_user : le trigger invalide l'entrée
+    monkeypatch.setenv('ADMIN_USERNAME', 'admin')
+    monkeypatch.setenv('ADMIN_PASSWORD', 'nouveau')
+    with app_fixture.app_context():
+        create_admin_user()
+    assert client.get('/admin').status_code == 200
+    assert client.get('/admin').status_code == 200
+    assert len(lectures) == 1
+    utilisateur = data_cache.get('users', f'user:{lectures[0]}')
+    assert utilisateur.verify_password('nouveau')
+    assert not hasattr(utilisateur, '__dict__')
+
+    # Sans durée de vie (0), l'utilisateur est relu à chaque requête
+    monkeypatch.setattr(module_app, 'DUREE_CACHE_UTILISATEUR', 0)
+    data_cache.invalidate('users')
+    client.get('/admin')
+    client.get('/admin')
+    assert len(lectures) == 3
+    assert data_cache.get('users', f'user:{lectures[0]}') is None
+
+
+def test_duree_de_vie_des_entrees(client, app_fixture, monkeypatch):
+    """Une entrée expire après sa durée de vie ; ttl=0 ne met rien en cache."""
+    from scripts import data_cache as module_cache
+
+    cache = VersionedCache()
+    horloge = [100.0]
+    monkeypatch.setattr(module_cache.time, 'monotonic', lambda: horloge[0])
+    appels = []
+    def charger(conn):
+        appels.append(1)
+        return len(appels)
+
+    with app_fixture.app_context():
+        assert cache.get_or_load(get_db_connection, 's', 'k', charger, ttl=10) == 1
+        assert cache.get_or_load(get_db_connection, 's', 'k', charger, ttl=10) == 1
+        assert cache.get('s', 'k') == 1
+        horloge[0] += 10
+        assert cache.get('s', 'k', 'absente') == 'absente'
+        assert cache.get_or_load(get_db_connection, 's', 'k', charger, ttl=10) == 2
+
+        assert cache.get_or_load(get_db_connection, 's', 'z', charger, ttl=0) == 3
+        assert cache.get('s', 'z') is None
+        assert cache.get_or_load(get_db_connection, 's', 'z', charger, ttl=0) == 4
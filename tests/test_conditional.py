@@ -0,0 +1,86 @@
+"""
+Tests des requêtes conditionnelles (ETag / Last-Modified) sur les fiches objets.
+"""
+
+from app import get_db_connection
+
+
+def creer_objet(app_fixture, numero='INV_ETAG_001'):
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        cursor = conn.execute(
+            'INSERT INTO objets (nom, categorie, numero_inventaire, date_ajout) VALUES (?, ?, ?, ?)',
+            ('Objet ETag', 'Informatique', numero, '2024-01-15 10:00:00')
+        )
+        conn.commit()
+        conn.close()
+        return cursor.lastrowid
+
+
+def test_detail_304(client, app_fixture):
+    """Une seconde visite avec If-None-Match reçoit un 304 sans corps."""
+    objet_id = creer_objet(app_fixture)
+
+    response = client.get(f'/objet/{objet_id}')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+    response = client.get(f'/objet/{objet_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # Une modification de l'objet change l'ETag
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        conn.execute('UPDATE objets SET nom = ?, version = version + 1 WHERE id = ?', ('Renommé', objet_id))
+        conn.commit()
+        conn.close()
+
+    response = client.get(f'/objet/{objet_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Renomm' in response.data
+
+
+def test_detail_etag_depend_de_l_utilisateur(client, auth, app_fixture):
+    """L'ETag de la fiche change à la connexion (boutons d'administration)."""
+    objet_id = creer_objet(app_fixture)
+    etag_anonyme = client.get(f'/objet/{objet_id}').headers['ETag']
+
+    auth.login()
+    response = client.get(f'/objet/{objet_id}', headers={'If-None-Match': etag_anonyme})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag_anonyme
+
+
+def test_preview_et_pdf_conditionnels(client, app_fixture):
+    """L'aperçu au survol et le PDF répondent 304 avant tout rendu."""
+    objet_id = creer_objet(app_fixture)
+
+    for url in (f'/api/objet_preview/{objet_id}', f'/objet/{objet_id}/pdf'):
+        response = client.get(url)
+        assert response.status_code == 200
+        response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+
+    assert client.get('/api/objet_preview/9999').status_code == 404
+
+
+def test_apercus_groupes(client, app_fixture):
+    """L'API groupée renvoie plusieurs aperçus en une requête et gère l'ETag."""
+    id_a = creer_objet(app_fixture, 'INV_ETAG_010')
+    id_b = creer_objet(app_fixture, 'INV_ETAG_011')
+
+    response = client.get(f'/api/objet_previews?ids={id_b},{id_a},9999')
+    assert response.status_code == 200
+    apercus = response.get_json()
+    assert set(apercus) == {str(id_a), str(id_b)}
+    assert 'Objet ETag' in apercus[str(id_a)]
+
+    response = client.get(f'/api/objet_previews?ids={id_a},{id_b},9999',
+                          headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    assert client.get('/api/objet_previews?ids=abc').status_code == 400
+    trop = ','.join(str(i) for i in range(1, 60))
+    assert client.get(f'/api/objet_previews?ids={trop}').status_code == 400
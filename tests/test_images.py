@@ -0,0 +1,496 @@
+"""
+Tests du traitement des images téléchargées (scripts/image_pipeline.py).
+"""
+
+import io
+import os
+import time
+import threading
+import pytest
+from PIL import Image
+from app import get_db_connection, balayer_fichiers
+from scripts import image_pipeline
+from scripts.image_cache import CacheImages
+from scripts.clean_images import analyser_orphelins
+from scripts.storage import LocalStorage
+
+
+def image_test(largeur, hauteur, format_image='JPEG', couleur=(200, 30, 30)):
+    """Génère une image en mémoire."""
+    tampon = io.BytesIO()
+    Image.new('RGB', (largeur, hauteur), couleur).save(tampon, format=format_image)
+    tampon.seek(0)
+    return tampon
+
+
+@pytest.fixture
+def upload_dir(app_fixture, tmp_path):
+    """Redirige les uploads vers un dossier temporaire."""
+    ancien = app_fixture.config['UPLOAD_FOLDER']
+    app_fixture.config['UPLOAD_FOLDER'] = str(tmp_path)
+    yield tmp_path
+    app_fixture.config['UPLOAD_FOLDER'] = ancien
+
+
+def fichiers_uploades(upload_dir):
+    """Liste les fichiers du dossier d'uploads (chemins relatifs, sous-dossiers compris)."""
+    return sorted(
+        os.path.relpath(os.path.join(racine, nom), upload_dir)
+        for racine, _, noms in os.walk(upload_dir) for nom in noms
+    )
+
+
+def ajouter(client, numero, **fichiers):
+    data = {
+        'nom': 'Objet Image', 'description': '', 'categorie': 'Informatique',
+        'fabricant': '', 'date_fabrication': '', 'numero_inventaire': numero
+    }
+    data.update(fichiers)
+    return client.post('/admin/ajouter', data=data, content_type='multipart/form-data')
+
+
+def test_upload_redimensionne_en_une_passe(client, auth, app_fixture, upload_dir):
+    """L'image est réduite à 1600 px et écrite une seule fois, sans fichier temporaire."""
+    auth.login()
+    ajouter(client, 'INV_IMG_001', image_principale=(image_test(3200, 2400), 'photo.jpg'))
+
+    assert not [f for f in fichiers_uploades(upload_dir) if os.path.basename(f).startswith('.')]
+    fichiers = [f for f in fichiers_uploades(upload_dir) if f == image_pipeline.fichier_source(f)]
+    assert len(fichiers) == 1
+    with Image.open(upload_dir / fichiers[0]) as img:
+        assert img.size == (1600, 1200)
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objet = conn.execute("SELECT image_principale FROM objets WHERE numero_inventaire = 'INV_IMG_001'").fetchone()
+        conn.close()
+    assert objet['image_principale'] == 'database/uploads/' + fichiers[0]
+
+
+def test_upload_refuse_bombe_et_fichier_invalide(client, auth, app_fixture, upload_dir):
+    """Une image trop grande ou illisible est refusée sans rien écrire."""
+    auth.login()
+    app_fixture.config['MAX_IMAGE_PIXELS'] = 1000
+    try:
+        ajouter(client, 'INV_IMG_002', image_principale=(image_test(100, 100), 'grande.png'))
+    finally:
+        app_fixture.config['MAX_IMAGE_PIXELS'] = 50_000_000
+
+    ajouter(client, 'INV_IMG_003', image_principale=(io.BytesIO(b'pas une image'), 'faux.jpg'))
+    assert fichiers_uploades(upload_dir) == []
+
+
+def test_reduction_draft_et_cascade():
+    """Les JPEG sont décodés à échelle réduite et les dérivés partent du précédent."""
+    with Image.open(image_test(4000, 3000)) as img:
+        reduite = image_pipeline.reduire(img, (400, 400))
+        # Le décodeur a travaillé à 1/4 (1000x750) au lieu de la pleine résolution
+        assert img.size == (1000, 750)
+        assert reduite.size == (400, 300)
+
+    with Image.open(image_test(1200, 900, format_image='PNG')) as img:
+        derives = dict(image_pipeline.reduire_en_cascade(img, [(32, 32), (600, 600)]))
+    assert derives[(600, 600)].size == (600, 450)
+    assert derives[(32, 32)].size == (32, 24)
+
+
+
+def test_upload_image_en_palette_ou_1_bit(client, auth, app_fixture, upload_dir):
+    """Les grandes images en palette (GIF, PNG) ou 1 bit sont réduites, pas écartées."""
+    for mode in ('P', '1', 'I;16'):
+        assert image_pipeline.reduire(Image.new(mode, (4000, 3000)), (400, 400)).size == (400, 300)
+
+    auth.login()
+    ajouter(client, 'INV_IMG_004', image_principale=(image_test(4000, 3000, format_image='GIF'), 'anim.gif'))
+    fichiers = [f for f in fichiers_uploades(upload_dir) if f.endswith('.gif')]
+    assert len(fichiers) == 1
+    with Image.open(upload_dir / fichiers[0]) as img:
+        assert img.size == (1600, 1200)
+
+def test_optimisation_par_lot_incrementale(tmp_path):
+    """Le lot parallèle redimensionne, garde les fichiers déjà légers et reprend via le manifeste."""
+    from scripts import resize_existing_images
+
+    dossier = tmp_path / 'uploads'
+    dossier.mkdir()
+    (dossier / 'grande.jpg').write_bytes(image_test(3200, 1600).getvalue())
+    with Image.open(image_test(100, 100)) as img:
+        (dossier / 'petite.jpg').write_bytes(image_pipeline.encoder_image(img, 'JPEG'))
+    (dossier / 'notes.txt').write_text('pas une image')
+    manifeste = str(tmp_path / 'manifeste.jsonl')
+
+    stats = resize_existing_images.optimiser_dossier(str(dossier), manifeste, workers=2)
+    assert (stats['traitees'], stats['ignorees'], stats['erreurs']) == (2, 0, 0)
+    with Image.open(dossier / 'grande.jpg') as img:
+        assert img.size == (1600, 800)
+
+    entrees = resize_existing_images.charger_manifeste(manifeste)
+    assert entrees['grande.jpg']['action'] == 'redimensionnee'
+    assert entrees['petite.jpg']['action'] == 'inchangee'
+
+    # Seconde exécution : tout est ignoré ; un fichier remplacé est retraité
+    assert resize_existing_images.optimiser_dossier(str(dossier), manifeste, workers=2)['ignorees'] == 2
+    (dossier / 'petite.jpg').write_bytes(image_test(2000, 100).getvalue())
+    stats = resize_existing_images.optimiser_dossier(str(dossier), manifeste, workers=2)
+    assert (stats['traitees'], stats['ignorees']) == (1, 1)
+
+
+def test_images_multiples_traitees_en_parallele(client, auth, app_fixture, upload_dir, monkeypatch):
+    """Les images d'une fiche sont traitées par le pool de threads puis insérées dans l'ordre du formulaire."""
+    threads = set()
+    enregistrer = image_pipeline.enregistrer_image
+
+    def enregistrer_espion(*args, **kwargs):
+        threads.add(threading.current_thread().name)
+        return enregistrer(*args, **kwargs)
+
+    monkeypatch.setattr(image_pipeline, 'enregistrer_image', enregistrer_espion)
+    auth.login()
+    couleurs = [(200, 30, 30), (30, 200, 30), (30, 30, 200)]
+    client.post('/admin/ajouter', data={
+        'nom': 'Objet Images', 'description': '', 'categorie': 'Informatique', 'fabricant': '',
+        'date_fabrication': '', 'numero_inventaire': 'INV_IMG_011',
+        'image_principale': (image_test(300, 200), 'principale.jpg'),
+        'images_supplementaires': [(image_test(300, 200, couleur=c), f'photo{i}.jpg') for i, c in enumerate(couleurs)],
+        'legende_0': 'Rouge', 'legende_2': 'Bleu'
+    }, content_type='multipart/form-data')
+
+    assert threads and all(nom.startswith('images') for nom in threads)
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        images = conn.execute("""
+            SELECT i.legende, i.ordre, i.couleur FROM images i JOIN objets o ON o.id = i.objet_id
+            WHERE o.numero_inventaire = 'INV_IMG_011' ORDER BY i.ordre
+        """).fetchall()
+        conn.close()
+    assert [(image['legende'], image['ordre']) for image in images] == [('Rouge', 0), ('', 1), ('Bleu', 2)]
+    assert images[1]['couleur'] != images[2]['couleur']
+
+
+def test_variantes_modernes_negociees(client, auth, app_fixture, upload_dir):
+    """Les variantes AVIF/WebP sont servies selon l'en-tête Accept, et supprimées avec l'objet."""
+    auth.login()
+    ajouter(client, 'INV_IMG_004', image_principale=(image_test(800, 600), 'photo.png'))
+    original = next(f for f in fichiers_uploades(upload_dir) if f.endswith('.png'))
+    assert set(fichiers_uploades(upload_dir)) <= {original, original + '.webp', original + '.avif'}
+    assert original + '.webp' in fichiers_uploades(upload_dir)
+
+    url = f'/static/database/uploads/{original}'
+    response = client.get(url, headers={'Accept': 'image/webp,*/*'})
+    assert response.mimetype == 'image/webp'
+    assert 'Accept' in response.headers['Vary']
+
+    # Un joker */* ne suffit pas : le navigateur reçoit l'original
+    response = client.get(url, headers={'Accept': 'image/png,*/*;q=0.8'})
+    assert response.mimetype == 'image/png'
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objet_id = conn.execute("SELECT id FROM objets WHERE numero_inventaire = 'INV_IMG_004'").fetchone()['id']
+        conn.close()
+    client.post(f'/admin/supprimer/{objet_id}')
+    balayer_fichiers(delai_grace=0)
+    assert fichiers_uploades(upload_dir) == []
+
+
+def test_service_immuable_et_delegue(client, auth, app_fixture, upload_dir):
+    """Cache immuable, ETag fort et Range en mode flask ; délégation à nginx en mode x-accel."""
+    auth.login()
+    ajouter(client, 'INV_IMG_009', image_principale=(image_test(800, 600), 'photo.jpg'))
+    original = next(f for f in fichiers_uploades(upload_dir) if f.endswith('.jpg'))
+    url = f'/static/database/uploads/{original}'
+
+    response = client.get(url, headers={'Accept': 'image/jpeg'})
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/') and os.path.basename(original).split('.')[0] in etag
+    assert client.get(url, headers={'Accept': 'image/jpeg', 'If-None-Match': etag}).status_code == 304
+
+    partielle = client.get(url, headers={'Accept': 'image/jpeg', 'Range': 'bytes=0-99'})
+    assert partielle.status_code == 206 and len(partielle.data) == 100
+
+    app_fixture.config['UPLOAD_SERVE_MODE'] = 'x-accel'
+    try:
+        response = client.get(url, headers={'Accept': 'image/webp'})
+        assert response.headers['X-Accel-Redirect'] == f'/uploads-internes/{original}.webp'
+        assert response.mimetype == 'image/webp' and response.data == b''
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert client.get(url, headers={'Accept': 'image/webp', 'If-None-Match': response.headers['ETag']}).status_code == 304
+        assert client.get('/static/database/uploads/ab/cd/absent.jpg').status_code == 404
+    finally:
+        app_fixture.config['UPLOAD_SERVE_MODE'] = 'flask'
+
+
+def test_redimensionnement_a_la_demande(client, auth, app_fixture, upload_dir):
+    """/img/<taille>/ calcule le dérivé une fois, le met en cache et le retire avec l'image."""
+    auth.login()
+    ajouter(client, 'INV_IMG_010', image_principale=(image_test(1200, 900), 'photo.jpg'))
+    original = next(f for f in fichiers_uploades(upload_dir) if f.endswith('.jpg'))
+
+    response = client.get(f'/img/160x160/{original}', headers={'Accept': 'image/jpeg'})
+    assert response.status_code == 200 and response.mimetype == 'image/jpeg'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    with Image.open(io.BytesIO(response.data)) as img:
+        assert img.size == (160, 120)
+
+    if image_pipeline.VARIANTES:
+        mimetype = image_pipeline.VARIANTES[-1][0]
+        assert client.get(f'/img/160x160/{original}', headers={'Accept': mimetype}).mimetype == mimetype
+
+    cache = app_fixture.config['IMAGE_CACHE_FOLDER']
+    assert os.path.isfile(os.path.join(cache, '160x160', original))
+    assert client.get(f'/img/161x161/{original}').status_code == 404
+    assert client.get('/img/160x160/ab/cd/absent.jpg').status_code == 404
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objet_id = conn.execute("SELECT id FROM objets WHERE numero_inventaire = 'INV_IMG_010'").fetchone()['id']
+        conn.close()
+    assert client.get(f'/objet/{objet_id}/pdf').status_code == 200
+    assert os.path.isfile(os.path.join(cache, '800x800', original))
+
+    client.post(f'/admin/supprimer/{objet_id}')
+    balayer_fichiers()
+    assert not [f for _, _, noms in os.walk(cache) for f in noms]
+
+
+
+def test_redimensionnement_gif_et_image_illisible(client, auth, app_fixture, upload_dir, monkeypatch):
+    """Une miniature de GIF est servie ; une réduction impossible renvoie vers l'original."""
+    auth.login()
+    ajouter(client, 'INV_IMG_011', image_principale=(image_test(1200, 900, format_image='GIF'), 'anim.gif'))
+    original = next(f for f in fichiers_uploades(upload_dir) if f.endswith('.gif'))
+
+    response = client.get(f'/img/160x160/{original}', headers={'Accept': 'image/gif'})
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as img:
+        assert img.size == (160, 120)
+
+    def echec(*args):
+        raise ValueError('image has wrong mode')
+    monkeypatch.setattr(image_pipeline, 'encoder_miniature', echec)
+    response = client.get(f'/img/480x480/{original}', headers={'Accept': 'image/gif'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/static/database/uploads/{original}')
+
+def test_nettoyage_orphelins(client, auth, app_fixture, upload_dir):
+    """Simulation et nettoyage partagent le moteur ; les fichiers récents sont épargnés."""
+    auth.login()
+    ajouter(client, 'INV_IMG_012', image_principale=(image_test(300, 200), 'photo.jpg'))
+    reference = next(f for f in fichiers_uploades(upload_dir) if f.endswith('.jpg'))
+
+    ancien = upload_dir / 'ef' / '01' / 'ancien.jpg'
+    ancien.parent.mkdir(parents=True)
+    ancien.write_bytes(b'x' * 2048)
+    os.utime(ancien, (0, 0))
+    (upload_dir / 'ef' / '01' / 'recent.jpg').write_bytes(b'y')
+
+    response = client.get('/admin/nettoyage')
+    assert response.status_code == 200
+    assert b'ef/01/ancien.jpg' in response.data and b'ef/01/recent.jpg' in response.data
+    assert ancien.exists()
+
+    client.post('/admin/nettoyage/execute')
+    restants = fichiers_uploades(upload_dir)
+    # L'orphelin passe par la quarantaine des suppressions différées
+    assert 'ef/01/ancien.jpg' not in restants and '.quarantaine/ef/01/ancien.jpg' in restants
+    assert 'ef/01/recent.jpg' in restants and reference in restants
+
+    # Une image identique téléversée entre-temps retrouve son fichier
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        conn.execute(
+            "INSERT INTO objets (nom, numero_inventaire, image_principale) VALUES ('Doublon', 'INV_IMG_013', ?)",
+            ('database/uploads/ef/01/ancien.jpg',)
+        )
+        conn.commit()
+        conn.close()
+        balayer_fichiers(delai_grace=0)
+    restants = fichiers_uploades(upload_dir)
+    assert 'ef/01/ancien.jpg' in restants and '.quarantaine/ef/01/ancien.jpg' not in restants
+
+    # Mode incrémental : seuls les fichiers que la table `fichiers` signale sans référence sont examinés
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        conn.execute("INSERT INTO fichiers (chemin, refs) VALUES ('database/uploads/ef/01/recent.jpg', 0)")
+        conn.commit()
+        conn.close()
+        rapport = analyser_orphelins(LocalStorage(str(upload_dir)), get_db_connection, {'jpg'},
+                                     supprimer=True, complet=False, delai_grace=0)
+        balayer_fichiers(delai_grace=0)
+        conn = get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM fichiers WHERE refs <= 0').fetchone()[0] == 0
+        conn.close()
+    assert rapport['fichiers_supprimes'] == ['ef/01/recent.jpg']
+    assert rapport['espace_libere'] == 1 and rapport['duree'] >= 0
+    assert fichiers_uploades(upload_dir) == [f for f in restants if f != 'ef/01/recent.jpg']
+
+
+def test_suppression_differee_et_quarantaine(client, auth, app_fixture, upload_dir):
+    """La suppression ne touche pas au stockage ; le balayeur met en quarantaine, restaure ou purge."""
+    auth.login()
+    ajouter(client, 'INV_IMG_013', image_principale=(image_test(300, 200), 'photo.jpg'))
+    original = next(f for f in fichiers_uploades(upload_dir) if f.endswith('.jpg'))
+
+    def objet_id(numero):
+        with app_fixture.app_context():
+            conn = get_db_connection()
+            row = conn.execute('SELECT id FROM objets WHERE numero_inventaire = ?', (numero,)).fetchone()
+            conn.close()
+        return row['id']
+
+    client.post(f"/admin/supprimer/{objet_id('INV_IMG_013')}")
+    assert original in fichiers_uploades(upload_dir)
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        assert conn.execute('SELECT chemin FROM suppressions_en_attente').fetchone()[0].endswith(original)
+        conn.close()
+
+    # Quarantaine : le fichier n'est plus servi mais reste récupérable pendant le délai de grâce
+    stats = balayer_fichiers()
+    assert stats['quarantaine'] >= 1 and stats['purges'] == 0
+    assert '.quarantaine/' + original in fichiers_uploades(upload_dir)
+    assert client.get(f'/static/database/uploads/.quarantaine/{original}').status_code == 404
+
+    # La même image téléversée à nouveau annule la suppression
+    ajouter(client, 'INV_IMG_014', image_principale=(image_test(300, 200), 'photo.jpg'))
+    assert balayer_fichiers(delai_grace=0)['purges'] == 0
+    assert original in fichiers_uploades(upload_dir)
+    assert not [f for f in fichiers_uploades(upload_dir) if f.startswith('.quarantaine')]
+
+    client.post(f"/admin/supprimer/{objet_id('INV_IMG_014')}")
+    stats = balayer_fichiers(delai_grace=0)
+    assert stats['purges'] >= 1 and stats['octets_liberes'] > 0
+    assert fichiers_uploades(upload_dir) == []
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM suppressions_en_attente').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM fichiers').fetchone()[0] == 0
+        conn.close()
+
+
+def test_cache_images_borne_et_calcul_unique(tmp_path):
+    """Le cache évince les dérivés les moins récemment servis et ne calcule qu'une fois par clé."""
+    cache = CacheImages(str(tmp_path), taille_max=2500)
+    appels = []
+
+    def produire():
+        appels.append(1)
+        time.sleep(0.05)
+        return b'x' * 1000
+
+    threads = [threading.Thread(target=cache.obtenir, args=('a/1.jpg', produire)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(appels) == 1
+
+    cache.obtenir('a/2.jpg', produire)
+    os.utime(tmp_path / 'a' / '1.jpg', (0, 0))        # 1.jpg devient le moins récent
+    cache.obtenir('a/3.jpg', produire)                 # 3000 octets > 2500 : purge
+    assert sorted(os.listdir(tmp_path / 'a')) == ['2.jpg', '3.jpg']
+
+
+def test_apercu_et_dimensions_enregistres(client, auth, app_fixture, upload_dir):
+    """Dimensions, couleur dominante et LQIP sont stockés à l'upload et rendus dans la page."""
+    auth.login()
+    ajouter(client, 'INV_IMG_005',
+            image_principale=(image_test(1000, 500, couleur=(10, 120, 200)), 'bleue.jpg'),
+            images_supplementaires=(image_test(300, 600), 'rouge.jpg'))
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objet = conn.execute("SELECT * FROM objets WHERE numero_inventaire = 'INV_IMG_005'").fetchone()
+        image = conn.execute('SELECT * FROM images WHERE objet_id = ?', (objet['id'],)).fetchone()
+        conn.close()
+
+    assert (objet['image_largeur'], objet['image_hauteur']) == (1000, 500)
+    assert objet['image_lqip'].startswith('data:image/')
+    rouge, vert, bleu = (int(objet['image_couleur'][i:i + 2], 16) for i in (1, 3, 5))
+    assert abs(rouge - 10) < 8 and abs(vert - 120) < 8 and abs(bleu - 200) < 8
+    assert (image['largeur'], image['hauteur']) == (300, 600) and image['lqip']
+
+    page = client.get('/').get_data(as_text=True)
+    assert 'class="objet-image image-progressive"' in page
+    assert objet['image_lqip'] in page
+
+    page = client.get(f"/objet/{objet['id']}").get_data(as_text=True)
+    assert 'width="1000" height="500"' in page
+
+
+def test_stockage_par_contenu_partage(client, auth, app_fixture, upload_dir):
+    """Une image identique n'est stockée qu'une fois et survit tant qu'un objet la référence."""
+    auth.login()
+    contenu = image_test(640, 480).getvalue()
+    ajouter(client, 'INV_IMG_006', image_principale=(io.BytesIO(contenu), 'a.jpg'))
+    ajouter(client, 'INV_IMG_007', image_principale=(io.BytesIO(contenu), 'b.jpeg'),
+            images_supplementaires=(io.BytesIO(contenu), 'c.jpg'))
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        objets = conn.execute(
+            "SELECT id, image_principale FROM objets WHERE numero_inventaire IN ('INV_IMG_006', 'INV_IMG_007') ORDER BY id"
+        ).fetchall()
+        chemin = objets[0]['image_principale']
+        refs = conn.execute('SELECT refs FROM fichiers WHERE chemin = ?', (chemin,)).fetchone()['refs']
+        conn.close()
+
+    sha256 = os.path.basename(chemin).split('.')[0]
+    assert chemin == f'database/uploads/{sha256[:2]}/{sha256[2:4]}/{sha256}.jpg'
+    assert objets[1]['image_principale'] == chemin
+    assert refs == 3
+    originaux = [f for f in fichiers_uploades(upload_dir) if f == image_pipeline.fichier_source(f)]
+    assert len(originaux) == 1
+
+    # Supprimer le premier objet conserve le fichier, supprimer le second le retire
+    client.post(f"/admin/supprimer/{objets[0]['id']}")
+    balayer_fichiers(delai_grace=0)
+    assert len(fichiers_uploades(upload_dir)) >= 1
+    client.post(f"/admin/supprimer/{objets[1]['id']}")
+    balayer_fichiers(delai_grace=0)
+    assert fichiers_uploades(upload_dir) == []
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM fichiers').fetchone()[0] == 0
+        conn.close()
+
+
+def test_migration_vers_stockage_par_contenu(client, app_fixture, tmp_path):
+    """Les anciens uploads sont renommés d'après leur contenu et les doublons fusionnés."""
+    from scripts import dedup_uploads
+
+    dossier = tmp_path / 'uploads'
+    dossier.mkdir()
+    contenu = image_test(200, 100).getvalue()
+    (dossier / 'uuid1_photo.jpg').write_bytes(contenu)
+    (dossier / 'uuid1_photo.jpg.webp').write_bytes(b'variante')
+    (dossier / 'uuid2_copie.jpeg').write_bytes(contenu)
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        conn.execute("INSERT INTO objets (nom, numero_inventaire, image_principale) VALUES ('A', 'INV_MIG_1', 'database/uploads/uuid1_photo.jpg')")
+        objet_id = conn.execute("INSERT INTO objets (nom, numero_inventaire, image_principale) VALUES ('B', 'INV_MIG_2', 'database/uploads/uuid2_copie.jpeg')").lastrowid
+        conn.execute("INSERT INTO images (objet_id, chemin) VALUES (?, 'database/uploads/uuid1_photo.jpg')", (objet_id,))
+        conn.commit()
+        conn.close()
+
+    stats = dedup_uploads.migrer_uploads(app_fixture.config['DATABASE'], str(dossier))
+    assert (stats['fichiers'], stats['doublons']) == (2, 1)
+
+    fichiers = fichiers_uploades(dossier)
+    assert len(fichiers) == 2 and fichiers[1] == fichiers[0] + '.webp'
+
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        chemins = {row[0] for row in conn.execute(
+            "SELECT image_principale FROM objets WHERE numero_inventaire LIKE 'INV_MIG_%' UNION ALL SELECT chemin FROM images"
+        )}
+        refs = conn.execute('SELECT chemin, refs FROM fichiers').fetchall()
+        conn.close()
+    assert chemins == {'database/uploads/' + fichiers[0]}
+    assert [tuple(r) for r in refs] == [('database/uploads/' + fichiers[0], 3)]
+
+    # Une seconde exécution n'a plus rien à faire
+    assert dedup_uploads.migrer_uploads(app_fixture.config['DATABASE'], str(dossier))['fichiers'] == 0
@@ -0,0 +1,73 @@
+"""
+Tests de l'attribution des numéros d'inventaire (scripts/numerotation.py).
+"""
+
+import threading
+from app import get_db_connection
+from scripts.numerotation import reserver_numero, liberer_reservation
+
+
+def inserer(conn, numero):
+    conn.execute(
+        'INSERT INTO objets (nom, categorie, numero_inventaire) VALUES (?, ?, ?)',
+        (f'Objet {numero}', 'Informatique', numero)
+    )
+
+
+def test_numeros_libres_et_reservations(client, app_fixture):
+    """Les trous sont réutilisés, et deux réservations ne partagent jamais un numéro."""
+    with app_fixture.app_context():
+        conn = get_db_connection()
+        for numero in ('INV_IC2_0000', 'INV_IC2_0001', 'INV_IC2_0003', 'INV_TEST_X'):
+            inserer(conn, numero)
+        conn.commit()
+
+        assert reserver_numero(get_db_connection, 'a') == 'INV_IC2_0002'
+        # La même session conserve son numéro
+        assert reserver_numero(get_db_connection, 'a') == 'INV_IC2_0002'
+        assert reserver_numero(get_db_connection, 'b') == 'INV_IC2_0004'
+
+        # Un numéro libéré par suppression est proposé à nouveau
+        conn.execute("DELETE FROM objets WHERE numero_inventaire = 'INV_IC2_0001'")
+        conn.commit()
+        assert reserver_numero(get_db_connection, 'c') == 'INV_IC2_0001'
+
+        # Une réservation abandonnée rend son numéro
+        liberer_reservation(conn, 'a')
+        conn.commit()
+        assert reserver_numero(get_db_connection, 'd') == 'INV_IC2_0002'
+
+        # Un numéro saisi à la main crée des trous qui seront réutilisés
+        inserer(conn, 'INV_IC2_0008')
+        conn.commit()
+        assert reserver_numero(get_db_connection, 'e') == 'INV_IC2_0005'
+        conn.close()
+
+
+def test_reservations_concurrentes(client, app_fixture):
+    """Des réservations simultanées obtiennent toutes des numéros distincts."""
+    numeros = []
+    with app_fixture.app_context():
+        def reserver(jeton):
+            numeros.append(reserver_numero(get_db_connection, jeton))
+
+        threads = [threading.Thread(target=reserver, args=(f'jeton-{i}',)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert sorted(numeros) == [f'INV_IC2_{i:04d}' for i in range(8)]
+
+
+def test_formulaire_ajout_reserve_un_numero(client, auth):
+    """La page d'ajout propose un numéro réservé, libéré après l'enregistrement."""
+    auth.login()
+    assert b'INV_IC2_0000' in client.get('/admin/ajouter').data
+    assert b'INV_IC2_0000' in client.get('/admin/ajouter').data
+
+    client.post('/admin/ajouter', data={
+        'nom': 'Objet numéroté', 'description': '', 'categorie': 'Informatique',
+        'fabricant': '', 'date_fabrication': '', 'numero_inventaire': 'INV_IC2_0000'
+    })
+    assert b'INV_IC2_0001' in client.get('/admin/ajouter').data
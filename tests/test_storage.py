@@ -0,0 +1,150 @@
+"""
+Tests des stockages d'uploads (scripts/storage.py).
+
+Le stockage S3 est testé contre un client en mémoire qui reproduit les appels
+et les erreurs de boto3 utilisés par S3Storage.
+"""
+
+import io
+import pytest
+from datetime import datetime, timezone
+from PIL import Image
+from app import get_db_connection, balayer_fichiers
+from scripts.storage import Storage, LocalStorage, S3Storage
+
+
+class ErreurS3(Exception):
+    """Imite botocore.exceptions.ClientError (attribut `response`)."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class ClientS3Memoire:
+    """Client S3 minimal en mémoire (put/get/head/delete/list_objects_v2)."""
+
+    def __init__(self, page=1000):
+        self.objets = {}
+        self.page = page
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objets[(Bucket, Key)] = (bytes(Body), ContentType, datetime.now(timezone.utc))
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objets:
+            raise ErreurS3('NoSuchKey')
+        return {'Body': io.BytesIO(self.objets[(Bucket, Key)][0])}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objets:
+            raise ErreurS3('404')
+        donnees, content_type, date = self.objets[(Bucket, Key)]
+        return {'ContentLength': len(donnees), 'ContentType': content_type, 'LastModified': date}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        source = (CopySource['Bucket'], CopySource['Key'])
+        if source not in self.objets:
+            raise ErreurS3('NoSuchKey')
+        self.objets[(Bucket, Key)] = self.objets[source]
+
+    def delete_object(self, Bucket, Key):
+        self.objets.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None):
+        cles = sorted(k for b, k in self.objets if b == Bucket and k.startswith(Prefix))
+        debut = int(ContinuationToken or 0)
+        reponse = {'Contents': [{'Key': k} for k in cles[debut:debut + self.page]]}
+        if debut + self.page < len(cles):
+            reponse.update(IsTruncated=True, NextContinuationToken=str(debut + self.page))
+        return reponse
+
+
+@pytest.fixture(params=['local', 's3'])
+def stockage(request, tmp_path):
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path))
+    return S3Storage(ClientS3Memoire(page=2), 'inventaire', prefixe='uploads/')
+
+
+def test_interface_commune(stockage):
+    """Les deux stockages offrent le même comportement."""
+    assert not stockage.exists('ab/cd/x.jpg')
+    assert stockage.stat('ab/cd/x.jpg') is None
+    with pytest.raises(FileNotFoundError):
+        stockage.get('ab/cd/x.jpg')
+
+    for nom in ('ab/cd/x.jpg', 'ab/cd/x.jpg.webp', 'ef/01/y.png'):
+        stockage.put(nom, b'octets de ' + nom.encode(), 'image/jpeg')
+
+    assert stockage.get('ab/cd/x.jpg') == b'octets de ab/cd/x.jpg'
+    assert stockage.stat('ab/cd/x.jpg')['taille'] == len(b'octets de ab/cd/x.jpg')
+    assert sorted(stockage.lister()) == ['ab/cd/x.jpg', 'ab/cd/x.jpg.webp', 'ef/01/y.png']
+    assert list(stockage.lister('ef/')) == ['ef/01/y.png']
+
+    stockage.deplacer('ab/cd/x.jpg.webp', '.quarantaine/ab/cd/x.jpg.webp')
+    assert not stockage.exists('ab/cd/x.jpg.webp')
+    assert stockage.get('.quarantaine/ab/cd/x.jpg.webp') == b'octets de ab/cd/x.jpg.webp'
+    with pytest.raises(FileNotFoundError):
+        stockage.deplacer('ab/cd/x.jpg.webp', '.quarantaine/ab/cd/x.jpg.webp')
+
+    stockage.delete('ab/cd/x.jpg')
+    stockage.delete('ab/cd/x.jpg')
+    assert not stockage.exists('ab/cd/x.jpg')
+
+    with pytest.raises(ValueError):
+        stockage.put('../evasion.jpg', b'')
+
+
+def test_application_sur_stockage_s3(client, auth, app_fixture):
+    """Upload, service, PDF et suppression passent par le stockage S3 configuré."""
+    s3 = ClientS3Memoire()
+    app_fixture.config.update(STORAGE_BACKEND='s3', S3_BUCKET='inventaire', S3_PREFIX='uploads/', S3_CLIENT=s3)
+    try:
+        auth.login()
+        image = io.BytesIO()
+        Image.new('RGB', (400, 300), (20, 140, 60)).save(image, format='PNG')
+        image.seek(0)
+        client.post('/admin/ajouter', data={
+            'nom': 'Objet S3', 'description': '', 'categorie': 'Informatique', 'fabricant': '',
+            'date_fabrication': '', 'numero_inventaire': 'INV_S3_001', 'image_principale': (image, 'photo.png')
+        }, content_type='multipart/form-data')
+
+        with app_fixture.app_context():
+            conn = get_db_connection()
+            objet = conn.execute("SELECT id, image_principale FROM objets WHERE numero_inventaire = 'INV_S3_001'").fetchone()
+            conn.close()
+        cle = objet['image_principale'][len('database/uploads/'):]
+        assert ('inventaire', 'uploads/' + cle) in s3.objets
+
+        # Bucket privé : l'application relaie le contenu, avec négociation et revalidation
+        response = client.get('/static/database/uploads/' + cle, headers={'Accept': 'image/png'})
+        assert response.status_code == 200 and response.mimetype == 'image/png'
+        assert client.get('/static/database/uploads/' + cle,
+                          headers={'Accept': 'image/png', 'If-None-Match': response.headers['ETag']}).status_code == 304
+        assert client.get('/static/database/uploads/ab/cd/absent.jpg').status_code == 404
+
+        # Bucket public : redirection vers l'URL directe
+        app_fixture.config['S3_PUBLIC_URL'] = 'https://cdn.example.org'
+        response = client.get('/static/database/uploads/' + cle, headers={'Accept': 'image/png'})
+        assert response.status_code == 302
+        assert response.headers['Location'] == f'https://cdn.example.org/uploads/{cle}'
+        app_fixture.config['S3_PUBLIC_URL'] = None
+
+        assert client.get(f"/objet/{objet['id']}/pdf").status_code == 200
+
+        client.post(f"/admin/supprimer/{objet['id']}")
+        balayer_fichiers(delai_grace=0)
+        assert s3.objets == {}
+    finally:
+        app_fixture.config.update(STORAGE_BACKEND='local', S3_BUCKET=None, S3_CLIENT=None, S3_PREFIX='', S3_PUBLIC_URL=None)
+
+
+def test_stockage_incomplet_refuse():
+    """Un stockage auquel il manque une méthode de l'interface ne peut pas être créé."""
+    class StockageIncomplet(Storage):
+        def put(self, cle, donnees, content_type=None):
+            pass
+
+    with pytest.raises(TypeError):
+        StockageIncomplet()